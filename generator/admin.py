@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import ChatSession, ChatMessage
+from .models import CachedResponse, ChatSession, ChatMessage, Job
 
 admin.site.register(ChatSession)
 admin.site.register(ChatMessage)
+admin.site.register(CachedResponse)
+admin.site.register(Job)
@@ -6,4 +6,7 @@ class GeneratorConfig(AppConfig):
     name = "generator"
 
     def ready(self):
-        import generator.signals  # noqa
\ No newline at end of file
+        import generator.signals  # noqa
+        import generator.services.profiling  # noqa  (mide las consultas de cada conexión)
+        import generator.services.project_generation  # noqa  (registra los handlers de jobs)
+        import generator.services.attachments  # noqa
\ No newline at end of file
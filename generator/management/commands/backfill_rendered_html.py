@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from generator.models import ChatMessage, Project
+from generator.services.rendering import (
+    CHAT_RENDERER_VERSION,
+    PROJECT_RENDERER_VERSION,
+    render_message,
+    set_project_test_cases,
+)
+
+
+class Command(BaseCommand):
+    help = "Renderiza y guarda el HTML de mensajes IA y casos de proyecto obsoletos"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+
+        # -------------------------
+        # Mensajes IA
+        # -------------------------
+        stale = (
+            ChatMessage.objects
+            .filter(is_user=False)
+            .filter(~Q(rendered_version=CHAT_RENDERER_VERSION))
+            .order_by("id")
+        )
+        total = 0
+        last_id = 0
+        while True:
+            batch = list(stale.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            for message in batch:
+                render_message(message)
+            ChatMessage.objects.bulk_update(batch, ["rendered_html", "rendered_version"])
+            total += len(batch)
+            last_id = batch[-1].id
+            self.stdout.write(f"  mensajes renderizados: {total}")
+
+        # -------------------------
+        # Casos de proyecto
+        # -------------------------
+        projects = 0
+        stale_projects = Project.objects.exclude(test_cases="").filter(
+            ~Q(test_cases_html_version=PROJECT_RENDERER_VERSION)
+        )
+        for project in stale_projects.iterator(chunk_size=batch_size):
+            set_project_test_cases(project, project.test_cases)
+            project.save(update_fields=["test_cases_html", "test_cases_html_version"])
+            projects += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {total} mensajes y {projects} proyectos actualizados"
+        ))
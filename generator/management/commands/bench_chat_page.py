@@ -0,0 +1,76 @@
+import statistics
+import time
+import uuid
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from generator.models import ChatMessage, ChatSession
+from generator.services.rendering import CHAT_RENDERER_VERSION, render_chat_markdown
+
+AI_SAMPLE = (
+    "**ID:** TC-{n}\n**Título:** Login con usuario bloqueado\n"
+    "**Pasos:**\n1. Abrir la página de login\n2. Ingresar credenciales\n"
+    "**Resultado esperado:** Se muestra un mensaje de cuenta bloqueada\n"
+)
+
+
+class Command(BaseCommand):
+    help = "Mide el tiempo de la página del chat según la cantidad de mensajes (datos temporales)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="100,1000,10000", help="Largos de chat separados por coma")
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options["sizes"].split(",")]
+        rendered = render_chat_markdown(AI_SAMPLE.format(n=1))
+
+        self.stdout.write(f"{'mensajes':>10} {'p50 ms':>8} {'p95 ms':>8} {'queries':>8} {'KB':>8}")
+
+        # Todo dentro de una transacción que se revierte: no deja datos
+        with transaction.atomic():
+            user = User.objects.create_user(f"bench-{uuid.uuid4().hex[:8]}")
+            client = Client(HTTP_HOST="localhost")
+            client.force_login(user)
+
+            for size in sizes:
+                chat = ChatSession.objects.create(user=user, title=f"Bench {size}")
+                ChatMessage.objects.bulk_create(
+                    [
+                        ChatMessage(
+                            chat=chat,
+                            is_user=i % 2 == 0,
+                            content="Generar casos para el login" if i % 2 == 0 else AI_SAMPLE.format(n=i),
+                            rendered_html="" if i % 2 == 0 else rendered,
+                            rendered_version="" if i % 2 == 0 else CHAT_RENDERER_VERSION,
+                        )
+                        for i in range(size)
+                    ],
+                    batch_size=2000,
+                )
+
+                url = reverse("chat", args=[chat.id])
+                client.get(url)  # calentamiento
+
+                timings = []
+                for _ in range(options["repeat"]):
+                    start = time.perf_counter()
+                    response = client.get(url)
+                    timings.append((time.perf_counter() - start) * 1000)
+
+                with CaptureQueriesContext(connection) as queries:
+                    client.get(url)
+
+                timings.sort()
+                p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+                self.stdout.write(
+                    f"{size:>10} {statistics.median(timings):>8.1f} {p95:>8.1f} "
+                    f"{len(queries.captured_queries):>8} {len(response.content) / 1024:>8.1f}"
+                )
+
+            transaction.set_rollback(True)
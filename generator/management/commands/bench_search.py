@@ -0,0 +1,99 @@
+import random
+import statistics
+import time
+import uuid
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from generator.models import ChatMessage, ChatSession
+from generator.services.search import search
+
+# Vocabulario con frecuencias tipo Zipf: hay términos muy comunes y raros
+VOCABULARY = (
+    "login usuario contraseña prueba caso validar error pantalla botón formulario "
+    "correo registro sesión bloqueo token api respuesta servidor tiempo carga "
+    "pago tarjeta carrito pedido factura reporte exportar filtro búsqueda perfil "
+    "permiso rol administrador auditoría notificación mensaje adjunto archivo "
+    "limite timeout reintento cache índice paginación migración despliegue"
+).split()
+
+# La última no aparece en los datos: icontains tiene que recorrer todo
+QUERIES = ["login", "factura exportar", "despliegue", "migr", "usuario bloqueo sesión", "reembolso"]
+
+
+class Command(BaseCommand):
+    help = "Mide la búsqueda de texto completo frente a icontains (datos temporales)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=1_000_000)
+        parser.add_argument("--users", type=int, default=100, help="Usuarios entre los que se reparten")
+        parser.add_argument("--per-chat", type=int, default=200)
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        weights = [1 / (rank + 1) for rank in range(len(VOCABULARY))]
+
+        # Todo dentro de una transacción que se revierte: no deja datos
+        with transaction.atomic():
+            prefix = uuid.uuid4().hex[:8]
+            users = [User.objects.create_user(f"bench-{prefix}-{i}") for i in range(options["users"])]
+            user = users[0]  # se mide la búsqueda de un usuario con su parte de los datos
+
+            start = time.perf_counter()
+            remaining = options["messages"]
+            while remaining > 0:
+                chat = ChatSession.objects.create(
+                    user=users[remaining // options["per_chat"] % len(users)],
+                    title=" ".join(rng.choices(VOCABULARY, k=3)),
+                )
+                size = min(options["per_chat"], remaining)
+                for offset in range(0, size, options["batch_size"]):
+                    ChatMessage.objects.bulk_create([
+                        ChatMessage(
+                            chat=chat,
+                            is_user=i % 2 == 0,
+                            content=" ".join(rng.choices(VOCABULARY, weights, k=rng.randint(8, 40))),
+                        )
+                        for i in range(offset, min(offset + options["batch_size"], size))
+                    ])
+                remaining -= size
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f"Insertados {options['messages']} mensajes (con triggers FTS) en {elapsed:.1f}s "
+                f"({options['messages'] / elapsed:.0f}/s), {len(users)} usuarios\n"
+            )
+
+            self.stdout.write(f"{'consulta':<26} {'FTS p50':>8} {'FTS p95':>8} {'icontains p50':>14}")
+            for query in QUERIES:
+                search(user, query)  # calentamiento
+                fts = self._timings(lambda: search(user, query), options["repeat"])
+
+                messages = ChatMessage.objects.filter(chat__user=user)
+                for word in query.split():
+                    messages = messages.filter(content__icontains=word)
+                icontains = self._timings(
+                    lambda: list(messages.order_by("-id")[:20]),
+                    max(3, options["repeat"] // 5),
+                )
+
+                self.stdout.write(
+                    f"{query:<26} {statistics.median(fts):>8.1f} {self._p95(fts):>8.1f} "
+                    f"{statistics.median(icontains):>14.1f}"
+                )
+
+            transaction.set_rollback(True)
+
+    def _timings(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+        return sorted(timings)
+
+    def _p95(self, timings):
+        return timings[min(len(timings) - 1, int(len(timings) * 0.95))]
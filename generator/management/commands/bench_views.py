@@ -0,0 +1,198 @@
+import json
+import platform
+import sqlite3
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from generator.models import ChatMessage, ChatSession
+from generator.services.pagination import keyset_before
+from generator.services.synthetic import SYNTHETIC_PREFIX
+
+DEFAULT_BASELINE = settings.BASE_DIR / "benchmarks" / "baseline.json"
+
+# Diferencias menores no cuentan como regresión (ruido del reloj)
+NOISE_MS = 1.0
+
+
+def percentile(timings, fraction):
+    return timings[min(len(timings) - 1, int(len(timings) * fraction))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide las vistas principales con el cliente de pruebas sobre los datos de "
+        "seed_synthetic y compara con la línea base guardada"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=30)
+        parser.add_argument("--user", default=f"{SYNTHETIC_PREFIX}0000",
+                            help="Usuario medido (por defecto el sintético con más datos)")
+        parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+        parser.add_argument("--save-baseline", action="store_true",
+                            help="Guarda estos resultados como nueva línea base")
+        parser.add_argument("--tolerance", type=float, default=0.25,
+                            help="Margen sobre el p50 de la línea base antes de marcar regresión")
+
+    # -------------------------
+    # CASOS
+    # -------------------------
+    def cases(self, user):
+        """(nombre, url, parámetros, sin caché) de cada vista medida."""
+        chat = (
+            ChatSession.objects.filter(user=user)
+            .order_by("-total_messages", "id")
+            .first()
+        )
+        if chat is None:
+            raise CommandError(f"{user.username} no tiene chats")
+
+        _, older_cursor = keyset_before(chat.messages.all(), limit=settings.CHAT_PAGE_SIZE)
+        _, history_cursor = keyset_before(
+            ChatSession.objects.filter(user=user),
+            limit=settings.HISTORY_PAGE_SIZE,
+            field="last_message_at",
+            chronological=False,
+        )
+        first_day = ChatMessage.objects.filter(chat__user=user).order_by("created_at").values_list(
+            "created_at", flat=True
+        ).first()
+
+        cases = [
+            ("dashboard", reverse("dashboard"), {}, False),
+            ("dashboard (sin caché)", reverse("dashboard"), {}, True),
+            ("api dashboard metrics", reverse("dashboard_metrics_api"), {}, False),
+            ("api dashboard metrics (sin caché)", reverse("dashboard_metrics_api"), {}, True),
+            ("api dashboard charts", reverse("dashboard_charts_api"), {}, False),
+            ("metrics", reverse("metrics"), {}, False),
+            ("metrics (filtro fechas)", reverse("metrics"), {
+                "start_date": first_day.date().isoformat() if first_day else "2025-01-01",
+                "end_date": "2099-12-31",
+            }, False),
+            ("chat", reverse("chat", args=[chat.id]), {}, False),
+            ("history", reverse("history"), {}, False),
+            ("api search", reverse("search_api"), {"q": "login"}, False),
+        ]
+        if older_cursor:
+            cases.append(("api chat messages", reverse("chat_messages_api", args=[chat.id]),
+                          {"before": older_cursor}, False))
+        if history_cursor:
+            cases.append(("history (página 2)", reverse("history"), {"before": history_cursor}, False))
+        return cases
+
+    def measure(self, client, url, params, cold, repeat):
+        client.get(url, params)  # calentamiento
+
+        timings = []
+        for _ in range(repeat):
+            if cold:
+                cache.clear()
+            start = time.perf_counter()
+            response = client.get(url, params)
+            timings.append((time.perf_counter() - start) * 1000)
+            if response.status_code != 200:
+                raise CommandError(f"{url} devolvió {response.status_code}")
+
+        if cold:
+            cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url, params)
+
+        timings.sort()
+        return {
+            "p50": round(statistics.median(timings), 2),
+            "p95": round(percentile(timings, 0.95), 2),
+            "p99": round(percentile(timings, 0.99), 2),
+            "queries": len(queries.captured_queries),
+            "kb": round(len(response.content) / 1024, 1),
+        }
+
+    # -------------------------
+    # LÍNEA BASE
+    # -------------------------
+    def compare(self, name, result, baseline, tolerance):
+        """(texto de la comparación, regresión o None)."""
+        before = baseline.get(name)
+        if not before:
+            return "nuevo", None
+
+        delta = result["p50"] - before["p50"]
+        text = f"{delta / before['p50'] * 100:+.0f}%" if before["p50"] else "-"
+        if result["queries"] > before["queries"]:
+            return text, f"{name}: {before['queries']} -> {result['queries']} queries"
+        if delta > NOISE_MS and result["p50"] > before["p50"] * (1 + tolerance):
+            return text, f"{name}: p50 {before['p50']} -> {result['p50']} ms"
+        return text, None
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["user"])
+        except User.DoesNotExist:
+            raise CommandError(f"No existe {options['user']}: generar datos con `seed_synthetic`")
+
+        messages = ChatMessage.objects.filter(chat__user__username__startswith=SYNTHETIC_PREFIX).count()
+        meta = {
+            "messages": messages,
+            "user": user.username,
+            "user_messages": ChatMessage.objects.filter(chat__user=user).count(),
+            "repeat": options["repeat"],
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+        }
+
+        baseline_path = options["baseline"]
+        baseline = {}
+        try:
+            with open(baseline_path, encoding="utf-8") as file:
+                stored = json.load(file)
+            if stored["meta"]["messages"] == messages and stored["meta"]["user"] == user.username:
+                baseline = stored["results"]
+            else:
+                self.stdout.write(self.style.WARNING(
+                    f"La línea base es de otra escala ({stored['meta']['messages']} mensajes): no se compara"
+                ))
+        except FileNotFoundError:
+            pass
+
+        # Un host aceptado por ALLOWED_HOSTS ("localhost" con DEBUG y lista vacía)
+        host = next((host.lstrip(".") for host in settings.ALLOWED_HOSTS if host != "*"), "localhost")
+        client = Client(HTTP_HOST=host)
+        client.force_login(user)
+
+        self.stdout.write(
+            f"{messages} mensajes sintéticos; {user.username} tiene {meta['user_messages']}\n"
+        )
+        self.stdout.write(
+            f"{'vista':<36} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8} {'KB':>7} {'vs base':>8}"
+        )
+
+        results, regressions = {}, []
+        for name, url, params, cold in self.cases(user):
+            result = self.measure(client, url, params, cold, options["repeat"])
+            results[name] = result
+
+            versus, regression = self.compare(name, result, baseline, options["tolerance"])
+            if regression:
+                regressions.append(regression)
+                versus += " !"
+            self.stdout.write(
+                f"{name:<36} {result['p50']:>8.1f} {result['p95']:>8.1f} {result['p99']:>8.1f} "
+                f"{result['queries']:>8} {result['kb']:>7.1f} {versus if baseline else '':>8}"
+            )
+
+        if options["save_baseline"]:
+            with open(baseline_path, "w", encoding="utf-8") as file:
+                json.dump({"meta": meta, "results": results}, file, indent=2, ensure_ascii=False)
+                file.write("\n")
+            self.stdout.write(self.style.SUCCESS(f"Línea base guardada en {baseline_path}"))
+        elif regressions:
+            raise CommandError("Regresiones frente a la línea base:\n" + "\n".join(regressions))
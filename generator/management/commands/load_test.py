@@ -0,0 +1,72 @@
+import asyncio
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from generator.services.load_test import parse_mix, run_load_test
+
+LOAD_PREFIX = "load-"
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de carga: N usuarios simultáneos chatean, suben proyectos y miran el "
+        "dashboard contra un servidor en marcha. Sin backend remoto: levantar "
+        "`run_ai_simulator` y apuntar FASTAPI_URL del servidor a él"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+        parser.add_argument("--users", type=int, default=10)
+        parser.add_argument("--duration", type=float, default=30, help="Segundos")
+        parser.add_argument("--mix", default="chat=3,upload=1,dashboard=6", help="Peso de cada escenario")
+        parser.add_argument("--think", type=float, default=1.0, help="Pausa media entre acciones (s)")
+        parser.add_argument("--job-timeout", type=float, default=0,
+                            help="Esperar cada job de proyecto hasta N segundos (requiere run_worker)")
+        parser.add_argument("--password", default="carga-local-123")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--json", help="Guarda el resultado en este archivo")
+
+    def handle(self, *args, **options):
+        try:
+            mix = parse_mix(options["mix"])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        # Usuarios de la prueba, en la base que usa el servidor
+        credentials = []
+        for i in range(options["users"]):
+            user, created = User.objects.get_or_create(username=f"{LOAD_PREFIX}{i:03d}")
+            if created or not user.check_password(options["password"]):
+                user.set_password(options["password"])
+                user.save(update_fields=["password"])
+            credentials.append((user.username, options["password"]))
+
+        self.stdout.write(
+            f"{options['users']} usuarios durante {options['duration']:.0f}s contra {options['base_url']}..."
+        )
+        report = asyncio.run(run_load_test(
+            options["base_url"], credentials, duration=options["duration"], mix=mix,
+            think=options["think"], job_timeout=options["job_timeout"], seed=options["seed"],
+        ))
+
+        self.stdout.write(
+            f"\n{'operación':<26} {'peticiones':>10} {'req/s':>7} {'errores':>8} "
+            f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+        )
+        for name, row in report["operations"].items():
+            self.stdout.write(
+                f"{name:<26} {row['requests']:>10} {row['rps']:>7.2f} {row['error_rate']:>8.1%} "
+                f"{row['p50']:>8.1f} {row['p95']:>8.1f} {row['p99']:>8.1f}"
+            )
+        self.stdout.write(
+            f"\nTotal: {report['requests']} peticiones en {report['elapsed_s']}s "
+            f"({report['rps']} req/s), {report['errors']} errores"
+        )
+        for kind, count in report["error_kinds"].items():
+            self.stdout.write(self.style.WARNING(f"  {count} x {kind}"))
+
+        if options["json"]:
+            with open(options["json"], "w", encoding="utf-8") as file:
+                json.dump(report, file, indent=2, ensure_ascii=False)
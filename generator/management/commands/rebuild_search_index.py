@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from generator.services.search import SEARCH_TABLE, rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Regenera el índice de búsqueda (FTS5) de mensajes, chats y proyectos"
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        rebuild_index()
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT count(*) FROM {SEARCH_TABLE}")
+            rows = cursor.fetchone()[0]
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Índice regenerado: {rows} filas en {time.perf_counter() - start:.1f}s"
+        ))
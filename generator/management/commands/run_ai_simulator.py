@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from generator.services.ai_simulator import AISimulator
+
+
+class Command(BaseCommand):
+    help = (
+        "Levanta un backend de IA simulado (/generate, /generate-project) para "
+        "probar y hacer pruebas de carga sin el servidor remoto. Apuntar "
+        "FASTAPI_URL (variable de entorno) a http://HOST:PORT"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8001)
+        parser.add_argument("--latency", type=float, default=0.5, help="Segundos hasta el primer token")
+        parser.add_argument("--tokens-per-second", type=float, default=40)
+        parser.add_argument("--error-rate", type=float, default=0.0, help="Fracción de respuestas 503 (0-1)")
+        parser.add_argument("--output-tokens", type=int, default=400, help="Tamaño aproximado de cada respuesta")
+        parser.add_argument("--seed", type=int, default=None)
+
+    def handle(self, *args, **options):
+        try:
+            import uvicorn
+        except ImportError:
+            raise CommandError("El simulador necesita uvicorn (pip install uvicorn)")
+
+        if not 0 <= options["error_rate"] <= 1:
+            raise CommandError("--error-rate debe estar entre 0 y 1")
+
+        app = AISimulator(
+            latency=options["latency"],
+            tokens_per_second=options["tokens_per_second"],
+            error_rate=options["error_rate"],
+            output_tokens=options["output_tokens"],
+            seed=options["seed"],
+        )
+        self.stdout.write(
+            f"Backend simulado en http://{options['host']}:{options['port']} "
+            f"(latencia {app.latency}s, {app.tokens_per_second} tokens/s, "
+            f"{app.output_tokens} tokens, errores {app.error_rate:.0%})"
+        )
+        uvicorn.run(app, host=options["host"], port=options["port"], log_level="warning")
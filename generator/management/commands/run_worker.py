@@ -0,0 +1,123 @@
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, close_old_connections, connections
+
+from generator.services.jobs import claim_job, run_job
+
+logger = logging.getLogger(__name__)
+
+
+def worker_loop(worker_id, stop_event, poll_interval, once=False, kinds=None):
+    while not stop_event.is_set():
+        close_old_connections()
+        try:
+            job = claim_job(worker_id, kinds=kinds)
+        except OperationalError:
+            # p.ej. "database is locked" en SQLite con varios workers
+            logger.warning("No se pudo reclamar un job, reintentando", exc_info=True)
+            stop_event.wait(poll_interval)
+            continue
+
+        if job is None:
+            if once:
+                break
+            stop_event.wait(poll_interval)
+            continue
+
+        run_job(job)
+
+    connections.close_all()
+
+
+def process_main(worker_id, threads, poll_interval, once, kinds):
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    run_threads(worker_id, threads, stop_event, poll_interval, once, kinds)
+
+
+def run_threads(worker_id, threads, stop_event, poll_interval, once, kinds):
+    pool = [
+        threading.Thread(
+            target=worker_loop,
+            args=(f"{worker_id}-t{i}", stop_event, poll_interval, once, kinds),
+            daemon=True,
+        )
+        for i in range(threads)
+    ]
+    for thread in pool:
+        thread.start()
+    try:
+        while any(thread.is_alive() for thread in pool):
+            for thread in pool:
+                thread.join(timeout=0.5)
+    except KeyboardInterrupt:
+        stop_event.set()
+
+
+def run_processes(worker_id, processes, threads, poll_interval, once, kinds):
+    # Las conexiones abiertas no deben heredarse en los procesos hijos
+    connections.close_all()
+    children = [
+        multiprocessing.Process(
+            target=process_main,
+            args=(f"{worker_id}-p{i}", threads, poll_interval, once, kinds),
+        )
+        for i in range(processes)
+    ]
+    for child in children:
+        child.start()
+
+    def stop_children(*_):
+        # SIGTERM a cada hijo: terminan el job en curso y salen
+        for child in children:
+            if child.is_alive():
+                child.terminate()
+
+    # Sin esto un SIGTERM (systemd, docker stop) mata al padre y deja los hijos huérfanos
+    signal.signal(signal.SIGTERM, stop_children)
+    try:
+        for child in children:
+            child.join()
+    except KeyboardInterrupt:
+        stop_children()
+        for child in children:
+            child.join()
+
+
+class Command(BaseCommand):
+    help = "Ejecuta jobs en segundo plano (generación de casos de proyectos, etc.)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=2, help="Hilos por proceso")
+        parser.add_argument("--processes", type=int, default=1, help="Procesos worker")
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=getattr(settings, "JOB_POLL_INTERVAL", 2),
+            help="Segundos de espera cuando no hay jobs"
+        )
+        parser.add_argument("--once", action="store_true", help="Procesa los jobs pendientes y termina")
+        parser.add_argument("--kind", action="append", dest="kinds", help="Solo estos tipos de job")
+
+    def handle(self, *args, **options):
+        worker_id = f"{socket.gethostname()}-{os.getpid()}"
+        threads = max(options["threads"], 1)
+        processes = max(options["processes"], 1)
+        poll_interval = options["poll_interval"]
+
+        self.stdout.write(f"Worker {worker_id}: {processes} proceso(s) x {threads} hilo(s)")
+
+        if processes == 1:
+            stop_event = threading.Event()
+            signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+            run_threads(worker_id, threads, stop_event, poll_interval, options["once"], options["kinds"])
+            return
+
+        run_processes(worker_id, processes, threads, poll_interval, options["once"], options["kinds"])
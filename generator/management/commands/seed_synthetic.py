@@ -0,0 +1,39 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from generator.services.synthetic import SYNTHETIC_PREFIX, clear_synthetic, seed_synthetic
+
+SCALES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+
+class Command(BaseCommand):
+    help = "Genera datos sintéticos deterministas (usuarios, proyectos, chats, mensajes, métricas)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scale", choices=sorted(SCALES), default="10k")
+        parser.add_argument("--messages", type=int, help="Cantidad exacta de mensajes (ignora --scale)")
+        parser.add_argument("--users", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--clear", action="store_true", help="Borra antes los datos sintéticos existentes")
+
+    def handle(self, *args, **options):
+        if options["clear"]:
+            self.stdout.write(f"Borrados {clear_synthetic()} objetos sintéticos")
+
+        if User.objects.filter(username__startswith=SYNTHETIC_PREFIX).exists():
+            raise CommandError("Ya hay datos sintéticos: usar --clear para regenerarlos")
+
+        start = time.perf_counter()
+        stats = seed_synthetic(
+            messages=options["messages"] or SCALES[options["scale"]],
+            users=options["users"],
+            seed=options["seed"],
+            log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Generados {stats['messages']} mensajes, {stats['users']} usuarios, "
+            f"{stats['projects']} proyectos y {stats['metrics']} métricas "
+            f"en {time.perf_counter() - start:.1f}s"
+        ))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from generator.services.response_cache import response_cache, warm_from_history
+
+
+class Command(BaseCommand):
+    help = "Precarga la caché de respuestas IA con los pares usuario/IA del historial de chats"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=None, help="Máximo de entradas a cargar")
+        parser.add_argument(
+            "--purge-expired",
+            action="store_true",
+            help="Elimina antes las entradas que superaron AI_CACHE_PERSISTENT_TTL"
+        )
+
+    def handle(self, *args, **options):
+        if options["purge_expired"]:
+            deleted = response_cache.purge_expired()
+            self.stdout.write(f"Entradas expiradas eliminadas: {deleted}")
+
+        stored = warm_from_history(limit=options["limit"])
+        self.stdout.write(self.style.SUCCESS(f"✅ {stored} respuestas cargadas en caché"))
@@ -0,0 +1,51 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .services.profiling import finish_profile, profile_request, server_timing
+
+
+class ProfilingMiddleware:
+    """
+    Mide cada petición: consultas SQL, tiempo de base de datos, espera al
+    backend de IA y tiempo propio de la vista. Lo guarda en el buffer de
+    services/profiling.py y lo devuelve en la cabecera Server-Timing.
+
+    Va primero en MIDDLEWARE para incluir las consultas de sesión y
+    autenticación. En respuestas en streaming solo se mide hasta que se
+    envían las cabeceras. Sincrónico y async: no obliga a las vistas ASGI
+    a pasar por un hilo.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, "PROFILING_ENABLED", True)
+        self.server_timing = getattr(settings, "PROFILING_SERVER_TIMING", True)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+        with profile_request(request.method, request.path) as profile:
+            response = self.get_response(request)
+        return self.finish(request, response, profile)
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+        with profile_request(request.method, request.path) as profile:
+            response = await self.get_response(request)
+        return self.finish(request, response, profile)
+
+    def finish(self, request, response, profile):
+        match = request.resolver_match
+        endpoint = match.route if match else "(sin ruta)"
+        record = finish_profile(profile, endpoint, response.status_code)
+        if self.server_timing:
+            response["Server-Timing"] = server_timing(record)
+        return response
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:12
+
+import generator.uploads
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('generator', '0008_cachedresponse'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='extracted_content',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='file_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='project',
+            name='file',
+            field=models.FileField(blank=True, null=True, storage=generator.uploads.get_content_addressed_storage, upload_to=generator.uploads.project_file_path),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:14
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def merge_duplicate_metrics(apps, schema_editor):
+    """Fusiona las filas sin proyecto repetidas para el mismo usuario/día."""
+    UsageMetric = apps.get_model("generator", "UsageMetric")
+
+    duplicated = (
+        UsageMetric.objects
+        .filter(project__isnull=True)
+        .values("user_id", "date")
+        .annotate(rows=Count("id"))
+        .filter(rows__gt=1)
+    )
+    for group in duplicated:
+        rows = list(
+            UsageMetric.objects
+            .filter(project__isnull=True, user_id=group["user_id"], date=group["date"])
+            .order_by("id")
+        )
+        keep, extra = rows[0], rows[1:]
+        for row in extra:
+            keep.total_chats += row.total_chats
+            keep.total_messages += row.total_messages
+            keep.total_ai_responses += row.total_ai_responses
+            keep.estimated_time_saved_minutes += row.estimated_time_saved_minutes
+            keep.estimated_accuracy = max(keep.estimated_accuracy, row.estimated_accuracy)
+        keep.save()
+        UsageMetric.objects.filter(id__in=[row.id for row in extra]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('generator', '0010_job'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_metrics, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='usagemetric',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='usagemetric',
+            constraint=models.UniqueConstraint(condition=models.Q(('project__isnull', False)), fields=('user', 'project', 'date'), name='unique_metric_user_project_date'),
+        ),
+        migrations.AddConstraint(
+            model_name='usagemetric',
+            constraint=models.UniqueConstraint(condition=models.Q(('project__isnull', True)), fields=('user', 'date'), name='unique_metric_user_date_no_project'),
+        ),
+    ]
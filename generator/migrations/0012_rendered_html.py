@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('generator', '0011_usagemetric_unique_per_day'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatmessage',
+            name='rendered_html',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='chatmessage',
+            name='rendered_version',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='test_cases_html',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='test_cases_html_version',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+    ]
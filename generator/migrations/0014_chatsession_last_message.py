@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:43
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Left
+
+
+def backfill_last_message(apps, schema_editor):
+    """Último mensaje de cada chat en un único UPDATE con subconsultas."""
+    ChatSession = apps.get_model("generator", "ChatSession")
+    ChatMessage = apps.get_model("generator", "ChatMessage")
+
+    last = ChatMessage.objects.filter(chat=OuterRef("pk")).order_by("-created_at", "-id")
+    ChatSession.objects.update(
+        last_message_at=Coalesce(Subquery(last.values("created_at")[:1]), F("created_at")),
+        last_message_preview=Coalesce(Left(Subquery(last.values("content")[:1]), 200), models.Value("")),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('generator', '0013_chatmessage_cursor_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatsession',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='chatsession',
+            name='last_message_preview',
+            field=models.CharField(blank=True, max_length=200),
+        ),
+        migrations.RunPython(backfill_last_message, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='chatsession',
+            index=models.Index(fields=['user', 'last_message_at', 'id'], name='chat_user_last_msg_idx'),
+        ),
+    ]
@@ -0,0 +1,142 @@
+from django.db import migrations
+
+# Tabla FTS5 única para mensajes, chats y proyectos. El rowid codifica
+# usuario, tipo (1 mensaje, 2 chat, 3 proyecto) e id:
+# (user_id << 40) + (tipo << 38) + id. Así los mensajes de un usuario (o
+# sus chats y proyectos) son un rango contiguo de rowids que FTS5 recorre
+# sin tocar el resto, y los triggers borran por rowid.
+MESSAGE_ROWID = "(s.user_id << 40) + (1 << 38) + {row}.id"
+CHAT_ROWID = "({row}.user_id << 40) + (2 << 38) + {row}.id"
+PROJECT_ROWID = "({row}.user_id << 40) + (3 << 38) + {row}.id"
+
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE generator_search USING fts5(
+        title, body,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+
+    # Mensajes (el usuario sale del chat)
+    f"""
+    CREATE TRIGGER generator_search_message_ai AFTER INSERT ON generator_chatmessage BEGIN
+        INSERT INTO generator_search(rowid, title, body)
+        SELECT {MESSAGE_ROWID.format(row="new")}, '', new.content
+        FROM generator_chatsession s WHERE s.id = new.chat_id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER generator_search_message_au AFTER UPDATE OF content ON generator_chatmessage BEGIN
+        DELETE FROM generator_search WHERE rowid = (
+            SELECT {MESSAGE_ROWID.format(row="old")} FROM generator_chatsession s WHERE s.id = old.chat_id
+        );
+        INSERT INTO generator_search(rowid, title, body)
+        SELECT {MESSAGE_ROWID.format(row="new")}, '', new.content
+        FROM generator_chatsession s WHERE s.id = new.chat_id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER generator_search_message_ad AFTER DELETE ON generator_chatmessage BEGIN
+        DELETE FROM generator_search WHERE rowid = (
+            SELECT {MESSAGE_ROWID.format(row="old")} FROM generator_chatsession s WHERE s.id = old.chat_id
+        );
+    END
+    """,
+
+    # Chats
+    f"""
+    CREATE TRIGGER generator_search_chat_ai AFTER INSERT ON generator_chatsession BEGIN
+        INSERT INTO generator_search(rowid, title, body)
+        VALUES ({CHAT_ROWID.format(row="new")}, new.title, '');
+    END
+    """,
+    f"""
+    CREATE TRIGGER generator_search_chat_au AFTER UPDATE OF title ON generator_chatsession BEGIN
+        DELETE FROM generator_search WHERE rowid = {CHAT_ROWID.format(row="old")};
+        INSERT INTO generator_search(rowid, title, body)
+        VALUES ({CHAT_ROWID.format(row="new")}, new.title, '');
+    END
+    """,
+    f"""
+    CREATE TRIGGER generator_search_chat_ad AFTER DELETE ON generator_chatsession BEGIN
+        DELETE FROM generator_search WHERE rowid = {CHAT_ROWID.format(row="old")};
+    END
+    """,
+
+    # Proyectos
+    f"""
+    CREATE TRIGGER generator_search_project_ai AFTER INSERT ON generator_project BEGIN
+        INSERT INTO generator_search(rowid, title, body)
+        VALUES ({PROJECT_ROWID.format(row="new")}, new.name, new.test_cases);
+    END
+    """,
+    f"""
+    CREATE TRIGGER generator_search_project_au AFTER UPDATE OF name, test_cases ON generator_project BEGIN
+        DELETE FROM generator_search WHERE rowid = {PROJECT_ROWID.format(row="old")};
+        INSERT INTO generator_search(rowid, title, body)
+        VALUES ({PROJECT_ROWID.format(row="new")}, new.name, new.test_cases);
+    END
+    """,
+    f"""
+    CREATE TRIGGER generator_search_project_ad AFTER DELETE ON generator_project BEGIN
+        DELETE FROM generator_search WHERE rowid = {PROJECT_ROWID.format(row="old")};
+    END
+    """,
+]
+
+# Carga inicial con lo que ya existe
+REBUILD_SQL = [
+    "DELETE FROM generator_search",
+    f"""
+    INSERT INTO generator_search(rowid, title, body)
+    SELECT {MESSAGE_ROWID.format(row="m")}, '', m.content
+    FROM generator_chatmessage m JOIN generator_chatsession s ON s.id = m.chat_id
+    """,
+    f"""
+    INSERT INTO generator_search(rowid, title, body)
+    SELECT {CHAT_ROWID.format(row="c")}, c.title, '' FROM generator_chatsession c
+    """,
+    f"""
+    INSERT INTO generator_search(rowid, title, body)
+    SELECT {PROJECT_ROWID.format(row="p")}, p.name, p.test_cases FROM generator_project p
+    """,
+    "INSERT INTO generator_search(generator_search) VALUES ('optimize')",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS generator_search_message_ai",
+    "DROP TRIGGER IF EXISTS generator_search_message_au",
+    "DROP TRIGGER IF EXISTS generator_search_message_ad",
+    "DROP TRIGGER IF EXISTS generator_search_chat_ai",
+    "DROP TRIGGER IF EXISTS generator_search_chat_au",
+    "DROP TRIGGER IF EXISTS generator_search_chat_ad",
+    "DROP TRIGGER IF EXISTS generator_search_project_ai",
+    "DROP TRIGGER IF EXISTS generator_search_project_au",
+    "DROP TRIGGER IF EXISTS generator_search_project_ad",
+    "DROP TABLE IF EXISTS generator_search",
+]
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for sql in CREATE_SQL + REBUILD_SQL:
+        schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for sql in DROP_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('generator', '0014_chatsession_last_message'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('generator', '0015_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatattachment',
+            index=models.Index(fields=['chat', 'uploaded_at'], name='attach_chat_uploaded_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usagemetric',
+            index=models.Index(fields=['user', 'date', 'total_ai_responses', 'estimated_time_saved_minutes', 'estimated_accuracy'], name='metric_user_date_cov_idx'),
+        ),
+    ]
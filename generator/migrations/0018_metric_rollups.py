@@ -0,0 +1,166 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Rollups de UsageMetric mantenidos por triggers: cada INSERT/UPDATE/DELETE
+# resta la fila vieja de sus buckets y suma la nueva. La resta es un UPDATE
+# (el bucket ya existe) y la suma un upsert. Semanas de lunes a domingo.
+METRICS = "generator_usagemetric"
+USER_ROLLUP = "generator_metricrollup"
+PROJECT_ROLLUP = "generator_projectmetricrollup"
+
+WEEK = "date({row}.date, '-' || ((CAST(strftime('%w', {row}.date) AS INTEGER) + 6) % 7) || ' days')"
+MONTH = "date({row}.date, 'start of month')"
+PERIODS = [("day", "{row}.date"), ("week", WEEK), ("month", MONTH)]
+
+ROLLED_COLUMNS = "user_id, project_id, date, total_ai_responses, estimated_time_saved_minutes, estimated_accuracy"
+
+
+def add_sql(row):
+    statements = [
+        f"""
+        INSERT INTO {USER_ROLLUP} (user_id, granularity, period_start, cases, time_saved, accuracy_sum, entries)
+        SELECT {row}.user_id, '{granularity}', {period.format(row=row)}, {row}.total_ai_responses,
+               {row}.estimated_time_saved_minutes, {row}.estimated_accuracy, 1
+        WHERE true
+        ON CONFLICT (user_id, granularity, period_start) DO UPDATE SET
+            cases = cases + excluded.cases,
+            time_saved = time_saved + excluded.time_saved,
+            accuracy_sum = accuracy_sum + excluded.accuracy_sum,
+            entries = entries + 1;
+        """
+        for granularity, period in PERIODS
+    ]
+    statements.append(f"""
+        INSERT INTO {PROJECT_ROLLUP} (user_id, project_id, month, cases, time_saved, accuracy_sum, entries)
+        SELECT {row}.user_id, {row}.project_id, {MONTH.format(row=row)}, {row}.total_ai_responses,
+               {row}.estimated_time_saved_minutes, {row}.estimated_accuracy, 1
+        WHERE {row}.project_id IS NOT NULL
+        ON CONFLICT (project_id, month) DO UPDATE SET
+            cases = cases + excluded.cases,
+            time_saved = time_saved + excluded.time_saved,
+            accuracy_sum = accuracy_sum + excluded.accuracy_sum,
+            entries = entries + 1;
+    """)
+    return "".join(statements)
+
+
+def subtract_sql(row):
+    update = f"""
+        cases = cases - {row}.total_ai_responses,
+        time_saved = time_saved - {row}.estimated_time_saved_minutes,
+        accuracy_sum = accuracy_sum - {row}.estimated_accuracy,
+        entries = entries - 1
+    """
+    statements = [
+        f"""
+        UPDATE {USER_ROLLUP} SET {update}
+        WHERE user_id = {row}.user_id AND granularity = '{granularity}' AND period_start = {period.format(row=row)};
+        """
+        for granularity, period in PERIODS
+    ]
+    statements.append(f"""
+        UPDATE {PROJECT_ROLLUP} SET {update}
+        WHERE project_id = {row}.project_id AND month = {MONTH.format(row=row)};
+    """)
+    return "".join(statements)
+
+
+CREATE_SQL = [
+    f"CREATE TRIGGER generator_rollup_ai AFTER INSERT ON {METRICS} BEGIN {add_sql('new')} END",
+    f"""
+    CREATE TRIGGER generator_rollup_au AFTER UPDATE OF {ROLLED_COLUMNS} ON {METRICS} BEGIN
+        {subtract_sql('old')} {add_sql('new')}
+    END
+    """,
+    f"CREATE TRIGGER generator_rollup_ad AFTER DELETE ON {METRICS} BEGIN {subtract_sql('old')} END",
+]
+
+# Carga inicial con las métricas que ya existen
+REBUILD_SQL = [
+    *(
+        f"""
+        INSERT INTO {USER_ROLLUP} (user_id, granularity, period_start, cases, time_saved, accuracy_sum, entries)
+        SELECT m.user_id, '{granularity}', {period.format(row="m")}, SUM(m.total_ai_responses),
+               SUM(m.estimated_time_saved_minutes), SUM(m.estimated_accuracy), COUNT(*)
+        FROM {METRICS} m
+        GROUP BY m.user_id, {period.format(row="m")}
+        """
+        for granularity, period in PERIODS
+    ),
+    f"""
+    INSERT INTO {PROJECT_ROLLUP} (user_id, project_id, month, cases, time_saved, accuracy_sum, entries)
+    SELECT m.user_id, m.project_id, {MONTH.format(row="m")}, SUM(m.total_ai_responses),
+           SUM(m.estimated_time_saved_minutes), SUM(m.estimated_accuracy), COUNT(*)
+    FROM {METRICS} m
+    WHERE m.project_id IS NOT NULL
+    GROUP BY m.user_id, m.project_id, {MONTH.format(row="m")}
+    """,
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS generator_rollup_ai",
+    "DROP TRIGGER IF EXISTS generator_rollup_au",
+    "DROP TRIGGER IF EXISTS generator_rollup_ad",
+]
+
+
+def create_rollup_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for sql in CREATE_SQL + REBUILD_SQL:
+        schema_editor.execute(sql)
+
+
+def drop_rollup_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for sql in DROP_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('generator', '0017_ai_telemetry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(max_length=5)),
+                ('period_start', models.DateField()),
+                ('cases', models.IntegerField(default=0)),
+                ('time_saved', models.IntegerField(default=0)),
+                ('accuracy_sum', models.FloatField(default=0.0)),
+                ('entries', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'granularity', 'period_start'), name='metric_rollup_period_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProjectMetricRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('cases', models.IntegerField(default=0)),
+                ('time_saved', models.IntegerField(default=0)),
+                ('accuracy_sum', models.FloatField(default=0.0)),
+                ('entries', models.IntegerField(default=0)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='generator.project')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'month'], name='project_rollup_user_month_idx')],
+                'constraints': [models.UniqueConstraint(fields=('project', 'month'), name='project_rollup_month_unique')],
+            },
+        ),
+        migrations.RunPython(create_rollup_triggers, drop_rollup_triggers),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('generator', '0021_dashboard_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='content_index',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
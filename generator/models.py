@@ -1,5 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+from .uploads import attachment_file_path, get_content_addressed_storage, project_file_path
 
 
 # -------------------------
@@ -10,14 +13,24 @@ class Project(models.Model):
     name = models.CharField(max_length=255)
     description = models.TextField(blank=True)
 
-    # ✅ ARCHIVO DEL PROYECTO
+    # ✅ ARCHIVO DEL PROYECTO (guardado una sola vez, por hash de contenido)
     file = models.FileField(
-        upload_to="projects/",
+        upload_to=project_file_path,
+        storage=get_content_addressed_storage,
         blank=True,
         null=True
     )
+    file_hash = models.CharField(max_length=64, blank=True, db_index=True)
+    extracted_content = models.TextField(blank=True)
+    # [ruta, inicio, fin] de cada archivo dentro de extracted_content
+    # (services/project_content.py). Null en proyectos anteriores: se parte
+    # por las cabeceras "### FILE:"
+    content_index = models.JSONField(null=True, blank=True)
 
     test_cases = models.TextField(blank=True)
+    # HTML de test_cases, renderizado al guardar (ver services/rendering.py)
+    test_cases_html = models.TextField(blank=True)
+    test_cases_html_version = models.CharField(max_length=20, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -51,6 +64,29 @@ class ChatSession(models.Model):
     total_messages = models.PositiveIntegerField(default=0)
     total_ai_messages = models.PositiveIntegerField(default=0)
 
+    # Último mensaje, desnormalizado para el historial (lo mantiene signals.py).
+    # Un chat sin mensajes usa su fecha de creación: el orden nunca tiene nulos.
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    last_message_preview = models.CharField(max_length=200, blank=True)
+
+    # Resumen de los turnos que ya no caben en el contexto enviado a la IA
+    # (services/chat_context.py): cubre los mensajes con id <= summary_until.
+    # Nulables: en SQLite se agregan con ALTER TABLE sin recrear la tabla
+    # (que rompería los triggers de búsqueda de la migración 0015)
+    context_summary = models.TextField(null=True, blank=True)
+    summary_until = models.PositiveBigIntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Historial: WHERE user = ? ORDER BY last_message_at DESC, id DESC
+            models.Index(fields=["user", "last_message_at", "id"], name="chat_user_last_msg_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.last_message_at is None:
+            self.last_message_at = timezone.now()
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.title} ({self.user.username})"
 
@@ -68,10 +104,19 @@ class ChatMessage(models.Model):
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
-    # Métricas IA
+    # Métricas IA (services/telemetry.py): duración total, primer fragmento
+    # y pausa media entre fragmentos del stream. Los tokens son estimados con
+    # el tokenizer local (services/tokens.py), no medidos por el backend: sin
+    # AI_TOKENIZER el conteo es aproximado
     response_time_ms = models.PositiveIntegerField(
         null=True, blank=True
     )
+    first_token_ms = models.PositiveIntegerField(
+        null=True, blank=True
+    )
+    chunk_gap_ms = models.PositiveIntegerField(
+        null=True, blank=True
+    )
     prompt_tokens = models.PositiveIntegerField(
         null=True, blank=True
     )
@@ -85,8 +130,16 @@ class ChatMessage(models.Model):
     success = models.BooleanField(default=True)
     error_message = models.TextField(blank=True)
 
+    # HTML del markdown de la IA, renderizado una vez al guardar
+    rendered_html = models.TextField(blank=True)
+    rendered_version = models.CharField(max_length=20, blank=True)
+
     class Meta:
         ordering = ["created_at"]
+        indexes = [
+            # Cursor (created_at, id) dentro de un chat
+            models.Index(fields=["chat", "created_at", "id"], name="chatmsg_chat_created_idx"),
+        ]
 
     def __str__(self):
         role = "Usuario" if self.is_user else "IA"
@@ -119,11 +172,103 @@ class UsageMetric(models.Model):
     estimated_accuracy = models.FloatField(default=0.0)
     
     class Meta:
-        unique_together = ('user', 'project', 'date')
-    
+        indexes = [
+            # Dashboard/métricas: WHERE user = ? [AND date BETWEEN] GROUP BY date,
+            # con las columnas sumadas incluidas (no se lee la tabla)
+            models.Index(
+                fields=["user", "date", "total_ai_responses", "estimated_time_saved_minutes", "estimated_accuracy"],
+                name="metric_user_date_cov_idx",
+            ),
+        ]
+        # Una fila por usuario/proyecto/día. Dos restricciones parciales
+        # porque en UNIQUE los NULL (sin proyecto) no se consideran iguales.
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "project", "date"],
+                condition=models.Q(project__isnull=False),
+                name="unique_metric_user_project_date",
+            ),
+            models.UniqueConstraint(
+                fields=["user", "date"],
+                condition=models.Q(project__isnull=True),
+                name="unique_metric_user_date_no_project",
+            ),
+        ]
+
     def __str__(self):
         return f"Métricas {self.user.username} - {self.date}"
 
+# -------------------------
+# ROLLUPS DE MÉTRICAS (services/metric_rollups.py)
+# -------------------------
+# Sumas de UsageMetric por usuario y día/semana/mes, y por proyecto y mes.
+# Las mantienen triggers de SQLite (migración 0018), así que cubren también
+# los UPDATE con F() de signals.py y los bulk_create. La precisión se guarda
+# como suma + cantidad de filas para poder promediar entre buckets.
+class MetricRollup(models.Model):
+    DAY = "day"
+    WEEK = "week"  # lunes a domingo
+    MONTH = "month"
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    granularity = models.CharField(max_length=5)
+    period_start = models.DateField()
+
+    cases = models.IntegerField(default=0)
+    time_saved = models.IntegerField(default=0)
+    accuracy_sum = models.FloatField(default=0.0)
+    entries = models.IntegerField(default=0)  # filas de UsageMetric sumadas
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "granularity", "period_start"], name="metric_rollup_period_unique"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.granularity} {self.period_start}"
+
+
+class ProjectMetricRollup(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name="+")
+    month = models.DateField()
+
+    cases = models.IntegerField(default=0)
+    time_saved = models.IntegerField(default=0)
+    accuracy_sum = models.FloatField(default=0.0)
+    entries = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["project", "month"], name="project_rollup_month_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["user", "month"], name="project_rollup_user_month_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.project_id} {self.month}"
+
+
+# -------------------------
+# VERSIÓN DEL DASHBOARD (services/dashboard.py)
+# -------------------------
+class DashboardVersion(models.Model):
+    """
+    Versión del dashboard de cada usuario (time_ns de la última escritura
+    que lo afecta). En la base y no en la caché: la ven igual el servidor
+    web y el worker de jobs, así una métrica escrita por el worker cambia
+    el ETag y llega a los dashboards abiertos.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name="+")
+    version = models.BigIntegerField()
+
+    def __str__(self):
+        return f"{self.user_id}: {self.version}"
+
+
 class UserProfile(models.Model):
     user = models.OneToOneField(
         User,
@@ -146,15 +291,153 @@ class UserProfile(models.Model):
     def __str__(self):
         return f"Perfil de {self.user.username}"
 
+# -------------------------
+# ADJUNTOS (un archivo por contenido)
+# -------------------------
+class AttachmentBlob(models.Model):
+    """
+    Imagen guardada una sola vez por SHA-256 y compartida por todos los
+    adjuntos con el mismo contenido. `ref_count` cuenta esos adjuntos: el
+    archivo se borra al soltar la última referencia (services/attachments.py).
+    """
+    sha256 = models.CharField(max_length=64, unique=True)
+    file = models.FileField(upload_to=attachment_file_path, storage=get_content_addressed_storage)
+    size = models.PositiveIntegerField(default=0)
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    ref_count = models.PositiveIntegerField(default=0)
+
+    # Versiones WebP generadas en segundo plano: {"320": "chat_files/ab/<hash>-320.webp"}
+    variants = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.sha256
+
+
 class ChatAttachment(models.Model):
     chat = models.ForeignKey(
         ChatSession,
         related_name="attachments",
         on_delete=models.CASCADE
     )
+    # Sin blob: adjunto anterior al almacenamiento por contenido
+    blob = models.ForeignKey(
+        AttachmentBlob,
+        related_name="attachments",
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True
+    )
     file = models.FileField(upload_to="chat_files/")
     file_type = models.CharField(max_length=20)  # document, image, file
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Adjuntos recientes del chat: WHERE chat = ? ORDER BY uploaded_at DESC
+            models.Index(fields=["chat", "uploaded_at"], name="attach_chat_uploaded_idx"),
+        ]
+
     def __str__(self):
         return self.file.name
+
+    @property
+    def preview_url(self):
+        """La versión más chica disponible (el original si aún no hay)."""
+        variants = self.blob.variants if self.blob_id else {}
+        if not variants:
+            return self.file.url
+        return self.blob.file.storage.url(variants[min(variants, key=int)])
+
+    @property
+    def srcset(self):
+        if not self.blob_id or not self.blob.variants:
+            return ""
+        storage = self.blob.file.storage
+        sources = [(int(width), storage.url(name)) for width, name in self.blob.variants.items()]
+        if self.blob.width:
+            sources.append((self.blob.width, self.file.url))
+        return ", ".join(f"{url} {width}w" for width, url in sorted(sources))
+
+
+# -------------------------
+# CACHÉ DE RESPUESTAS IA
+# -------------------------
+class CachedResponse(models.Model):
+    key = models.CharField(max_length=64, unique=True)
+    backend_version = models.CharField(max_length=50)
+    requirement = models.TextField()
+    context = models.TextField(blank=True)
+    response = models.TextField()
+
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_hit_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.backend_version}: {self.requirement[:40]}"
+
+
+# -------------------------
+# COLA DE TRABAJOS EN SEGUNDO PLANO
+# -------------------------
+class Job(models.Model):
+    STATUS_PENDING = "pending"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pendiente"),
+        (STATUS_RUNNING, "En proceso"),
+        (STATUS_DONE, "Completado"),
+        (STATUS_FAILED, "Fallido"),
+    ]
+
+    kind = models.CharField(max_length=50)
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="jobs"
+    )
+    project = models.ForeignKey(
+        Project,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="jobs"
+    )
+    payload = models.JSONField(default=dict, blank=True)
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    progress = models.PositiveSmallIntegerField(default=0)  # 0-100
+    progress_message = models.CharField(max_length=255, blank=True)
+    result = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+
+    # Reintentos y visibilidad: un job "running" cuyo lock venció
+    # (worker caído) vuelve a estar disponible para otro worker.
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "run_after"]),
+        ]
+
+    @property
+    def is_active(self):
+        return self.status in (self.STATUS_PENDING, self.STATUS_RUNNING)
+
+    def __str__(self):
+        return f"{self.kind} #{self.id} ({self.status})"
@@ -1,64 +1,166 @@
 import json
-import requests
-from django.conf import settings
+import logging
 
-def generate_test_cases(data: dict) -> str:
+from .http_client import get_async_client, get_client
+from .response_cache import cache_key, replay_lines, response_cache
+from .telemetry import OUTCOME_CACHE, OUTCOME_ERROR, GenerationTelemetry
+
+logger = logging.getLogger(__name__)
+
+# Las llamadas no streaming también leen la respuesta como stream: así el
+# primer byte (cabeceras) y el final se miden por separado.
+# Ninguna generación es idempotente: reintentar un ReadTimeout o un 504
+# repetiría minutos de trabajo del backend, así que el cliente solo las
+# reintenta si la petición no llegó a salir (conexión / pool).
+
+
+def _replay_cached(cached, telemetry, endpoint, prompt):
+    telemetry.start(endpoint, prompt)
+    telemetry.chunk()
+    telemetry.finish(cached, OUTCOME_CACHE)
+    return cached
+
+
+def generate_test_cases(data: dict, telemetry: GenerationTelemetry = None) -> str:
     """Generación normal (no streaming)"""
+    telemetry = telemetry or GenerationTelemetry()
     requirement_text = data["requirement"]
     if data.get("context"):
         requirement_text = f"CONTEXTO:\n{data['context']}\nREQUERIMIENTO:\n{data['requirement']}"
 
+    key = cache_key(data["requirement"], data.get("context", ""))
+    cached = response_cache.get(key)
+    if cached is not None:
+        return _replay_cached(cached, telemetry, "/generate", requirement_text)
+
     payload = {"requirement": requirement_text}
-    response = requests.post(
-        settings.FASTAPI_URL + "/generate",
-        json=payload,
-        timeout=200
-    )
-    response.raise_for_status()
-    return response.json().get("test_cases", "")
+    telemetry.start("/generate", requirement_text)
+    try:
+        with get_client().stream(
+            "/generate",
+            json=payload,
+            read_timeout=200
+        ) as response:
+            telemetry.chunk()
+            response.raise_for_status()
+            test_cases = json.loads(response.read()).get("test_cases", "")
+    except Exception:
+        telemetry.finish(outcome=OUTCOME_ERROR)
+        raise
+    telemetry.finish(test_cases)
+
+    response_cache.set(key, data["requirement"], data.get("context", ""), test_cases)
+    return test_cases
 
 
-def generate_test_cases_stream(data: dict):
+def generate_test_cases_stream(data: dict, telemetry: GenerationTelemetry = None):
     """
     Genera test cases en streaming, línea por línea, con saltos de línea intactos.
+    Si la respuesta está en caché se reproduce con el mismo formato.
     """
+    telemetry = telemetry or GenerationTelemetry()
+    key = cache_key(data["requirement"], data.get("context", ""))
+    cached = response_cache.get(key)
+    if cached is not None:
+        _replay_cached(cached, telemetry, "/generate (stream)", data["requirement"] + data.get("context", ""))
+        yield from replay_lines(cached)
+        return
+
     payload = {
         "requirement": data["requirement"],
         "context": data.get("context", ""),
         "stream": True
     }
 
-    response = requests.post(
-        settings.FASTAPI_URL + "/generate",
-        json=payload,
-        stream=True,
-        timeout=600
-    )
-    response.raise_for_status()
+    telemetry.start("/generate (stream)", payload["requirement"] + payload["context"])
+    lines = []
+    try:
+        with get_client().stream(
+            "/generate",
+            json=payload,
+            read_timeout=600
+        ) as response:
+            response.raise_for_status()
 
-    # Iterar línea por línea y mantener saltos de línea
-    for line in response.iter_lines(decode_unicode=True):
-        if line:
-            yield line + "\n"
+            # Iterar línea por línea y mantener saltos de línea
+            for line in response.iter_lines():
+                if line:
+                    telemetry.chunk()
+                    lines.append(line + "\n")
+                    yield line + "\n"
+    except BaseException:
+        # También si el cliente corta el stream (GeneratorExit)
+        telemetry.finish("".join(lines), OUTCOME_ERROR)
+        raise
+    telemetry.finish("".join(lines))
 
+    # Solo se cachea una respuesta completa (stream no interrumpido)
+    response_cache.set(key, data["requirement"], data.get("context", ""), "".join(lines))
 
 
-def generate_project_test_cases(project_content: str) -> str:
-    print("recibido y enviando a /generate-project ....")
+async def agenerate_test_cases_stream(data: dict, telemetry: GenerationTelemetry = None):
+    """
+    Versión async de generate_test_cases_stream para vistas ASGI:
+    el stream no ocupa un hilo mientras espera al backend.
+    """
+    telemetry = telemetry or GenerationTelemetry()
+    key = cache_key(data["requirement"], data.get("context", ""))
+    cached = await response_cache.aget(key)
+    if cached is not None:
+        _replay_cached(cached, telemetry, "/generate (stream)", data["requirement"] + data.get("context", ""))
+        for line in replay_lines(cached):
+            yield line
+        return
 
-    response = requests.post(
-        settings.FASTAPI_URL + "/generate-project",
-        json={"project_content": project_content},
-        timeout=600
-    )
+    payload = {
+        "requirement": data["requirement"],
+        "context": data.get("context", ""),
+        "stream": True
+    }
 
-    print("status:", response.status_code)
-    print("raw response:", response.text)
+    telemetry.start("/generate (stream)", payload["requirement"] + payload["context"])
+    lines = []
+    try:
+        async with get_async_client().stream(
+            "/generate",
+            json=payload,
+            read_timeout=600
+        ) as response:
+            response.raise_for_status()
 
-    response.raise_for_status()  # 🔴 SI FALLA, PARA AQUÍ
+            async for line in response.aiter_lines():
+                if line:
+                    telemetry.chunk()
+                    lines.append(line + "\n")
+                    yield line + "\n"
+    except BaseException:
+        telemetry.finish("".join(lines), OUTCOME_ERROR)
+        raise
+    telemetry.finish("".join(lines))
 
-    data = response.json()
-    print("test_cases recibidos:", data.get("test_cases", ""))
+    await response_cache.aset(key, data["requirement"], data.get("context", ""), "".join(lines))
 
-    return data.get("test_cases", "")
 
+def generate_project_test_cases(project_content: str, telemetry: GenerationTelemetry = None) -> str:
+    logger.debug("Enviando %s caracteres a /generate-project", len(project_content))
+    telemetry = telemetry or GenerationTelemetry()
+    telemetry.start("/generate-project", project_content)
+
+    try:
+        with get_client().stream(
+            "/generate-project",
+            json={"project_content": project_content},
+            read_timeout=600
+        ) as response:
+            telemetry.chunk()
+            body = response.read()
+            logger.debug("/generate-project respondió %s (%s bytes)", response.status_code, len(body))
+
+            response.raise_for_status()  # 🔴 SI FALLA, PARA AQUÍ
+    except Exception:
+        telemetry.finish(outcome=OUTCOME_ERROR)
+        raise
+
+    data = json.loads(body)
+    telemetry.finish(data.get("test_cases", ""))
+    return data.get("test_cases", "")
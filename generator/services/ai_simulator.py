@@ -0,0 +1,128 @@
+import asyncio
+import json
+import random
+
+from .tokens import count_tokens
+
+# Casos que devuelve el simulador; se repiten (con IDs nuevos) hasta el
+# tamaño pedido
+CASE_TEMPLATE = (
+    "**ID:** TC-{n:03d}\n"
+    "**Título:** {subject} - escenario {n}\n"
+    "**Pasos:**\n"
+    "1. Abrir {subject}\n"
+    "2. Ingresar datos de prueba del escenario {n}\n"
+    "3. Confirmar la operación\n"
+    "**Resultado esperado:** El sistema responde según el requerimiento\n"
+)
+
+
+class AISimulator:
+    """
+    Sustituto local del backend de IA (ASGI puro, sin FastAPI): mismas
+    rutas y formato que el backend real.
+
+    - POST /generate {"requirement", "context", "stream"}: JSON
+      {"test_cases"} o, con stream, texto línea por línea.
+    - POST /generate-project {"project_content"}: JSON {"test_cases"}.
+
+    `latency` es la espera antes del primer token, `tokens_per_second` el
+    ritmo del resto y `output_tokens` el tamaño aproximado de la respuesta.
+    Con probabilidad `error_rate` responde 503 antes de generar; ojo que
+    el cliente reintenta los 503 (AI_HTTP_MAX_RETRIES), así que a Django
+    llegan menos errores que los simulados.
+    """
+
+    def __init__(self, latency=0.5, tokens_per_second=40, error_rate=0.0, output_tokens=400, seed=None):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.output_tokens = output_tokens
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+
+    # -------------------------
+    # RESPUESTA SIMULADA
+    # -------------------------
+    def lines(self, prompt: str) -> list:
+        """(línea, tokens) de la respuesta hasta output_tokens."""
+        subject = " ".join(prompt.split()[:6]) or "el sistema"
+        lines, total, n = [], 0, 0
+        while total < self.output_tokens:
+            n += 1
+            for line in CASE_TEMPLATE.format(n=n, subject=subject).splitlines():
+                tokens = count_tokens(line)
+                lines.append((line, tokens))
+                total += tokens
+        return lines
+
+    def _delay(self, tokens):
+        return tokens / self.tokens_per_second if self.tokens_per_second else 0
+
+    # -------------------------
+    # ASGI
+    # -------------------------
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        if scope["type"] != "http":
+            return
+
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+
+        path = scope["path"].rstrip("/")
+        if scope["method"] != "POST" or path not in ("/generate", "/generate-project"):
+            await self._json(send, 404, {"detail": "Not Found"})
+            return
+        try:
+            data = json.loads(body or b"{}")
+        except ValueError:
+            await self._json(send, 422, {"detail": "JSON inválido"})
+            return
+
+        self.requests += 1
+        if self.error_rate and self.rng.random() < self.error_rate:
+            self.errors += 1
+            await asyncio.sleep(self.latency / 10)
+            await self._json(send, 503, {"detail": "Error simulado"})
+            return
+
+        prompt = data.get("project_content") or data.get("requirement") or ""
+        lines = self.lines(prompt)
+        await asyncio.sleep(self.latency)
+
+        if path == "/generate" and data.get("stream"):
+            await send({
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-type", b"text/plain; charset=utf-8")],
+            })
+            for line, tokens in lines:
+                await asyncio.sleep(self._delay(tokens))
+                await send({"type": "http.response.body", "body": (line + "\n").encode(), "more_body": True})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        await asyncio.sleep(self._delay(sum(tokens for _, tokens in lines)))
+        await self._json(send, 200, {"test_cases": "\n".join(line for line, _ in lines) + "\n"})
+
+    async def _json(self, send, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,147 @@
+import io
+import logging
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import F
+
+from ..models import AttachmentBlob, ChatAttachment
+from ..uploads import file_sha256
+from .jobs import enqueue, register
+
+logger = logging.getLogger(__name__)
+
+ATTACHMENT_VARIANTS_JOB = "attachment_variants"
+
+
+class InvalidImage(ValueError):
+    pass
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def image_size(file):
+    """(ancho, alto) leyendo solo la cabecera; InvalidImage si no es una imagen."""
+    from PIL import Image
+
+    try:
+        file.seek(0)
+        with Image.open(file) as image:
+            return image.size
+    except (OSError, Image.DecompressionBombError) as exc:
+        raise InvalidImage(str(exc)) from exc
+    finally:
+        file.seek(0)
+
+
+# -------------------------
+# REFERENCIAS
+# -------------------------
+def store_attachment(chat, upload, file_hash="") -> ChatAttachment:
+    """
+    Adjunta la imagen al chat. Si el contenido ya existe (mismo SHA-256,
+    en cualquier chat) solo se suma una referencia al blob; si es nuevo se
+    guarda el archivo y se encolan sus miniaturas.
+    """
+    file_hash = file_hash or file_sha256(upload)
+    width, height = image_size(upload)
+
+    with transaction.atomic():
+        blob, created = AttachmentBlob.objects.select_for_update().get_or_create(
+            sha256=file_hash,
+            defaults={"file": upload, "size": upload.size, "width": width, "height": height},
+        )
+        AttachmentBlob.objects.filter(pk=blob.pk).update(ref_count=F("ref_count") + 1)
+        attachment = ChatAttachment.objects.create(
+            chat=chat,
+            blob=blob,
+            file=blob.file.name,
+            file_type="image",
+        )
+        if created:
+            enqueue(ATTACHMENT_VARIANTS_JOB, user=chat.user, payload={"blob_id": blob.pk})
+
+    return attachment
+
+
+def release_blob(blob_id):
+    """
+    Resta la referencia de un adjunto borrado; con la última se borran el
+    blob y sus archivos (al confirmar la transacción: si se revierte, el
+    adjunto vuelve y el archivo sigue ahí).
+    """
+    with transaction.atomic():
+        AttachmentBlob.objects.filter(pk=blob_id, ref_count__gt=0).update(ref_count=F("ref_count") - 1)
+        blob = AttachmentBlob.objects.select_for_update().filter(pk=blob_id, ref_count=0).first()
+        if blob is None:
+            return
+        names = [blob.file.name, *blob.variants.values()]
+        storage = blob.file.storage
+        blob.delete()
+
+    transaction.on_commit(lambda: _delete_files(storage, names))
+
+
+def _delete_files(storage, names):
+    for name in names:
+        try:
+            storage.delete(name)
+        except OSError:
+            logger.warning("No se pudo borrar %s", name, exc_info=True)
+
+
+# -------------------------
+# MINIATURAS (jobs: `run_worker`)
+# -------------------------
+def variant_widths():
+    return sorted(_setting("ATTACHMENT_VARIANT_WIDTHS", [320, 1280]))
+
+
+def render_variants(file, widths, quality=80) -> dict:
+    """
+    {ancho: bytes WebP} de la imagen, solo para los anchos menores que el
+    original (no se amplía). Sin ORM: se puede llamar desde cualquier hilo.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(file) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            has_alpha = "A" in image.getbands() or "transparency" in image.info
+            image = image.convert("RGBA" if has_alpha else "RGB")
+
+        variants = {}
+        for width in widths:
+            if width >= image.width:
+                break
+            height = max(round(image.height * width / image.width), 1)
+            buffer = io.BytesIO()
+            image.resize((width, height), Image.Resampling.LANCZOS).save(buffer, "WEBP", quality=quality, method=4)
+            variants[width] = buffer.getvalue()
+        return variants
+
+
+@register(ATTACHMENT_VARIANTS_JOB)
+def generate_attachment_variants(job):
+    blob = AttachmentBlob.objects.filter(pk=job.payload.get("blob_id")).first()
+    if blob is None:
+        return {"variants": 0}  # se borró antes de llegar al worker
+
+    with blob.file.open("rb") as file:
+        rendered = render_variants(file, variant_widths(), _setting("ATTACHMENT_WEBP_QUALITY", 80))
+
+    storage = blob.file.storage
+    base = os.path.splitext(blob.file.name)[0]
+    variants = {
+        str(width): storage.save(f"{base}-{width}.webp", ContentFile(data))
+        for width, data in rendered.items()
+    }
+
+    # Si el último adjunto se borró mientras tanto, nadie más borrará estos archivos
+    if not AttachmentBlob.objects.filter(pk=blob.pk).update(variants=variants):
+        _delete_files(storage, variants.values())
+    return {"variants": len(variants)}
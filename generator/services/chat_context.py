@@ -0,0 +1,124 @@
+from django.conf import settings
+
+from ..models import ChatMessage, ChatSession
+from .project_generation import CASE_ID
+from .tokens import count_tokens, split_by_tokens, token_budget
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _head(text, max_tokens):
+    """Primeros `max_tokens` tokens de `text` en una sola línea."""
+    text = " ".join(text.split())
+    parts = split_by_tokens(text, max_tokens)
+    if len(parts) <= 1:
+        return text
+    return parts[0].rstrip() + " …"
+
+
+# -------------------------
+# RESUMEN ACUMULADO
+# -------------------------
+def summarize_turn(message) -> str:
+    """
+    Una línea por mensaje, sin llamar a la IA: el pedido del usuario
+    recortado y, de las respuestas, los IDs de los casos generados.
+    """
+    turn_tokens = _setting("CHAT_SUMMARY_TURN_TOKENS", 60)
+    if message.is_user:
+        return "Usuario: " + _head(message.content, turn_tokens)
+
+    ids = list(dict.fromkeys(
+        f"{prefix.upper()}-{number}" for _, prefix, number in CASE_ID.findall(message.content)
+    ))
+    if ids:
+        return f"IA: {len(ids)} caso(s) generados: " + _head(", ".join(ids), turn_tokens)
+    return "IA: " + _head(message.content, turn_tokens)
+
+
+def roll_summary(summary, messages) -> str:
+    """
+    Agrega los mensajes al resumen y lo deja en CHAT_SUMMARY_TOKENS: se
+    conserva la primera línea (el requerimiento inicial del chat) y se
+    descartan las más viejas después de ella.
+    """
+    lines = summary.splitlines() if summary else []
+    lines.extend(summarize_turn(message) for message in messages)
+
+    budget = token_budget(_setting("CHAT_SUMMARY_TOKENS", 300))
+    sizes = [count_tokens(line) for line in lines]
+    while len(lines) > 1 and sum(sizes) > budget:
+        del lines[1], sizes[1]
+    return "\n".join(lines)
+
+
+# -------------------------
+# CONTEXTO PARA LA IA
+# -------------------------
+def format_turn(message) -> str:
+    return f"{'Usuario' if message.is_user else 'IA'}: {message.content.strip()}"
+
+
+def assemble_context(pending, summary):
+    """
+    Arma el contexto con los mensajes aún sin resumir (`pending`, del más
+    nuevo al más viejo) y el resumen guardado, dentro de
+    CHAT_CONTEXT_TOKENS. Devuelve (contexto, resumen, id del último
+    mensaje resumido o None si el resumen no cambió). No toca la base:
+    warm_from_history lo usa para rehacer el contexto de cada petición.
+    """
+    budget = token_budget(_setting("CHAT_CONTEXT_TOKENS", 1500))
+    recent_budget = budget - token_budget(_setting("CHAT_SUMMARY_TOKENS", 300))
+
+    recent, older, used = [], [], 0
+    for message in pending:
+        if older:
+            older.append(message)
+            continue
+        text = format_turn(message)
+        tokens = count_tokens(text)
+        if used + tokens <= recent_budget:
+            recent.append(text)
+            used += tokens
+        elif not recent:
+            # El último mensaje solo ya no cabe: va su comienzo
+            recent.append(split_by_tokens(text, recent_budget)[0])
+            older.append(message)
+        else:
+            older.append(message)
+
+    summary = summary or ""
+    if older:
+        summary = roll_summary(summary, reversed(older))
+
+    parts = []
+    if summary:
+        parts.append(f"RESUMEN DE LA CONVERSACIÓN:\n{summary}")
+    if recent:
+        parts.append("MENSAJES RECIENTES:\n" + "\n\n".join(reversed(recent)))
+    return "\n\n".join(parts), summary, older[0].id if older else None
+
+
+def build_chat_context(chat) -> str:
+    """
+    Historial del chat para el campo "context" del backend, dentro de
+    CHAT_CONTEXT_TOKENS: los mensajes más recientes completos y, antes, el
+    resumen de los anteriores. Los mensajes que salen de la ventana se
+    suman una sola vez al resumen guardado en ChatSession, así cada
+    petición solo lee los mensajes aún sin resumir y el tamaño del prompt
+    no crece con la conversación. Los presupuestos pasan por token_budget().
+    """
+    pending = ChatMessage.objects.filter(chat_id=chat.id).only("id", "is_user", "content").order_by("-id")
+    if chat.summary_until is not None:
+        pending = pending.filter(id__gt=chat.summary_until)
+
+    context, summary, summary_until = assemble_context(pending.iterator(), chat.context_summary)
+    if summary_until is not None:
+        # Si otra petición del mismo chat ya lo actualizó, gana la suya
+        ChatSession.objects.filter(id=chat.id, summary_until=chat.summary_until).update(
+            context_summary=summary, summary_until=summary_until
+        )
+        chat.context_summary, chat.summary_until = summary, summary_until
+    return context
@@ -0,0 +1,260 @@
+import asyncio
+import json
+import time
+from datetime import datetime, timezone
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Avg, Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from ..models import ChatMessage, ChatSession, DashboardVersion, Project, UsageMetric
+from .pubsub import get_broker
+
+SNAPSHOT_TTL = 60 * 60
+
+
+# -------------------------
+# VERSIÓN POR USUARIO
+# -------------------------
+def _snapshot_key(user_id, version):
+    return f"dashboard:snapshot:{user_id}:{version}"
+
+
+def _info(version):
+    return {"version": version, "updated_at": version / 1e9}
+
+
+def get_version(user_id) -> dict:
+    """
+    {"version", "updated_at"} del usuario: una lectura por clave primaria
+    de DashboardVersion, compartida por todos los procesos. Es lo único
+    que toca la base un polling sin cambios (responde 304).
+    """
+    version = DashboardVersion.objects.filter(user_id=user_id).values_list("version", flat=True).first()
+    if version is None:
+        DashboardVersion.objects.bulk_create(
+            [DashboardVersion(user_id=user_id, version=time.time_ns())], ignore_conflicts=True
+        )
+        version = DashboardVersion.objects.values_list("version", flat=True).get(user_id=user_id)
+    return _info(version)
+
+
+def dashboard_channel(user_id):
+    return f"dashboard:{user_id}"
+
+
+def bump_version(user_id) -> int:
+    """Nueva versión del usuario (un upsert); va en la transacción del cambio."""
+    version = time.time_ns()
+    DashboardVersion.objects.bulk_create(
+        [DashboardVersion(user_id=user_id, version=version)],
+        update_conflicts=True,
+        unique_fields=["user"],
+        update_fields=["version"],
+    )
+    return version
+
+
+def publish_version(user_id, version):
+    # Avisa a los dashboards abiertos (SSE) de este proceso; los de otros
+    # procesos ven la nueva versión en su próxima consulta (dashboard_events)
+    get_broker().publish(dashboard_channel(user_id), version)
+
+
+def invalidate(user_id):
+    publish_version(user_id, bump_version(user_id))
+
+
+def _request_version(request):
+    # ETag y Last-Modified de la misma petición: una sola lectura
+    if not hasattr(request, "_dashboard_version"):
+        request._dashboard_version = get_version(request.user.pk)
+    return request._dashboard_version
+
+
+def dashboard_etag(request, *args, **kwargs):
+    if not request.user.is_authenticated:
+        return None
+    return f'"{request.user.pk}-{_request_version(request)["version"]}"'
+
+
+def dashboard_last_modified(request, *args, **kwargs):
+    if not request.user.is_authenticated:
+        return None
+    return datetime.fromtimestamp(int(_request_version(request)["updated_at"]), tz=timezone.utc)
+
+
+# -------------------------
+# SNAPSHOT
+# -------------------------
+def _scalar(queryset, expression):
+    """Subquery escalar agregada por usuario (para anotar sobre User)."""
+    return Subquery(queryset.values("user").annotate(value=expression).values("value")[:1])
+
+
+def build_snapshot(user) -> dict:
+    metrics = UsageMetric.objects.filter(user=OuterRef("pk"))
+    # Último mensaje: el del chat con actividad más reciente (índice
+    # user/last_message_at) y dentro de él por (created_at, id). Filtrar
+    # por chat__user obligaba a ordenar todos los mensajes del usuario.
+    latest_chat = (
+        ChatSession.objects
+        .filter(user=OuterRef(OuterRef("pk")), total_messages__gt=0)
+        .order_by("-last_message_at", "-id")
+        .values("id")[:1]
+    )
+    last_message = (
+        ChatMessage.objects
+        .filter(chat=Subquery(latest_chat))
+        .order_by("-created_at", "-id")
+    )
+
+    # KPIs en una sola query
+    kpis = (
+        User.objects
+        .filter(pk=user.pk)
+        .annotate(
+            total_cases=Coalesce(_scalar(metrics, Sum("total_ai_responses")), 0),
+            time_saved=Coalesce(_scalar(metrics, Sum("estimated_time_saved_minutes")), 0),
+            accuracy=Coalesce(_scalar(metrics, Avg("estimated_accuracy")), 0.0),
+            total_projects=Coalesce(_scalar(Project.objects.filter(user=OuterRef("pk")), Count("id")), 0),
+            total_chats=Coalesce(_scalar(ChatSession.objects.filter(user=OuterRef("pk")), Count("id")), 0),
+            last_content=Subquery(last_message.values("content")[:1]),
+            last_created_at=Subquery(last_message.values("created_at")[:1]),
+        )
+        .values(
+            "total_cases", "time_saved", "accuracy", "total_projects",
+            "total_chats", "last_content", "last_created_at",
+        )
+        .get()
+    )
+
+    daily = list(
+        UsageMetric.objects
+        .filter(user=user)
+        .values("date")
+        .annotate(
+            cases=Sum("total_ai_responses"),
+            time_saved=Sum("estimated_time_saved_minutes")
+        )
+        .order_by("date")
+    )
+
+    projects = list(
+        UsageMetric.objects
+        .filter(user=user, project__isnull=False)
+        .values("project__name")
+        .annotate(
+            cases=Sum("total_ai_responses"),
+            time_saved=Sum("estimated_time_saved_minutes"),
+            accuracy=Avg("estimated_accuracy")
+        )
+        .order_by("-cases")
+    )
+
+    last_activity = None
+    if kpis["last_content"] is not None:
+        last_activity = {
+            "content": kpis["last_content"],
+            "created_at": kpis["last_created_at"],
+        }
+
+    return {
+        "total_cases": kpis["total_cases"],
+        "total_projects": kpis["total_projects"],
+        "total_chats": kpis["total_chats"],
+        "time_saved": kpis["time_saved"],
+        "accuracy": round(kpis["accuracy"], 1),
+        "last_activity": last_activity,
+        "daily": daily,
+        "projects": projects,
+    }
+
+
+def get_dashboard_snapshot(user) -> dict:
+    key = _snapshot_key(user.pk, get_version(user.pk)["version"])
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build_snapshot(user)
+        cache.set(key, snapshot, SNAPSHOT_TTL)
+    return snapshot
+
+
+def metrics_payload(snapshot) -> dict:
+    return {
+        "total_cases": snapshot["total_cases"],
+        "total_projects": snapshot["total_projects"],
+        "time_saved": snapshot["time_saved"],
+        "accuracy": snapshot["accuracy"],
+        "last_activity": snapshot["last_activity"],
+    }
+
+
+def charts_payload(snapshot) -> dict:
+    return {
+        "daily": snapshot["daily"],
+        "projects": snapshot["projects"],
+    }
+
+
+# -------------------------
+# SSE
+# -------------------------
+SSE_EVENTS = {
+    "metrics": metrics_payload,
+    "charts": charts_payload,
+}
+
+
+async def dashboard_events(user, heartbeat=25, poll=2, retry_ms=5000):
+    """
+    Stream SSE del dashboard: envía el estado actual al conectar y después
+    solo los eventos cuyo contenido cambió. Las escrituras de este proceso
+    llegan al instante por el broker; las de otros (el worker de jobs, otro
+    worker web) se detectan leyendo la versión en la base cada `poll`
+    segundos. Sin cambios, cada `heartbeat` segundos manda un comentario
+    (mantiene vivos los proxies).
+    """
+    subscription = get_broker().subscribe(dashboard_channel(user.pk))
+    get_snapshot = sync_to_async(get_dashboard_snapshot)
+    current_version = sync_to_async(lambda: get_version(user.pk)["version"])
+    sent = {}
+
+    async def changed_events():
+        snapshot = await get_snapshot(user)
+        chunks = []
+        for event, payload in SSE_EVENTS.items():
+            data = json.dumps(payload(snapshot), cls=DjangoJSONEncoder)
+            if sent.get(event) != data:
+                sent[event] = data
+                chunks.append(f"event: {event}\ndata: {data}\n\n")
+        return chunks
+
+    try:
+        yield f"retry: {retry_ms}\n\n"
+        version = await current_version()
+        for chunk in await changed_events():
+            yield chunk
+
+        idle = 0.0
+        while True:
+            try:
+                await subscription.get(timeout=poll)
+                subscription.drain()
+            except asyncio.TimeoutError:
+                if await current_version() == version:
+                    idle += poll
+                    if idle >= heartbeat:
+                        idle = 0.0
+                        yield ": ping\n\n"
+                    continue
+
+            idle = 0.0
+            version = await current_version()
+            for chunk in await changed_events():
+                yield chunk
+    finally:
+        subscription.close()
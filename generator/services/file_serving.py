@@ -0,0 +1,127 @@
+import re
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import content_disposition_header, parse_etags
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+CHUNK_SIZE = 64 * 1024
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def parse_range(header, size):
+    """
+    (inicio, fin) inclusivos de un único rango "bytes=a-b". None si no hay
+    rango utilizable (se sirve completo); ValueError si no es satisfacible.
+    Varios rangos separados por coma no se soportan: se sirve completo.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+
+    first, last = match.groups()
+    if first == "":
+        # Sufijo: los últimos N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("Rango vacío")
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("Rango fuera del archivo")
+    return start, end
+
+
+def _read_range(file, start, length):
+    try:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+
+def _sendfile(storage, name):
+    """
+    Respuesta vacía con la cabecera para que nginx (X-Accel-Redirect) o
+    Apache (X-Sendfile) envíen el archivo, con Range incluido.
+    """
+    backend = _setting("SENDFILE_BACKEND", None)
+    if not backend or not isinstance(storage, FileSystemStorage):
+        return None
+
+    response = HttpResponse()
+    if backend == "nginx":
+        response["X-Accel-Redirect"] = _setting("SENDFILE_URL_PREFIX", "/protected/") + name
+    elif backend == "apache":
+        response["X-Sendfile"] = storage.path(name)
+    else:
+        return None
+    # El servidor web pone el Content-Type según el archivo
+    del response["Content-Type"]
+    return response
+
+
+def serve_file(request, storage, name, *, etag, filename=None, content_type=None,
+               as_attachment=True, cache_control="private, no-cache"):
+    """
+    Sirve `name` del storage con ETag/304 y Range/206. Si hay
+    SENDFILE_BACKEND lo envía el servidor web; si no, FileResponse
+    (o un stream del rango pedido).
+    """
+    etag = f'"{etag}"'
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Accept-Ranges": "bytes"}
+
+    if etag in parse_etags(request.headers.get("If-None-Match", "")):
+        response = HttpResponseNotModified()
+        for header, value in headers.items():
+            response[header] = value
+        return response
+
+    disposition = content_disposition_header(as_attachment, filename) if filename else None
+
+    response = _sendfile(storage, name)
+    if response is None:
+        size = storage.size(name)
+        byte_range = None
+        # If-Range: solo se respeta el rango si el cliente tiene esta versión
+        if request.headers.get("If-Range", etag) == etag:
+            try:
+                byte_range = parse_range(request.headers.get("Range"), size)
+            except ValueError:
+                response = HttpResponse(status=416)
+                response["Content-Range"] = f"bytes */{size}"
+                return response
+
+        if byte_range is None:
+            response = FileResponse(
+                storage.open(name, "rb"),
+                as_attachment=as_attachment,
+                filename=filename or "",
+                content_type=content_type,
+            )
+        else:
+            start, end = byte_range
+            response = StreamingHttpResponse(
+                _read_range(storage.open(name, "rb"), start, end - start + 1),
+                status=206,
+                content_type=content_type or "application/octet-stream",
+            )
+            response["Content-Range"] = f"bytes {start}-{end}/{size}"
+            response["Content-Length"] = str(end - start + 1)
+
+    if disposition:
+        response["Content-Disposition"] = disposition
+    for header, value in headers.items():
+        response[header] = value
+    return response
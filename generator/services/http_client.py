@@ -0,0 +1,394 @@
+import asyncio
+import importlib.util
+import logging
+import random
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+
+import httpx
+from django.conf import settings
+
+from .profiling import ai_timer
+from .telemetry import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+# Estados que indican un fallo transitorio del backend / túnel (ngrok)
+RETRY_STATUS_CODES = (502, 503, 504)
+
+# Errores en los que la petición nunca llegó al backend: siempre se pueden reintentar
+CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+# Errores a mitad de petición: solo se reintentan si la llamada es idempotente
+TRANSIENT_ERRORS = (httpx.ReadTimeout, httpx.RemoteProtocolError, httpx.ReadError)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+class PoolStats:
+    """Contadores del pool compartidos entre hilos."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.opened = 0
+        self.reused = 0
+        self.waiting = 0
+        self.retries = 0
+
+    def incr(self, field, amount=1):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + amount)
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "connections_opened": self.opened,
+                "connections_reused": self.reused,
+                "waiting": self.waiting,
+                "retries": self.retries,
+            }
+
+
+class _RequestTrace:
+    """
+    Callback de la extensión `trace` de httpcore para una petición:
+    detecta si abrió conexión nueva y cuándo deja de esperar al pool.
+    """
+
+    def __init__(self, stats: PoolStats):
+        self.stats = stats
+        self.new_connection = False
+        self.is_waiting = True
+        stats.incr("waiting")
+
+    def __call__(self, event_name, info):
+        if event_name == "connection.connect_tcp.started":
+            self.new_connection = True
+            self.stats.incr("opened")
+        elif event_name.endswith("send_request_headers.started"):
+            self.done_waiting()
+
+    def done_waiting(self):
+        if self.is_waiting:
+            self.is_waiting = False
+            self.stats.incr("waiting", -1)
+
+    def finish(self):
+        self.done_waiting()
+        if not self.new_connection:
+            self.stats.incr("reused")
+
+
+class _AsyncRequestTrace(_RequestTrace):
+    """Igual que _RequestTrace, pero httpcore async exige un callback async."""
+
+    async def __call__(self, event_name, info):
+        super().__call__(event_name, info)
+
+
+class AIHttpClient:
+    """
+    Cliente HTTP compartido (thread-safe) hacia el backend de IA.
+
+    Mantiene un pool de conexiones keep-alive (HTTP/2 opcional), aplica
+    timeouts de conexión/lectura por llamada y reintenta fallos transitorios
+    con backoff exponencial acotado.
+    """
+
+    client_class = httpx.Client
+
+    def __init__(
+        self,
+        base_url=None,
+        *,
+        pool_size=None,
+        keepalive_expiry=None,
+        http2=None,
+        connect_timeout=None,
+        read_timeout=None,
+        pool_timeout=None,
+        max_retries=None,
+        backoff=None,
+        backoff_max=None,
+        transport=None,
+    ):
+        self.base_url = base_url or settings.FASTAPI_URL
+        self.pool_size = pool_size or _setting("AI_HTTP_POOL_SIZE", 10)
+        self.connect_timeout = connect_timeout or _setting("AI_HTTP_CONNECT_TIMEOUT", 10)
+        self.read_timeout = read_timeout or _setting("AI_HTTP_READ_TIMEOUT", 200)
+        self.pool_timeout = pool_timeout or _setting("AI_HTTP_POOL_TIMEOUT", 5)
+        self.max_retries = _setting("AI_HTTP_MAX_RETRIES", 2) if max_retries is None else max_retries
+        self.backoff = _setting("AI_HTTP_BACKOFF", 0.5) if backoff is None else backoff
+        self.backoff_max = _setting("AI_HTTP_BACKOFF_MAX", 5) if backoff_max is None else backoff_max
+
+        http2 = _setting("AI_HTTP2", False) if http2 is None else http2
+        if http2 and not _http2_available():
+            logger.warning("AI_HTTP2 activo pero el paquete 'h2' no está instalado; se usa HTTP/1.1")
+            http2 = False
+        self.http2 = http2
+
+        self.stats_counters = PoolStats()
+        self._client = self.client_class(
+            base_url=self.base_url,
+            http2=self.http2,
+            limits=httpx.Limits(
+                max_connections=self.pool_size,
+                max_keepalive_connections=self.pool_size,
+                keepalive_expiry=keepalive_expiry or _setting("AI_HTTP_KEEPALIVE_EXPIRY", 60),
+            ),
+            timeout=self._timeout(None),
+            transport=transport,
+        )
+
+    # -------------------------
+    # Helpers
+    # -------------------------
+    def _timeout(self, read_timeout):
+        return httpx.Timeout(
+            connect=self.connect_timeout,
+            read=read_timeout or self.read_timeout,
+            write=self.connect_timeout,
+            # Corto: con el pool lleno se falla rápido (PoolTimeout se reintenta)
+            pool=self.pool_timeout,
+        )
+
+    def _backoff_delay(self, attempt):
+        self.stats_counters.incr("retries")
+        delay = min(self.backoff_max, self.backoff * (2 ** attempt))
+        # jitter para no sincronizar reintentos de varios workers
+        return delay * random.uniform(0.5, 1.0)
+
+    def _sleep_backoff(self, attempt):
+        time.sleep(self._backoff_delay(attempt))
+
+    def _should_retry(self, attempt, idempotent, exc=None, response=None):
+        if attempt >= self.max_retries:
+            return False
+        if exc is not None:
+            if isinstance(exc, CONNECT_ERRORS):
+                return True
+            return idempotent and isinstance(exc, TRANSIENT_ERRORS)
+        return idempotent and response.status_code in RETRY_STATUS_CODES
+
+    def _send(self, method, path, *, json=None, read_timeout=None, idempotent=False, stream=False):
+        attempt = 0
+        while True:
+            trace = _RequestTrace(self.stats_counters)
+            self.stats_counters.incr("requests")
+            request = self._client.build_request(
+                method,
+                path,
+                json=json,
+                timeout=self._timeout(read_timeout),
+                extensions={"trace": trace},
+            )
+            try:
+                response = self._client.send(request, stream=stream)
+            except httpx.TransportError as exc:
+                trace.finish()
+                if not self._should_retry(attempt, idempotent, exc=exc):
+                    raise
+                logger.warning("Fallo hacia %s%s (%s), reintentando", self.base_url, path, exc)
+                self._sleep_backoff(attempt)
+                attempt += 1
+                continue
+
+            trace.finish()
+            if self._should_retry(attempt, idempotent, response=response):
+                logger.warning("Backend respondió %s en %s, reintentando", response.status_code, path)
+                response.close()
+                self._sleep_backoff(attempt)
+                attempt += 1
+                continue
+
+            return response
+
+    # -------------------------
+    # API pública
+    # -------------------------
+    def post(self, path, json=None, *, read_timeout=None, idempotent=False) -> httpx.Response:
+        with ai_timer():
+            return self._send("POST", path, json=json, read_timeout=read_timeout, idempotent=idempotent)
+
+    @contextmanager
+    def stream(self, path, json=None, *, read_timeout=None, idempotent=False):
+        """
+        POST en streaming. Solo se reintenta antes de recibir el cuerpo;
+        al salir del bloque la conexión vuelve al pool. El tiempo de
+        espera al backend cuenta todo el bloque.
+        """
+        with ai_timer():
+            response = self._send(
+                "POST", path, json=json, read_timeout=read_timeout,
+                idempotent=idempotent, stream=True
+            )
+            try:
+                yield response
+            finally:
+                response.close()
+
+    def open_connections(self) -> int:
+        pool = getattr(getattr(self._client, "_transport", None), "_pool", None)
+        return len(getattr(pool, "connections", []))
+
+    def stats(self) -> dict:
+        data = self.stats_counters.as_dict()
+        data["connections_open"] = self.open_connections()
+        data["pool_size"] = self.pool_size
+        data["http2"] = self.http2
+        return data
+
+    def close(self):
+        self._client.close()
+
+
+class AsyncAIHttpClient(AIHttpClient):
+    """
+    Variante asyncio del cliente para las vistas ASGI: misma configuración,
+    reintentos y estadísticas, sin bloquear un hilo por stream.
+    """
+
+    client_class = httpx.AsyncClient
+
+    async def _send(self, method, path, *, json=None, read_timeout=None, idempotent=False, stream=False):
+        attempt = 0
+        while True:
+            trace = _AsyncRequestTrace(self.stats_counters)
+            self.stats_counters.incr("requests")
+            request = self._client.build_request(
+                method,
+                path,
+                json=json,
+                timeout=self._timeout(read_timeout),
+                extensions={"trace": trace},
+            )
+            try:
+                response = await self._client.send(request, stream=stream)
+            except httpx.TransportError as exc:
+                trace.finish()
+                if not self._should_retry(attempt, idempotent, exc=exc):
+                    raise
+                logger.warning("Fallo hacia %s%s (%s), reintentando", self.base_url, path, exc)
+                await asyncio.sleep(self._backoff_delay(attempt))
+                attempt += 1
+                continue
+
+            trace.finish()
+            if self._should_retry(attempt, idempotent, response=response):
+                logger.warning("Backend respondió %s en %s, reintentando", response.status_code, path)
+                await response.aclose()
+                await asyncio.sleep(self._backoff_delay(attempt))
+                attempt += 1
+                continue
+
+            return response
+
+    async def post(self, path, json=None, *, read_timeout=None, idempotent=False) -> httpx.Response:
+        with ai_timer():
+            return await self._send("POST", path, json=json, read_timeout=read_timeout, idempotent=idempotent)
+
+    @asynccontextmanager
+    async def stream(self, path, json=None, *, read_timeout=None, idempotent=False):
+        with ai_timer():
+            response = await self._send(
+                "POST", path, json=json, read_timeout=read_timeout,
+                idempotent=idempotent, stream=True
+            )
+            try:
+                yield response
+            finally:
+                await response.aclose()
+
+    async def close(self):
+        await self._client.aclose()
+
+
+# -------------------------
+# Cliente compartido del proceso
+# -------------------------
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> AIHttpClient:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = AIHttpClient()
+    return _client
+
+
+def close_client():
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+# Un AsyncClient queda ligado a su event loop: uno por loop
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client() -> AsyncAIHttpClient:
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = AsyncAIHttpClient()
+    return client
+
+
+async def aclose_async_clients():
+    loop = asyncio.get_running_loop()
+    client = _async_clients.pop(loop, None)
+    if client is not None:
+        await client.close()
+
+
+# -------------------------
+# MÉTRICAS DEL POOL (/metrics)
+# -------------------------
+POOL_COUNTERS = {
+    "requests": ("qa_ai_http_requests_total", "Peticiones HTTP al backend de IA (incluye reintentos)"),
+    "retries": ("qa_ai_http_retries_total", "Reintentos hacia el backend de IA"),
+    "connections_opened": ("qa_ai_http_connections_opened_total", "Conexiones nuevas al backend de IA"),
+    "connections_reused": ("qa_ai_http_connections_reused_total", "Peticiones que reutilizaron una conexión"),
+}
+POOL_GAUGES = {
+    "connections_open": ("qa_ai_http_connections_open", "Conexiones abiertas en el pool"),
+    "waiting": ("qa_ai_http_pool_waiting", "Peticiones esperando una conexión libre"),
+    "pool_size": ("qa_ai_http_pool_size", "Máximo de conexiones del pool"),
+}
+
+
+def render_pool_metrics() -> str:
+    """
+    Estado de los clientes de este proceso en formato de Prometheus: el
+    sync (vistas WSGI, worker) y los async (uno por event loop) se suman
+    por tipo. Sin cliente creado aún no hay series.
+    """
+    clients = [("sync", _client)] if _client is not None else []
+    clients += [("async", client) for client in list(_async_clients.values())]
+
+    series = {key: Counter(name, help_text, ["client"]) for key, (name, help_text) in POOL_COUNTERS.items()}
+    series.update({key: Gauge(name, help_text, ["client"]) for key, (name, help_text) in POOL_GAUGES.items()})
+    for kind, client in clients:
+        stats = client.stats()
+        for key, metric in series.items():
+            metric.inc(kind, amount=stats[key])
+
+    lines = []
+    for metric in series.values():
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,182 @@
+import logging
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F, Q
+from django.utils.timezone import now
+
+from ..models import Job
+
+logger = logging.getLogger(__name__)
+
+# kind -> función(job) que devuelve un dict con el resultado
+HANDLERS = {}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def register(kind):
+    def decorator(func):
+        HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+def enqueue(kind, *, user=None, project=None, payload=None, max_attempts=None) -> Job:
+    return Job.objects.create(
+        kind=kind,
+        user=user,
+        project=project,
+        payload=payload or {},
+        max_attempts=max_attempts or _setting("JOB_MAX_ATTEMPTS", 3),
+    )
+
+
+# -------------------------
+# RECLAMAR / LATIDO
+# -------------------------
+def _available(current_time):
+    return (
+        Q(status=Job.STATUS_PENDING, run_after__lte=current_time)
+        | Q(status=Job.STATUS_RUNNING, locked_until__lt=current_time)
+    )
+
+
+def claim_job(worker_id, kinds=None):
+    """
+    Reserva el siguiente job disponible con un UPDATE condicional:
+    si otro worker lo tomó antes, el UPDATE no afecta filas y se prueba
+    con el siguiente. No requiere SELECT ... FOR UPDATE (SQLite).
+    """
+    current_time = now()
+    candidates = Job.objects.filter(_available(current_time))
+    if kinds:
+        candidates = candidates.filter(kind__in=kinds)
+
+    for job_id in candidates.order_by("run_after", "id").values_list("id", flat=True)[:10]:
+        claimed = Job.objects.filter(_available(current_time), id=job_id).update(
+            status=Job.STATUS_RUNNING,
+            locked_by=worker_id,
+            locked_until=current_time + timedelta(seconds=_setting("JOB_VISIBILITY_TIMEOUT", 120)),
+            attempts=F("attempts") + 1,
+            updated_at=current_time,
+        )
+        if claimed:
+            return Job.objects.get(id=job_id)
+
+    return None
+
+
+def heartbeat(job) -> bool:
+    """Extiende la visibilidad; False si el job ya no pertenece a este worker."""
+    return bool(
+        Job.objects.filter(id=job.id, locked_by=job.locked_by, status=Job.STATUS_RUNNING).update(
+            locked_until=now() + timedelta(seconds=_setting("JOB_VISIBILITY_TIMEOUT", 120)),
+        )
+    )
+
+
+def report_progress(job, progress, message=""):
+    job.progress = max(0, min(int(progress), 100))
+    job.progress_message = message[:255]
+    Job.objects.filter(id=job.id, locked_by=job.locked_by).update(
+        progress=job.progress,
+        progress_message=job.progress_message,
+        locked_until=now() + timedelta(seconds=_setting("JOB_VISIBILITY_TIMEOUT", 120)),
+        updated_at=now(),
+    )
+
+
+class _Heartbeat(threading.Thread):
+    """Renueva el lock mientras el handler trabaja (llamadas largas al backend)."""
+
+    def __init__(self, job):
+        super().__init__(daemon=True)
+        self.job = job
+        self.stopped = threading.Event()
+        self.interval = max(_setting("JOB_VISIBILITY_TIMEOUT", 120) / 3, 1)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                heartbeat(self.job)
+            finally:
+                close_old_connections()
+
+    def stop(self):
+        self.stopped.set()
+
+
+# -------------------------
+# EJECUCIÓN
+# -------------------------
+def _finish(job, **fields):
+    fields.setdefault("updated_at", now())
+    Job.objects.filter(id=job.id, locked_by=job.locked_by).update(**fields)
+    for name, value in fields.items():
+        setattr(job, name, value)
+
+
+def run_job(job):
+    handler = HANDLERS.get(job.kind)
+    if handler is None:
+        _finish(job, status=Job.STATUS_FAILED, error=f"Tipo de job desconocido: {job.kind}", finished_at=now())
+        return job
+
+    # Reclamado de nuevo tras agotar los intentos (p.ej. el worker murió cada vez)
+    if job.attempts > job.max_attempts:
+        _finish(job, status=Job.STATUS_FAILED, error=job.error or "Se agotaron los intentos", finished_at=now())
+        return job
+
+    beat = _Heartbeat(job)
+    beat.start()
+    try:
+        result = handler(job) or {}
+    except Exception as exc:
+        logger.exception("Job %s falló (intento %s/%s)", job.id, job.attempts, job.max_attempts)
+        error = "".join(traceback.format_exception_only(type(exc), exc)).strip()
+
+        if job.attempts < job.max_attempts:
+            delay = _setting("JOB_RETRY_BACKOFF", 30) * (2 ** (job.attempts - 1))
+            _finish(
+                job,
+                status=Job.STATUS_PENDING,
+                error=error,
+                locked_by="",
+                locked_until=None,
+                run_after=now() + timedelta(seconds=delay),
+            )
+        else:
+            _finish(job, status=Job.STATUS_FAILED, error=error, finished_at=now())
+    else:
+        _finish(
+            job,
+            status=Job.STATUS_DONE,
+            result=result,
+            progress=100,
+            error="",
+            finished_at=now(),
+        )
+    finally:
+        beat.stop()
+
+    return job
+
+
+def job_status(job) -> dict:
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "progress": job.progress,
+        "message": job.progress_message,
+        "error": job.error if job.status == Job.STATUS_FAILED else "",
+        "attempts": job.attempts,
+        "project_id": job.project_id,
+        "result": job.result,
+    }
@@ -0,0 +1,222 @@
+import asyncio
+import random
+import statistics
+import time
+from collections import Counter
+
+import httpx
+
+# Peso de cada escenario por defecto: sobre todo se mira el dashboard y se chatea
+DEFAULT_MIX = {"chat": 3, "upload": 1, "dashboard": 6}
+
+CHAT_MESSAGES = [
+    "Genera casos de prueba para el login con usuario bloqueado",
+    "Casos negativos del formulario de registro",
+    "Valida el flujo de pago con tarjeta vencida",
+    "Escenarios de recuperación de contraseña por correo",
+]
+
+# Texto del archivo de cada proyecto subido (más de 200 caracteres: el
+# mínimo para generar casos). Lleva el usuario y un contador para que el
+# hash cambie y no se reutilice un proyecto ya procesado.
+PROJECT_TEXT = (
+    "Requerimiento {n} de {user}: el sistema debe permitir que el usuario inicie "
+    "sesión con correo y contraseña, bloquear la cuenta después de tres intentos "
+    "fallidos, enviar un correo de desbloqueo y registrar cada intento en la "
+    "bitácora de auditoría con fecha, IP y resultado.\n"
+)
+
+
+def parse_mix(text: str) -> dict:
+    """"chat=3,upload=1" -> {"chat": 3, "upload": 1}."""
+    mix = {}
+    for part in filter(None, (part.strip() for part in text.split(","))):
+        name, _, weight = part.partition("=")
+        if name not in DEFAULT_MIX:
+            raise ValueError(f"Escenario desconocido: {name}")
+        mix[name] = float(weight or 1)
+    if not any(mix.values()):
+        raise ValueError("La mezcla no tiene ningún escenario con peso")
+    return mix
+
+
+# -------------------------
+# RESULTADOS
+# -------------------------
+class LoadStats:
+    """Latencias y errores por operación (un solo event loop: sin locks)."""
+
+    def __init__(self):
+        self.timings = {}
+        self.errors = {}
+        self.error_kinds = Counter()
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def record(self, name, ms, error=None):
+        self.timings.setdefault(name, []).append(ms)
+        self.errors.setdefault(name, 0)
+        if error:
+            self.errors[name] += 1
+            self.error_kinds[f"{name}: {error}"] += 1
+
+    def report(self) -> dict:
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        operations = {}
+        for name, timings in sorted(self.timings.items()):
+            timings = sorted(timings)
+            operations[name] = {
+                "requests": len(timings),
+                "errors": self.errors[name],
+                "error_rate": round(self.errors[name] / len(timings), 4),
+                "rps": round(len(timings) / elapsed, 2) if elapsed else 0,
+                "p50": round(statistics.median(timings), 1),
+                "p95": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 1),
+                "p99": round(timings[min(len(timings) - 1, int(len(timings) * 0.99))], 1),
+            }
+        total = sum(len(timings) for timings in self.timings.values())
+        return {
+            "elapsed_s": round(elapsed, 1),
+            "requests": total,
+            "rps": round(total / elapsed, 2) if elapsed else 0,
+            "errors": sum(self.errors.values()),
+            "operations": operations,
+            "error_kinds": dict(self.error_kinds.most_common(10)),
+        }
+
+
+# -------------------------
+# USUARIO VIRTUAL
+# -------------------------
+class VirtualUser:
+    """Un usuario con su propia sesión (cookies) que repite escenarios."""
+
+    def __init__(self, client: httpx.AsyncClient, username, password, stats, rng, job_timeout=0):
+        self.client = client
+        self.username = username
+        self.password = password
+        self.stats = stats
+        self.rng = rng
+        self.job_timeout = job_timeout
+        self.uploads = 0
+
+    async def request(self, name, method, url, expected=(200,), **kwargs):
+        """Petición medida; devuelve la respuesta o None si falló."""
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError as exc:
+            self.stats.record(name, (time.perf_counter() - start) * 1000, type(exc).__name__)
+            return None
+        ok = response.status_code in expected
+        self.stats.record(name, (time.perf_counter() - start) * 1000, None if ok else f"HTTP {response.status_code}")
+        return response if ok else None
+
+    def csrf_headers(self):
+        return {"X-CSRFToken": self.client.cookies.get("csrftoken", ""), "Referer": str(self.client.base_url)}
+
+    async def login(self):
+        await self.request("login (form)", "GET", "/")
+        response = await self.request(
+            "login", "POST", "/", expected=(302,), headers=self.csrf_headers(),
+            data={"username": self.username, "password": self.password},
+        )
+        return response is not None and "/dashboard/" in response.headers.get("location", "")
+
+    # -------------------------
+    # Escenarios
+    # -------------------------
+    async def chat(self):
+        response = await self.request("chat (nuevo)", "GET", "/chat/", expected=(302,))
+        if response is None:
+            return
+        chat_url = response.headers["location"]
+        await self.request("chat", "GET", chat_url)
+
+        # Tiempo al primer fragmento y total del stream de la IA
+        start = time.perf_counter()
+        first = None
+        try:
+            async with self.client.stream(
+                "GET", f"{chat_url.rstrip('/')}/stream/",
+                params={"message": f"{self.rng.choice(CHAT_MESSAGES)} #{self.rng.randint(1, 10**6)}"},
+            ) as stream:
+                if stream.status_code != 200:
+                    self.stats.record("chat (respuesta IA)", (time.perf_counter() - start) * 1000,
+                                      f"HTTP {stream.status_code}")
+                    return
+                async for chunk in stream.aiter_bytes():
+                    if chunk and first is None:
+                        first = time.perf_counter()
+        except httpx.HTTPError as exc:
+            self.stats.record("chat (respuesta IA)", (time.perf_counter() - start) * 1000, type(exc).__name__)
+            return
+
+        end = time.perf_counter()
+        if first is None:
+            self.stats.record("chat (respuesta IA)", (end - start) * 1000, "respuesta vacía")
+            return
+        self.stats.record("chat (primer fragmento)", (first - start) * 1000)
+        self.stats.record("chat (respuesta IA)", (end - start) * 1000)
+
+    async def upload(self):
+        self.uploads += 1
+        name = f"Carga {self.username} {self.uploads} {self.rng.randint(1, 10**9)}"
+        content = "".join(PROJECT_TEXT.format(n=i, user=name) for i in range(3))
+        response = await self.request(
+            "upload", "POST", "/upload-project/",
+            headers={**self.csrf_headers(), "X-Requested-With": "XMLHttpRequest"},
+            data={"name": name, "description": "Prueba de carga"},
+            files={"file": (f"{name}.txt", content.encode(), "text/plain")},
+        )
+        if response is None or not self.job_timeout:
+            return
+
+        # Hasta que el worker termina el job (requiere `run_worker`)
+        job_id = response.json().get("job_id")
+        if not job_id:
+            return
+        start = time.perf_counter()
+        while time.perf_counter() - start < self.job_timeout:
+            await asyncio.sleep(1)
+            poll = await self.request("job status", "GET", f"/api/jobs/{job_id}/")
+            status = poll.json()["status"] if poll is not None else None
+            if status in ("done", "failed"):
+                self.stats.record("upload (job completo)", (time.perf_counter() - start) * 1000,
+                                  None if status == "done" else "job fallido")
+                return
+        self.stats.record("upload (job completo)", (time.perf_counter() - start) * 1000, "timeout")
+
+    async def dashboard(self):
+        await self.request("dashboard", "GET", "/dashboard/")
+        await self.request("api dashboard metrics", "GET", "/api/dashboard/metrics/")
+        await self.request("api dashboard charts", "GET", "/api/dashboard/charts/")
+
+
+async def _user_loop(base_url, username, password, stats, mix, deadline, think, job_timeout, seed):
+    rng = random.Random(seed)
+    names, weights = zip(*mix.items())
+    async with httpx.AsyncClient(base_url=base_url, timeout=httpx.Timeout(120, connect=10)) as client:
+        user = VirtualUser(client, username, password, stats, rng, job_timeout)
+        if not await user.login():
+            return
+        while time.perf_counter() < deadline:
+            await getattr(user, rng.choices(names, weights)[0])()
+            # Pausa de "lectura" entre acciones, exponencial alrededor de `think`
+            if think:
+                await asyncio.sleep(min(rng.expovariate(1 / think), think * 5))
+
+
+async def run_load_test(base_url, credentials, duration=30, mix=None, think=1.0, job_timeout=0, seed=1) -> dict:
+    """
+    `credentials` es una lista de (usuario, contraseña), un usuario virtual
+    por par, todos a la vez contra `base_url` durante `duration` segundos.
+    """
+    stats = LoadStats()
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*(
+        _user_loop(base_url, username, password, stats, mix or DEFAULT_MIX, deadline, think, job_timeout, seed + i)
+        for i, (username, password) in enumerate(credentials)
+    ))
+    stats.finished = time.perf_counter()
+    return stats.report()
@@ -0,0 +1,86 @@
+import mimetypes
+import os
+import re
+
+from django.core.files.storage import default_storage
+
+from ..models import AttachmentBlob, ChatAttachment, Project
+from ..uploads import content_addressed_storage
+
+# Nombre = hash del contenido: nunca cambia, el navegador lo guarda un año
+IMMUTABLE = "private, max-age=31536000, immutable"
+REVALIDATE = "private, no-cache"
+
+# chat_files/ab/<sha256>.png y sus versiones chat_files/ab/<sha256>-320.webp
+BLOB_NAME = re.compile(r"^chat_files/[0-9a-f]{2}/(?P<sha256>[0-9a-f]{64})(?:-(?P<width>\d+))?\.\w+$")
+
+
+def _media(storage, name, etag, cache_control=REVALIDATE, filename=None, as_attachment=False):
+    """Argumentos de serve_file para el archivo."""
+    return {
+        "storage": storage,
+        "name": name,
+        "etag": etag,
+        "cache_control": cache_control,
+        "filename": filename,
+        "as_attachment": as_attachment,
+        "content_type": mimetypes.guess_type(name)[0] or "application/octet-stream",
+    }
+
+
+def _mutable_etag(storage, name):
+    """Archivo que se puede reemplazar con el mismo nombre: tamaño + fecha."""
+    return f"{storage.size(name)}-{int(storage.get_modified_time(name).timestamp())}"
+
+
+def _attachment(user, name):
+    match = BLOB_NAME.match(name)
+    if match is None:
+        # Adjunto anterior al almacenamiento por contenido
+        if not ChatAttachment.objects.filter(chat__user=user, blob=None, file=name).exists():
+            return None
+        return _media(default_storage, name, _mutable_etag(default_storage, name))
+
+    blob = AttachmentBlob.objects.filter(sha256=match["sha256"], attachments__chat__user=user).first()
+    if blob is None or name not in (blob.file.name, *blob.variants.values()):
+        return None
+    etag = f"{blob.sha256}-{match['width']}" if match["width"] else blob.sha256
+    return _media(content_addressed_storage, name, etag, IMMUTABLE)
+
+
+def _project_file(user, name):
+    project = Project.objects.filter(user=user, file=name).only("name", "file", "file_hash").first()
+    if project is None:
+        return None
+    return _media(
+        content_addressed_storage,
+        name,
+        project.file_hash or os.path.splitext(os.path.basename(name))[0],
+        IMMUTABLE,
+        filename=project.name + os.path.splitext(name)[1],
+        as_attachment=True,
+    )
+
+
+def _avatar(user, name):
+    # Se muestran junto al nombre del usuario: cualquier sesión iniciada
+    return _media(default_storage, name, _mutable_etag(default_storage, name))
+
+
+RESOLVERS = {
+    "chat_files": _attachment,
+    "projects": _project_file,
+    "avatars": _avatar,
+}
+
+
+def resolve_media(user, name):
+    """
+    Argumentos de serve_file para `name` (relativo a MEDIA_ROOT) si `user`
+    puede verlo; None si no es suyo o la carpeta no se sirve por aquí (los
+    PDF de exports/ salen de su propia vista).
+    """
+    parts = name.split("/")
+    if ".." in parts or "" in parts or parts[0] not in RESOLVERS:
+        return None
+    return RESOLVERS[parts[0]](user, name)
@@ -0,0 +1,271 @@
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Avg, Count, F, Q, Sum
+from django.db.models.functions import Coalesce
+
+from ..models import MetricRollup, ProjectMetricRollup, UsageMetric
+
+# Mismas expresiones que los triggers de la migración 0018 (semana = lunes)
+WEEK_SQL = "date({row}.date, '-' || ((CAST(strftime('%w', {row}.date) AS INTEGER) + 6) % 7) || ' days')"
+MONTH_SQL = "date({row}.date, 'start of month')"
+
+REBUILD_SQL = [
+    "DELETE FROM generator_metricrollup",
+    "DELETE FROM generator_projectmetricrollup",
+    *(
+        f"""
+        INSERT INTO generator_metricrollup
+            (user_id, granularity, period_start, cases, time_saved, accuracy_sum, entries)
+        SELECT m.user_id, '{granularity}', {period.format(row="m")},
+               SUM(m.total_ai_responses), SUM(m.estimated_time_saved_minutes),
+               SUM(m.estimated_accuracy), COUNT(*)
+        FROM generator_usagemetric m
+        GROUP BY m.user_id, {period.format(row="m")}
+        """
+        for granularity, period in (
+            (MetricRollup.DAY, "{row}.date"),
+            (MetricRollup.WEEK, WEEK_SQL),
+            (MetricRollup.MONTH, MONTH_SQL),
+        )
+    ),
+    f"""
+    INSERT INTO generator_projectmetricrollup
+        (user_id, project_id, month, cases, time_saved, accuracy_sum, entries)
+    SELECT m.user_id, m.project_id, {MONTH_SQL.format(row="m")},
+           SUM(m.total_ai_responses), SUM(m.estimated_time_saved_minutes),
+           SUM(m.estimated_accuracy), COUNT(*)
+    FROM generator_usagemetric m
+    WHERE m.project_id IS NOT NULL
+    GROUP BY m.user_id, m.project_id, {MONTH_SQL.format(row="m")}
+    """,
+]
+
+
+def rollups_available() -> bool:
+    """Los triggers que mantienen los rollups solo existen en SQLite."""
+    return connection.vendor == "sqlite"
+
+
+# -------------------------
+# PLAN DE UN RANGO DE FECHAS
+# -------------------------
+def _next_month(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _previous_month(day):
+    return (day.replace(day=1) - timedelta(days=1)).replace(day=1)
+
+
+def _week_start(day):
+    return day - timedelta(days=day.weekday())
+
+
+def _cover_edge(first, last):
+    """Semanas completas dentro de [first, last] y días sueltos a los lados."""
+    week_first = first if first.weekday() == 0 else _week_start(first) + timedelta(days=7)
+    week_last = _week_start(last) if last.weekday() == 6 else _week_start(last) - timedelta(days=7)
+    if week_first > week_last:
+        return [(MetricRollup.DAY, first, last)]
+
+    segments = [(MetricRollup.WEEK, week_first, week_last)]
+    if first < week_first:
+        segments.append((MetricRollup.DAY, first, week_first - timedelta(days=1)))
+    if last >= week_last + timedelta(days=7):
+        segments.append((MetricRollup.DAY, week_last + timedelta(days=7), last))
+    return segments
+
+
+def plan_range(start=None, end=None) -> dict:
+    """
+    Buckets que suman exactamente [start, end] (ambos inclusive; None =
+    sin límite): meses completos en el medio y, en los bordes, semanas
+    completas y días sueltos.
+
+    Devuelve {"months": (primero, último) | None, "edges": [(desde, hasta)],
+    "segments": [(granularidad, primer inicio, último inicio)]}. Los
+    límites de "months" y "segments" son inicios de período (None = abierto).
+    """
+    if start and end and start > end:
+        return {"months": None, "edges": [], "segments": []}
+
+    month_first = start if start is None or start.day == 1 else _next_month(start)
+    if end is None:
+        month_last = None
+    else:
+        month_last = end.replace(day=1) if (end + timedelta(days=1)).day == 1 else _previous_month(end)
+
+    if month_first is not None and month_last is not None and month_first > month_last:
+        # Menos de un mes completo: todo el rango es borde
+        edges = [(start, end)]
+        months = None
+    else:
+        months = (month_first, month_last)
+        edges = []
+        if start is not None and start < month_first:
+            edges.append((start, month_first - timedelta(days=1)))
+        if end is not None and end >= _next_month(month_last):
+            edges.append((_next_month(month_last), end))
+
+    segments = [(MetricRollup.MONTH, *months)] if months else []
+    for first, last in edges:
+        segments.extend(_cover_edge(first, last))
+    return {"months": months, "edges": edges, "segments": segments}
+
+
+def _between(field, first, last):
+    condition = Q()
+    if first is not None:
+        condition &= Q(**{f"{field}__gte": first})
+    if last is not None:
+        condition &= Q(**{f"{field}__lte": last})
+    return condition
+
+
+def _segments_filter(segments):
+    condition = Q(pk__in=[])
+    for granularity, first, last in segments:
+        condition |= Q(granularity=granularity) & _between("period_start", first, last)
+    return condition
+
+
+# -------------------------
+# CONSULTAS
+# -------------------------
+def range_metrics(user, start=None, end=None) -> dict:
+    """
+    KPIs, serie diaria y desglose por proyecto de [start, end] desde los
+    rollups: los KPIs en una sola query sobre los buckets más grandes que
+    caben en el rango, la serie desde los rollups diarios y los proyectos
+    con sus meses completos + las filas crudas de los bordes (una query
+    con UNION ALL). Sin rollups (otro motor) se calcula desde UsageMetric.
+    """
+    if not rollups_available():
+        return _raw_range_metrics(user, start, end)
+
+    plan = plan_range(start, end)
+
+    kpis = (
+        MetricRollup.objects
+        .filter(_segments_filter(plan["segments"]), user=user)
+        .aggregate(
+            total_cases=Coalesce(Sum("cases"), 0),
+            time_saved=Coalesce(Sum("time_saved"), 0),
+            accuracy_sum=Coalesce(Sum("accuracy_sum"), 0.0),
+            entries=Coalesce(Sum("entries"), 0),
+        )
+    ) if plan["segments"] else {"total_cases": 0, "time_saved": 0, "accuracy_sum": 0.0, "entries": 0}
+
+    daily = list(
+        MetricRollup.objects
+        .filter(_between("period_start", start, end), user=user, granularity=MetricRollup.DAY, entries__gt=0)
+        .order_by("period_start")
+        .values("cases", "time_saved", date=F("period_start"))
+    ) if plan["segments"] else []
+
+    return {
+        "total_cases": kpis["total_cases"],
+        "time_saved": kpis["time_saved"],
+        "accuracy": round(kpis["accuracy_sum"] / kpis["entries"], 1) if kpis["entries"] else 0.0,
+        "daily": daily,
+        "projects": _project_metrics(user, plan),
+    }
+
+
+def _project_metrics(user, plan):
+    parts = []
+    if plan["months"]:
+        parts.append(
+            ProjectMetricRollup.objects
+            .filter(_between("month", *plan["months"]), user=user)
+            .values("project_id", "project__name")
+            .annotate(
+                cases=Sum("cases"),
+                time_saved=Sum("time_saved"),
+                accuracy_sum=Sum("accuracy_sum"),
+                entries=Sum("entries"),
+            )
+            .order_by()
+        )
+    if plan["edges"]:
+        edges = Q(pk__in=[])
+        for first, last in plan["edges"]:
+            edges |= _between("date", first, last)
+        parts.append(
+            UsageMetric.objects
+            .filter(edges, user=user, project__isnull=False)
+            .values("project_id", "project__name")
+            .annotate(
+                cases=Sum("total_ai_responses"),
+                time_saved=Sum("estimated_time_saved_minutes"),
+                accuracy_sum=Sum("estimated_accuracy"),
+                entries=Count("id"),
+            )
+            .order_by()
+        )
+    if not parts:
+        return []
+
+    rows = parts[0].union(*parts[1:], all=True) if len(parts) > 1 else parts[0]
+    projects = {}
+    for row in rows:
+        project = projects.setdefault(row["project_id"], {
+            "project__name": row["project__name"], "cases": 0, "time_saved": 0, "accuracy_sum": 0.0, "entries": 0,
+        })
+        for field in ("cases", "time_saved", "accuracy_sum", "entries"):
+            project[field] += row[field]
+
+    result = [
+        {
+            "project__name": project["project__name"],
+            "cases": project["cases"],
+            "time_saved": project["time_saved"],
+            "accuracy": project["accuracy_sum"] / project["entries"],
+        }
+        for project in projects.values()
+        if project["entries"]
+    ]
+    result.sort(key=lambda project: project["cases"], reverse=True)
+    return result
+
+
+def _raw_range_metrics(user, start, end):
+    metrics = UsageMetric.objects.filter(_between("date", start, end), user=user)
+    kpis = metrics.aggregate(
+        total_cases=Coalesce(Sum("total_ai_responses"), 0),
+        time_saved=Coalesce(Sum("estimated_time_saved_minutes"), 0),
+        accuracy=Coalesce(Avg("estimated_accuracy"), 0.0),
+    )
+    return {
+        "total_cases": kpis["total_cases"],
+        "time_saved": kpis["time_saved"],
+        "accuracy": round(kpis["accuracy"], 1),
+        "daily": list(
+            metrics.values("date")
+            .annotate(cases=Sum("total_ai_responses"), time_saved=Sum("estimated_time_saved_minutes"))
+            .order_by("date")
+        ),
+        "projects": list(
+            metrics.filter(project__isnull=False)
+            .values("project__name")
+            .annotate(
+                cases=Sum("total_ai_responses"),
+                time_saved=Sum("estimated_time_saved_minutes"),
+                accuracy=Avg("estimated_accuracy"),
+            )
+            .order_by("-cases")
+        ),
+    }
+
+
+# -------------------------
+# MANTENIMIENTO
+# -------------------------
+def rebuild_rollups():
+    """Recalcula los rollups desde UsageMetric (los triggers los mantienen luego)."""
+    if not rollups_available():
+        return
+    with transaction.atomic(), connection.cursor() as cursor:
+        for sql in REBUILD_SQL:
+            cursor.execute(sql)
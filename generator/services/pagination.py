@@ -0,0 +1,50 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+
+# -------------------------
+# CURSOR (created_at, id)
+# -------------------------
+def encode_cursor(created_at, pk) -> str:
+    raw = f"{created_at.isoformat()}|{pk}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str):
+    """Devuelve (created_at, id). ValueError si el cursor no es válido."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        created_at, pk = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(pk)
+    except (UnicodeError, ValueError, TypeError) as exc:
+        raise ValueError("Cursor inválido") from exc
+
+
+def keyset_before(queryset, cursor=None, limit=50, field="created_at", chronological=True):
+    """
+    Página de `limit` filas anteriores al cursor, más recientes primero,
+    usando (field, id) como clave: el coste no depende de cuántas filas
+    haya antes (a diferencia de OFFSET).
+
+    Devuelve (filas, cursor para la página anterior o None). Las filas van
+    en orden cronológico (chat) o, con chronological=False, de la más
+    reciente a la más antigua (historial).
+    """
+    if cursor:
+        value, pk = decode_cursor(cursor)
+        queryset = queryset.filter(Q(**{f"{field}__lt": value}) | Q(**{field: value, "id__lt": pk}))
+
+    rows = list(queryset.order_by(f"-{field}", "-id")[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    previous_cursor = None
+    if has_more and rows:
+        oldest = rows[-1]
+        previous_cursor = encode_cursor(getattr(oldest, field), oldest.id)
+
+    if chronological:
+        rows.reverse()
+    return rows, previous_cursor
@@ -0,0 +1,244 @@
+import hashlib
+import logging
+import zipfile
+from html import escape
+from html.parser import HTMLParser
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.utils.text import get_valid_filename
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import Paragraph, Preformatted, SimpleDocTemplate, Spacer
+
+from ..uploads import content_addressed_path, content_addressed_storage
+from .rendering import PROJECT_RENDERER_VERSION, project_test_cases_html
+
+logger = logging.getLogger(__name__)
+
+# Cambiarlo regenera todos los PDF (otro diseño o conversión)
+PDF_EXPORT_VERSION = "1"
+
+ZIP_CHUNK_SIZE = 64 * 1024
+
+
+# -------------------------
+# HTML (markdown) -> FLOWABLES DE REPORTLAB
+# -------------------------
+class _BlockParser(HTMLParser):
+    """
+    Recorre el HTML del markdown por bloques (títulos, párrafos, items de
+    lista, código, filas de tabla) y traduce el formato en línea a lo que
+    entiende Paragraph de ReportLab. Partir por "\\n" rompía listas y
+    bloques de código y dejaba etiquetas sin cerrar.
+    """
+
+    BLOCKS = {"p", "h1", "h2", "h3", "h4", "h5", "h6", "li", "pre", "blockquote", "tr"}
+    INLINE = {"strong": "b", "b": "b", "em": "i", "i": "i", "u": "u", "code": 'font face="Courier"'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.blocks = []  # (tipo, markup, viñeta, nivel)
+        self.lists = []  # [etiqueta, contador]
+        self.current = None
+        self.inline = []
+
+    def _start(self, kind, bullet=None):
+        self._flush()
+        self.current = {"kind": kind, "parts": [], "bullet": bullet, "level": len(self.lists)}
+
+    def _flush(self):
+        if self.current is None:
+            return
+        # Cerrar etiquetas en línea que quedaron abiertas
+        for tag in reversed(self.inline):
+            self.current["parts"].append(f"</{tag.split()[0]}>")
+        self.inline = []
+        markup = "".join(self.current["parts"])
+        if markup.strip():
+            self.blocks.append((self.current["kind"], markup.strip(), self.current["bullet"], self.current["level"]))
+        self.current = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("ul", "ol"):
+            self._flush()
+            self.lists.append([tag, 0])
+        elif tag == "li":
+            bullet = "•"
+            if self.lists:
+                self.lists[-1][1] += 1
+                if self.lists[-1][0] == "ol":
+                    bullet = f"{self.lists[-1][1]}."
+            self._start("li", bullet)
+        elif tag == "p" and self.current and self.current["kind"] == "li" and not self.current["parts"]:
+            return  # <li><p>...</p></li> de listas "sueltas": el texto es del item
+        elif tag in self.BLOCKS:
+            self._start(tag)
+        elif tag in ("td", "th"):
+            if self.current is None:
+                self._start("tr")
+            elif self.current["parts"]:
+                self.current["parts"].append(" | ")
+        elif tag == "br" and self.current is not None:
+            self.current["parts"].append("<br/>")
+        elif tag in self.INLINE and self.current is not None:
+            self.inline.append(self.INLINE[tag])
+            self.current["parts"].append(f"<{self.INLINE[tag]}>")
+        elif tag == "a" and self.current is not None:
+            href = dict(attrs).get("href") or ""
+            self.inline.append("a")
+            self.current["parts"].append(f'<a href="{escape(href)}" color="blue">')
+
+    def handle_endtag(self, tag):
+        if tag in ("ul", "ol"):
+            self._flush()
+            if self.lists:
+                self.lists.pop()
+        elif tag in self.BLOCKS:
+            if tag == "p" and self.current and self.current["kind"] == "li":
+                return
+            self._flush()
+        elif (tag in self.INLINE or tag == "a") and self.inline and self.current is not None:
+            closing = self.inline.pop()
+            self.current["parts"].append(f"</{closing.split()[0]}>")
+
+    def handle_data(self, data):
+        if self.current is None:
+            if not data.strip():
+                return
+            self._start("p")
+        if self.current["kind"] == "pre":
+            self.current["parts"].append(data)
+        else:
+            self.current["parts"].append(escape(data, quote=False))
+
+    def close(self):
+        super().close()
+        self._flush()
+
+
+def html_to_flowables(html: str) -> list:
+    styles = getSampleStyleSheet()
+    parser = _BlockParser()
+    parser.feed(html)
+    parser.close()
+
+    story = []
+    for kind, markup, bullet, level in parser.blocks:
+        if kind == "pre":
+            story.append(Preformatted(markup, styles["Code"]))
+        elif kind.startswith("h"):
+            story.append(Paragraph(markup, styles[f"Heading{kind[1]}"]))
+        elif kind == "li":
+            style = styles["Normal"].clone("Item", leftIndent=18 * level, bulletIndent=18 * level - 10)
+            story.append(Paragraph(markup, style, bulletText=bullet))
+        elif kind == "blockquote":
+            story.append(Paragraph(markup, styles["Italic"]))
+        else:
+            story.append(Paragraph(markup, styles["Normal"]))
+            story.append(Spacer(1, 4))
+    return story
+
+
+# -------------------------
+# ARTEFACTO (por hash de los casos)
+# -------------------------
+def export_hash(project) -> str:
+    raw = f"{PDF_EXPORT_VERSION}|{PROJECT_RENDERER_VERSION}|{project.name}|{project.test_cases}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def export_name(project) -> str:
+    return content_addressed_path("exports", export_hash(project), "casos.pdf")
+
+
+def export_filename(project) -> str:
+    return get_valid_filename(f"{project.name}_casos_de_prueba.pdf")
+
+
+def build_pdf(project) -> bytes:
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, title=project.name)
+    story = [Paragraph(escape(project.name), getSampleStyleSheet()["Title"])]
+    story.extend(html_to_flowables(project_test_cases_html(project)))
+    doc.build(story)
+    return buffer.getvalue()
+
+
+def ensure_project_pdf(project) -> str:
+    """
+    Nombre en el storage del PDF de los casos actuales; lo genera solo si
+    ese contenido no se exportó antes (mismo hash = mismo archivo).
+    """
+    name = export_name(project)
+    if not content_addressed_storage.exists(name):
+        content_addressed_storage.save(name, ContentFile(build_pdf(project)))
+    return name
+
+
+# -------------------------
+# ZIP EN STREAM
+# -------------------------
+class _StreamBuffer:
+    """Destino de ZipFile que acumula solo lo escrito desde el último yield."""
+
+    def __init__(self):
+        self.chunks = []
+        self.offset = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.offset
+
+    def flush(self):
+        pass
+
+    def pop(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_projects_zip(projects):
+    """
+    Zip con el PDF de cada proyecto, producido de a trozos: en memoria solo
+    hay un bloque de ZIP_CHUNK_SIZE a la vez, nunca el zip ni los PDF
+    completos. Los PDF ya están comprimidos, así que van sin comprimir.
+    """
+    buffer = _StreamBuffer()
+    used_names = set()
+
+    with zipfile.ZipFile(buffer, mode="w", compression=zipfile.ZIP_STORED) as archive:
+        for project in projects:
+            try:
+                name = ensure_project_pdf(project)
+            except Exception:
+                logger.exception("No se pudo exportar el proyecto %s", project.pk)
+                continue
+
+            filename = export_filename(project)
+            if filename in used_names:
+                filename = f"{project.pk}_{filename}"
+            used_names.add(filename)
+
+            with content_addressed_storage.open(name, "rb") as source, \
+                    archive.open(filename, mode="w", force_zip64=True) as target:
+                while True:
+                    chunk = source.read(ZIP_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    target.write(chunk)
+                    yield from _drain(buffer)
+            yield from _drain(buffer)
+
+    # Directorio central del zip
+    yield from _drain(buffer)
+
+
+def _drain(buffer):
+    data = buffer.pop()
+    if data:
+        yield data
@@ -0,0 +1,245 @@
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+
+from ..uploads import get_content_addressed_storage
+from .tokens import count_tokens, split_by_tokens
+
+logger = logging.getLogger(__name__)
+
+# Cambiarlo invalida los textos guardados (otro extractor, otro formato)
+EXTRACTOR_VERSION = "1"
+
+ENGINE_PDFPLUMBER = "pdfplumber"
+ENGINE_PDFIUM = "pdfium"
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+# -------------------------
+# MOTORES (se ejecutan en los procesos del pool: sin ORM)
+# -------------------------
+def _page_count(path) -> int:
+    import pypdfium2
+
+    pdf = pypdfium2.PdfDocument(path)
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+
+def _pdfium_pages(path, start, end):
+    import pypdfium2
+
+    pdf = pypdfium2.PdfDocument(path)
+    try:
+        for index in range(start, end):
+            page = pdf[index]
+            textpage = page.get_textpage()
+            yield textpage.get_text_range()
+            textpage.close()
+            page.close()
+    finally:
+        pdf.close()
+
+
+def _pypdf_pages(path, start, end):
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    for index in range(start, end):
+        yield reader.pages[index].extract_text() or ""
+
+
+def _fast_pages(path, start, end):
+    """Capa de texto rápida: pdfium y, si falla, pypdf."""
+    try:
+        yield from _pdfium_pages(path, start, end)
+    except Exception:
+        yield from _pypdf_pages(path, start, end)
+
+
+def extract_page_range(path, start, end, engine, slow_page_seconds):
+    """
+    Texto de las páginas [start, end). Con pdfplumber (mejor maquetación)
+    mientras responda rápido: si una página tarda más que
+    `slow_page_seconds` o falla, el resto del rango sale de la capa rápida.
+    Devuelve (texto, motor usado al final).
+    """
+    texts = []
+
+    if engine == ENGINE_PDFPLUMBER:
+        import pdfplumber
+
+        try:
+            with pdfplumber.open(path) as pdf:
+                for index in range(start, end):
+                    began = time.perf_counter()
+                    texts.append(pdf.pages[index].extract_text() or "")
+                    if time.perf_counter() - began > slow_page_seconds:
+                        engine = ENGINE_PDFIUM
+                        break
+        except Exception:
+            logger.warning("pdfplumber falló en páginas %s-%s, usando pdfium", start, end, exc_info=True)
+            engine = ENGINE_PDFIUM
+
+    if len(texts) < end - start:
+        texts.extend(_fast_pages(path, start + len(texts), end))
+
+    return "\n".join(text.strip() for text in texts if text and text.strip()), engine
+
+
+# -------------------------
+# POOL DE PROCESOS
+# -------------------------
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Pool compartido (spawn: seguro aunque el servidor use hilos)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=_setting("PDF_EXTRACTION_PROCESSES", 4),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+@contextmanager
+def local_path(file):
+    """Ruta en disco del PDF (los procesos del pool no comparten memoria)."""
+    file = getattr(file, "file", file)  # FieldFile -> archivo subido
+
+    if hasattr(file, "temporary_file_path"):
+        yield file.temporary_file_path()
+        return
+
+    if isinstance(getattr(file, "name", None), str) and os.path.isfile(file.name):
+        yield file.name
+        return
+
+    file.seek(0)
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+        shutil.copyfileobj(file, tmp)
+    try:
+        yield tmp.name
+    finally:
+        file.seek(0)
+        os.unlink(tmp.name)
+
+
+# -------------------------
+# EXTRACCIÓN
+# -------------------------
+def _extract(path, budget):
+    pages = _page_count(path)
+    pages_per_task = _setting("PDF_PAGES_PER_TASK", 8)
+    slow_page_seconds = _setting("PDF_SLOW_PAGE_SECONDS", 1.0)
+    ranges = [(start, min(start + pages_per_task, pages)) for start in range(0, pages, pages_per_task)]
+
+    engine = ENGINE_PDFPLUMBER
+    texts, tokens = [], 0
+
+    # PDF corto: no vale la pena lanzar procesos
+    if len(ranges) <= 1:
+        submit = None
+    else:
+        pool = get_pool()
+        window = _setting("PDF_EXTRACTION_PROCESSES", 4) * 2
+
+        def submit(page_range, engine):
+            return pool.submit(extract_page_range, path, *page_range, engine, slow_page_seconds)
+
+    pending = []
+    next_range = 0
+    try:
+        while next_range < len(ranges) or pending:
+            # Ventana deslizante: solo unos pocos rangos por delante, así
+            # al llegar al presupuesto no queda trabajo de más en marcha
+            while submit and next_range < len(ranges) and len(pending) < window:
+                pending.append(submit(ranges[next_range], engine))
+                next_range += 1
+
+            if submit:
+                text, used_engine = pending.pop(0).result()
+            else:
+                text, used_engine = extract_page_range(path, *ranges[next_range], engine, slow_page_seconds)
+                next_range += 1
+
+            if used_engine != ENGINE_PDFPLUMBER:
+                engine = used_engine  # lento una vez: el resto directo por la capa rápida
+
+            if not text:
+                continue
+            text_tokens = count_tokens(text)
+            if tokens + text_tokens >= budget:
+                texts.append(split_by_tokens(text, budget - tokens)[0] if budget > tokens else "")
+                break
+            texts.append(text)
+            tokens += text_tokens
+    finally:
+        for future in pending:
+            future.cancel()
+        # Los rangos ya en marcha leen `path`: esperar antes de que se borre
+        wait(pending)
+
+    return "\n".join(text for text in texts if text).strip()
+
+
+def extracted_text_path(file_hash, budget) -> str:
+    """Ruta del texto extraído en el almacenamiento por contenido (compartido entre procesos)."""
+    return f"pdf_text/v{EXTRACTOR_VERSION}/{file_hash[:2]}/{file_hash}-{budget}.txt"
+
+
+def extract_pdf_text(file, file_hash=None, budget=None) -> str:
+    """
+    Texto del PDF hasta `budget` tokens (PDF_TOKEN_BUDGET), por rangos de
+    páginas en paralelo y deteniéndose al llenar el presupuesto. Con
+    `file_hash` (sha256) el resultado se guarda por contenido: volver a
+    subir el mismo archivo, desde cualquier proceso, no lo extrae de nuevo.
+    """
+    budget = budget or _setting("PDF_TOKEN_BUDGET", 60000)
+    storage = get_content_addressed_storage()
+    name = extracted_text_path(file_hash, budget) if file_hash else None
+
+    if name and storage.exists(name):
+        with storage.open(name, "rb") as stored:
+            return stored.read().decode("utf-8")
+
+    with local_path(file) as path:
+        try:
+            text = _extract(path, budget)
+        except BrokenProcessPool:
+            # Un proceso murió (PDF malformado, memoria): reintentar sin pool
+            logger.warning("Pool de extracción PDF roto, extrayendo en este proceso", exc_info=True)
+            reset_pool()
+            text = extract_page_range(path, 0, _page_count(path), ENGINE_PDFIUM, 0)[0]
+            text = split_by_tokens(text, budget)[0] if count_tokens(text) > budget else text
+
+    if name:
+        storage.save(name, ContentFile(text.encode("utf-8")))
+    return text
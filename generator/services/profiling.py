@@ -0,0 +1,214 @@
+import logging
+import re
+import statistics
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+# Perfil de la petición en curso. Un ContextVar y no un thread-local: las
+# vistas async ejecutan el ORM con sync_to_async en otro hilo y el contexto
+# viaja con la llamada.
+_current = ContextVar("request_profile", default=None)
+
+# Forma de una consulta: los IN (%s, %s, ...) de distinto largo cuentan igual
+IN_PLACEHOLDERS = re.compile(r"\(\s*%s(?:\s*,\s*%s)+\s*\)")
+NUMBERS = re.compile(r"\b\d+\b")
+
+SQL_PREVIEW_CHARS = 300
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def sql_shape(sql: str) -> str:
+    return NUMBERS.sub("N", IN_PLACEHOLDERS.sub("(%s, ...)", sql))
+
+
+class RequestProfile:
+    """Consultas, tiempo de base de datos y espera al backend de IA de una petición."""
+
+    def __init__(self, method="", path=""):
+        self.method = method
+        self.path = path
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_ms = 0.0
+        self.ai_ms = 0.0
+        self.ai_calls = 0
+        self.shapes = Counter()
+        self.slowest = []  # [(ms, sql)], los PROFILING_SLOW_QUERIES más lentos
+
+    def add_query(self, sql, ms):
+        self.queries += 1
+        self.db_ms += ms
+        self.shapes[sql_shape(sql)] += 1
+
+        keep = _setting("PROFILING_SLOW_QUERIES", 3)
+        if len(self.slowest) < keep or ms > self.slowest[-1][0]:
+            self.slowest.append((ms, sql[:SQL_PREVIEW_CHARS]))
+            self.slowest.sort(key=lambda item: item[0], reverse=True)
+            del self.slowest[keep:]
+
+    def add_ai(self, ms):
+        self.ai_calls += 1
+        self.ai_ms += ms
+
+    def repeated_queries(self, threshold):
+        """Formas de consulta repetidas `threshold` veces o más (posible N+1)."""
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+
+def current_profile():
+    return _current.get()
+
+
+# -------------------------
+# CAPTURA
+# -------------------------
+def record_query(execute, sql, params, many, context):
+    """execute_wrapper instalado en todas las conexiones; sin perfil activo no mide nada."""
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.add_query(sql, (time.perf_counter() - start) * 1000)
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    # La señal se repite al reconectar el mismo DatabaseWrapper
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def profile_request(method, path):
+    profile = RequestProfile(method, path)
+    token = _current.set(profile)
+    try:
+        yield profile
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def ai_timer():
+    """Suma al perfil activo el tiempo que se espera al backend de IA."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile = _current.get()
+        if profile is not None:
+            profile.add_ai((time.perf_counter() - start) * 1000)
+
+
+# -------------------------
+# BUFFER CIRCULAR
+# -------------------------
+class ProfileBuffer:
+    """Últimas N peticiones perfiladas del proceso (thread-safe)."""
+
+    def __init__(self, size=None):
+        self._lock = threading.Lock()
+        self._records = deque(maxlen=size or _setting("PROFILING_BUFFER_SIZE", 1000))
+
+    def add(self, record: dict):
+        with self._lock:
+            self._records.append(record)
+
+    def records(self) -> list:
+        with self._lock:
+            return list(self._records)
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+    def worst_endpoints(self, limit=20) -> list:
+        """Endpoints agrupados por ruta, del p95 de tiempo total más alto al más bajo."""
+        groups = {}
+        for record in self.records():
+            groups.setdefault((record["method"], record["endpoint"]), []).append(record)
+
+        endpoints = []
+        for (method, endpoint), records in groups.items():
+            total = sorted(record["total_ms"] for record in records)
+            endpoints.append({
+                "method": method,
+                "endpoint": endpoint,
+                "requests": len(records),
+                "p50_ms": round(statistics.median(total), 1),
+                "p95_ms": round(total[min(len(total) - 1, int(len(total) * 0.95))], 1),
+                "max_ms": round(total[-1], 1),
+                "avg_queries": round(statistics.mean(record["queries"] for record in records), 1),
+                "max_queries": max(record["queries"] for record in records),
+                "avg_db_ms": round(statistics.mean(record["db_ms"] for record in records), 1),
+                "avg_ai_ms": round(statistics.mean(record["ai_ms"] for record in records), 1),
+                "n_plus_one": sum(1 for record in records if record["repeated"]),
+            })
+        endpoints.sort(key=lambda item: item["p95_ms"], reverse=True)
+        return endpoints[:limit]
+
+
+profile_buffer = ProfileBuffer()
+
+
+def finish_profile(profile, endpoint, status) -> dict:
+    """
+    Guarda el perfil en el buffer y avisa en el log si hay consultas
+    repetidas. `view_ms` es el tiempo propio de Python (vista, plantillas,
+    middleware): el total sin base de datos ni backend de IA.
+    """
+    total_ms = profile.elapsed_ms()
+    threshold = _setting("PROFILING_N_PLUS_ONE_THRESHOLD", 10)
+    repeated = profile.repeated_queries(threshold) if threshold else []
+    for shape, count in repeated:
+        logger.warning(
+            "Posible N+1 en %s %s: %d veces la misma consulta: %s",
+            profile.method, profile.path, count, shape[:SQL_PREVIEW_CHARS],
+        )
+
+    record = {
+        "method": profile.method,
+        "path": profile.path,
+        "endpoint": endpoint,
+        "status": status,
+        "total_ms": round(total_ms, 2),
+        "view_ms": round(max(total_ms - profile.db_ms - profile.ai_ms, 0), 2),
+        "queries": profile.queries,
+        "db_ms": round(profile.db_ms, 2),
+        "ai_ms": round(profile.ai_ms, 2),
+        "ai_calls": profile.ai_calls,
+        "slowest": [(round(ms, 2), sql) for ms, sql in profile.slowest],
+        "repeated": [(shape[:SQL_PREVIEW_CHARS], count) for shape, count in repeated],
+    }
+    profile_buffer.add(record)
+    return record
+
+
+def server_timing(record) -> str:
+    """Valor de la cabecera Server-Timing (visible en la pestaña Network del navegador)."""
+    metrics = [
+        f'db;dur={record["db_ms"]:.1f};desc="{record["queries"]} queries"',
+        f'view;dur={record["view_ms"]:.1f}',
+        f'total;dur={record["total_ms"]:.1f}',
+    ]
+    if record["ai_calls"]:
+        metrics.insert(1, f'ai;dur={record["ai_ms"]:.1f};desc="{record["ai_calls"]} llamadas"')
+    return ", ".join(metrics)
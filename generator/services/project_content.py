@@ -0,0 +1,214 @@
+import logging
+import posixpath
+import zipfile
+
+from django.conf import settings
+
+from .tokens import count_tokens, split_by_tokens, token_budget
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_EXTENSIONS = (
+    ".py", ".js", ".ts", ".java", ".cs",
+    ".html", ".css", ".sql",
+    ".md", ".txt"
+)
+
+FILE_HEADER = "\n\n### FILE: "
+
+# Peso por tipo: el código fuente es lo que más casos de prueba aporta
+EXTENSION_WEIGHTS = {
+    ".py": 3.0, ".js": 3.0, ".ts": 3.0, ".java": 3.0, ".cs": 3.0,
+    ".sql": 1.5, ".html": 1.5,
+    ".md": 1.0, ".txt": 0.5,
+    ".css": 0.3,
+}
+
+# Nombres que suelen contener la lógica a probar
+RELEVANT_NAMES = ("test", "spec", "controller", "service", "view", "route", "api", "model", "handler")
+
+# Dependencias copiadas, builds y minificados: no se envían
+NOISE_DIRS = (
+    "/node_modules/", "/vendor/", "/vendors/", "/bower_components/", "/site-packages/",
+    "/dist/", "/build/", "/.venv/", "/venv/",
+)
+NOISE_NAMES = (".min.", "-min.", ".bundle.")
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def is_allowed_file(filename: str) -> bool:
+    return filename.lower().endswith(ALLOWED_EXTENSIONS)
+
+
+# -------------------------
+# EXTRACCIÓN (archivo por archivo)
+# -------------------------
+def iter_project_files(file):
+    """
+    Recorre el zip y produce (ruta, texto) de cada archivo permitido, sin
+    cargar el proyecto completo en memoria. Los archivos más grandes que
+    PROJECT_MAX_FILE_BYTES (bundles, datos generados) se omiten.
+    """
+    max_bytes = _setting("PROJECT_MAX_FILE_BYTES", 512 * 1024)
+
+    with zipfile.ZipFile(file) as z:
+        for info in z.infolist():
+            if info.is_dir() or not is_allowed_file(info.filename):
+                continue
+            if info.file_size > max_bytes:
+                continue
+
+            try:
+                with z.open(info) as f:
+                    text = f.read().decode("utf-8", errors="ignore")
+            except (zipfile.BadZipFile, OSError, RuntimeError):
+                continue
+
+            if text.strip():
+                yield info.filename, text
+
+
+def format_file(path: str, text: str) -> str:
+    return f"{FILE_HEADER}{path}\n{text}"
+
+
+def join_files(files):
+    """
+    (contenido, índice) de una lista de (ruta, texto): el contenido lleva
+    las cabeceras "### FILE:" para leerlo y el índice guarda [ruta, inicio,
+    fin] del texto de cada archivo, así nada depende de volver a buscar
+    las cabeceras (un archivo puede contenerlas).
+    """
+    parts, index, offset = [], [], 0
+    for path, text in files:
+        header = f"{FILE_HEADER}{path}\n" if path else ""
+        parts.extend((header, text))
+        offset += len(header)
+        index.append([path, offset, offset + len(text)])
+        offset += len(text)
+    # join sobre la lista: lineal, sin `+=` repetido
+    return "".join(parts), index
+
+
+def extract_project_content(file):
+    """(contenido, índice) del zip, con los archivos ordenados por relevancia."""
+    return join_files((path, text) for path, text, _ in rank_files(iter_project_files(file)))
+
+
+def split_files(content: str, index=None):
+    """
+    Inversa de join_files: (ruta, texto) por archivo, recortados con el
+    índice. Sin índice (proyectos anteriores a content_index) se parte por
+    las cabeceras; un contenido sin cabeceras (PDF, texto plano) es un
+    único archivo sin ruta.
+    """
+    if index is not None:
+        for path, start, end in index:
+            yield path, content[start:end]
+        return
+
+    if FILE_HEADER not in content:
+        if content.strip():
+            yield "", content
+        return
+
+    preamble, *sections = content.split(FILE_HEADER)
+    if preamble.strip():
+        yield "", preamble
+    for section in sections:
+        path, _, text = section.partition("\n")
+        yield path, text
+
+
+# -------------------------
+# RANKING
+# -------------------------
+def is_noise(path: str) -> bool:
+    path = "/" + path.lower()
+    name = posixpath.basename(path)
+    return any(marker in path for marker in NOISE_DIRS) or any(marker in name for marker in NOISE_NAMES)
+
+
+def file_score(path: str, tokens: int) -> float:
+    """
+    Relevancia de un archivo para generar casos: tipo de archivo, nombres
+    de capas con lógica (controller, service, test...), profundidad de la
+    ruta y tamaño (un dump enorme vale menos que varios módulos).
+    """
+    if not path:
+        return 1.0
+
+    lower = path.lower()
+    name = posixpath.basename(lower)
+    score = EXTENSION_WEIGHTS.get(posixpath.splitext(name)[1], 1.0)
+
+    if any(word in name for word in RELEVANT_NAMES):
+        score *= 1.5
+    score /= 1 + 0.15 * lower.count("/")
+    score /= 1 + tokens / 4000
+    return score
+
+
+def rank_files(files):
+    """(ruta, texto, tokens) de los archivos útiles, de más a menos relevante."""
+    ranked = []
+    for path, text in files:
+        if path and is_noise(path):
+            continue
+        tokens = count_tokens(format_file(path, text) if path else text)
+        ranked.append((file_score(path, tokens), path, text, tokens))
+
+    ranked.sort(key=lambda item: item[0], reverse=True)
+    return [(path, text, tokens) for _, path, text, tokens in ranked]
+
+
+# -------------------------
+# PLAN DE FRAGMENTOS
+# -------------------------
+def plan_chunks(content: str, max_tokens: int = None, max_chunks: int = None, index=None) -> list:
+    """
+    Empaqueta los archivos, de más a menos relevante, en fragmentos de como
+    mucho `max_tokens` tokens (presupuesto por llamada al backend). Cada
+    archivo va entero al primer fragmento donde cabe; los que no caben ni
+    solos se parten por líneas. Con `max_chunks` (PROJECT_MAX_CHUNKS) se
+    descartan los archivos menos relevantes que ya no entran. Con el conteo
+    aproximado el presupuesto se reduce según token_budget(). `index` es el
+    content_index del proyecto (ver split_files).
+    """
+    max_tokens = token_budget(max_tokens or _setting("PROJECT_CHUNK_TOKENS", 1500))
+    max_chunks = max_chunks or _setting("PROJECT_MAX_CHUNKS", None) or float("inf")
+    chunks = []  # [piezas, tokens usados]
+    dropped = 0
+
+    for path, text, tokens in rank_files(split_files(content, index)):
+        piece = format_file(path, text) if path else text
+
+        if tokens <= max_tokens:
+            target = next((chunk for chunk in chunks if chunk[1] + tokens <= max_tokens), None)
+            if target is None:
+                if len(chunks) >= max_chunks:
+                    dropped += 1
+                    continue
+                target = [[], 0]
+                chunks.append(target)
+            target[0].append(piece)
+            target[1] += tokens
+            continue
+
+        # Archivo más grande que un fragmento: cada parte lleva su cabecera
+        header_tokens = count_tokens(format_file(f"{path} (parte 00/00)", "")) if path else 0
+        parts = split_by_tokens(text, max(max_tokens - header_tokens, 1))
+        if len(chunks) + len(parts) > max_chunks:
+            dropped += 1
+            continue
+        for i, part in enumerate(parts, start=1):
+            label = f"{path} (parte {i}/{len(parts)})" if path else ""
+            chunks.append([[format_file(label, part) if label else part], max_tokens])
+
+    if dropped:
+        logger.warning("Proyecto: %s archivo(s) poco relevantes fuera del límite de fragmentos", dropped)
+
+    return [chunk for chunk in ("".join(pieces).strip() for pieces, _ in chunks) if chunk]
@@ -0,0 +1,223 @@
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.db.models import Count, IntegerField, Sum
+from django.db.models.fields.json import KT
+from django.db.models.functions import Cast
+from django.utils.timezone import localdate
+
+from ..models import Job, Project, UsageMetric
+from .ai_client import generate_project_test_cases
+from .jobs import enqueue, register, report_progress
+from .pdf_export import ensure_project_pdf
+from .project_content import plan_chunks
+from .rendering import set_project_test_cases
+from .response_cache import cache_key, normalize_text, response_cache
+from .telemetry import Counter, GenerationTelemetry, summarize
+
+logger = logging.getLogger(__name__)
+
+GENERATE_PROJECT_JOB = "generate_project_test_cases"
+
+# Contexto con el que se cachea cada fragmento (no choca con el chat)
+CHUNK_CACHE_CONTEXT = "generate-project"
+
+# Un caso empieza en la línea con su ID: "ID: ...", "**ID:** ...", "- **ID**: ..."
+CASE_START = re.compile(r"^[\W_]*ID\W*:", re.MULTILINE)
+CASE_ID = re.compile(r"(ID\W*:\W*)([A-Za-z]+)[-_]?(\d+)")
+
+
+def enqueue_project_generation(project):
+    return enqueue(GENERATE_PROJECT_JOB, user=project.user, project=project)
+
+
+def active_project_job(project):
+    return (
+        project.jobs
+        .filter(kind=GENERATE_PROJECT_JOB)
+        .order_by("-created_at")
+        .first()
+    )
+
+
+# -------------------------
+# MERGE DE RESULTADOS
+# -------------------------
+def split_cases(text: str):
+    """(preámbulo, [casos]) según las líneas de ID."""
+    starts = [match.start() for match in CASE_START.finditer(text)]
+    if not starts:
+        return text.strip(), []
+    cases = [text[start:end].strip() for start, end in zip(starts, starts[1:] + [len(text)])]
+    return text[:starts[0]].strip(), cases
+
+
+def case_fingerprint(case: str) -> str:
+    """El mismo caso con otro ID (de otro fragmento) cuenta como duplicado."""
+    _, _, body = case.partition("\n")
+    return normalize_text(body)
+
+
+def merge_test_cases(results) -> str:
+    """
+    Une las respuestas de cada fragmento: conserva el primer preámbulo,
+    descarta casos repetidos y renumera los IDs (cada fragmento empieza
+    desde TC-001).
+    """
+    results = [result for result in results if result and result.strip()]
+    if len(results) <= 1:
+        return results[0] if results else ""
+
+    preamble, blocks, seen = "", [], set()
+    number = 0
+
+    for result in results:
+        result_preamble, cases = split_cases(result)
+        if not cases:
+            # Respuesta sin formato de casos: se agrega tal cual (sin repetir)
+            fingerprint = normalize_text(result)
+            if fingerprint not in seen:
+                seen.add(fingerprint)
+                blocks.append(result.strip())
+            continue
+
+        preamble = preamble or result_preamble
+        for case in cases:
+            fingerprint = case_fingerprint(case)
+            if fingerprint in seen:
+                continue
+            seen.add(fingerprint)
+            number += 1
+            blocks.append(CASE_ID.sub(
+                lambda match: f"{match.group(1)}{match.group(2)}-{number:03d}", case, count=1
+            ))
+
+    return "\n\n".join([preamble] + blocks if preamble else blocks)
+
+
+# -------------------------
+# JOB
+# -------------------------
+def generate_chunks(job, chunks, telemetries=None) -> list:
+    """
+    Genera cada fragmento en paralelo (como mucho PROJECT_GENERATION_CONCURRENCY
+    llamadas a la vez). Los fragmentos ya generados salen de la caché, así un
+    reintento del job solo repite los que fallaron. La DB solo se toca desde
+    este hilo; los hilos del pool únicamente hacen la llamada HTTP.
+    La telemetría de cada llamada se agrega a `telemetries`.
+    """
+    telemetries = [] if telemetries is None else telemetries
+    total = len(chunks)
+    results = [None] * total
+    keys = [cache_key(chunk, CHUNK_CACHE_CONTEXT) for chunk in chunks]
+
+    pending = []
+    for i, key in enumerate(keys):
+        results[i] = response_cache.get(key)
+        if results[i] is None:
+            pending.append(i)
+
+    done = total - len(pending)
+    report_progress(job, 10, f"Fragmentos generados: {done}/{total}")
+    if not pending:
+        return results
+
+    workers = max(1, min(getattr(settings, "PROJECT_GENERATION_CONCURRENCY", 4), len(pending)))
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="project-chunk")
+    try:
+        futures = {}
+        for i in pending:
+            telemetries.append(GenerationTelemetry())
+            futures[pool.submit(generate_project_test_cases, chunks[i], telemetries[-1])] = i
+        for future in as_completed(futures):
+            i = futures[future]
+            results[i] = future.result()
+            response_cache.set(keys[i], chunks[i], CHUNK_CACHE_CONTEXT, results[i])
+
+            done += 1
+            report_progress(job, 10 + 80 * done // total, f"Fragmentos generados: {done}/{total}")
+    finally:
+        # Si un fragmento falla no se lanzan los que aún esperan turno
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    return results
+
+
+@register(GENERATE_PROJECT_JOB)
+def run_project_generation(job):
+    project = Project.objects.get(id=job.project_id)
+
+    chunks = plan_chunks(project.extracted_content, index=project.content_index)
+    report_progress(job, 5, f"Proyecto dividido en {len(chunks)} fragmento(s)")
+    telemetries = []
+    test_cases = merge_test_cases(generate_chunks(job, chunks, telemetries))
+
+    report_progress(job, 90, "Guardando casos de prueba")
+    set_project_test_cases(project, test_cases)
+    project.save(update_fields=["test_cases", "test_cases_html", "test_cases_html_version"])
+
+    # PDF listo para la descarga; si falla se genera al pedirlo
+    report_progress(job, 95, "Generando PDF")
+    try:
+        ensure_project_pdf(project)
+    except Exception:
+        logger.exception("No se pudo generar el PDF del proyecto %s", project.pk)
+
+    # update_or_create: un reintento no debe duplicar la métrica del día
+    UsageMetric.objects.update_or_create(
+        user=project.user,
+        project=project,
+        date=localdate(),
+        defaults={
+            "total_ai_responses": test_cases.count("ID:"),
+            "estimated_time_saved_minutes": 10,
+            "estimated_accuracy": 0.9,
+        }
+    )
+
+    # Tiempos y tokens de esta ejecución (los fragmentos de la caché no cuentan)
+    return {"cases": test_cases.count("ID:"), "chunks": len(chunks), "telemetry": summarize(telemetries)}
+
+
+# -------------------------
+# MÉTRICAS (desde Job.result)
+# -------------------------
+# campo del resumen -> (métrica, ayuda, escala)
+PROJECT_METRICS = {
+    "calls": ("qa_ai_project_calls_total", "Llamadas a /generate-project de los jobs terminados", 1),
+    "prompt_tokens": ("qa_ai_project_prompt_tokens_total", "Tokens estimados enviados a /generate-project", 1),
+    "completion_tokens": ("qa_ai_project_completion_tokens_total", "Tokens estimados recibidos de /generate-project", 1),
+    "backend_ms": ("qa_ai_project_backend_seconds_total", "Segundos esperando a /generate-project", 1000),
+}
+
+
+def render_project_metrics() -> str:
+    """
+    Contadores de la generación de proyectos en formato de Prometheus. El
+    job corre en run_worker (otro proceso, sin /metrics), así que no se
+    leen los histogramas en memoria sino los resúmenes guardados en
+    Job.result de cada job terminado.
+    """
+    jobs = Job.objects.filter(kind=GENERATE_PROJECT_JOB)
+    by_status = Counter("qa_ai_project_jobs_total", "Jobs de generación de proyectos terminados", ["status"])
+    for status, total in (
+        jobs.filter(status__in=[Job.STATUS_DONE, Job.STATUS_FAILED])
+        .values_list("status")
+        .annotate(total=Count("id"))
+        .order_by()
+    ):
+        by_status.inc(status, amount=total)
+
+    totals = jobs.filter(status=Job.STATUS_DONE).aggregate(**{
+        field: Sum(Cast(KT(f"result__telemetry__{field}"), IntegerField()))
+        for field in PROJECT_METRICS
+    })
+
+    lines = by_status.render()
+    for field, (name, help_text, scale) in PROJECT_METRICS.items():
+        counter = Counter(name, help_text)
+        counter.inc(amount=(totals[field] or 0) / scale)
+        lines.extend(counter.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,106 @@
+import asyncio
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+DEFAULT_BACKEND = "generator.services.pubsub.InProcessBroker"
+
+
+# -------------------------
+# SUSCRIPCIÓN (un consumidor async)
+# -------------------------
+class Subscription:
+    """
+    Cola async de un suscriptor. `publish` puede llamarse desde cualquier
+    hilo (signals, worker): el mensaje se entrega en el loop del suscriptor.
+    Si el consumidor va lento se descartan los mensajes más antiguos.
+    """
+
+    def __init__(self, broker, channel, maxsize=16):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+
+    def deliver(self, message):
+        try:
+            self.loop.call_soon_threadsafe(self._put, message)
+        except RuntimeError:
+            # El loop ya se cerró: la conexión terminó
+            self.close()
+
+    def _put(self, message):
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+    async def get(self, timeout=None):
+        """Siguiente mensaje; TimeoutError si no llega ninguno a tiempo."""
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def drain(self):
+        """Descarta lo pendiente (varios avisos seguidos valen por uno)."""
+        while not self.queue.empty():
+            self.queue.get_nowait()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+# -------------------------
+# BROKER EN PROCESO
+# -------------------------
+class InProcessBroker:
+    """
+    Pub/sub en memoria: solo llega a los suscriptores del mismo proceso.
+    Con varios procesos (o el worker de jobs aparte) se sustituye por otro
+    backend con la misma interfaz vía settings.PUBSUB_BACKEND.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, channel) -> Subscription:
+        subscription = Subscription(self, channel)
+        with self._lock:
+            self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+    def publish(self, channel, message) -> int:
+        """Entrega `message` a los suscriptores del canal. Devuelve cuántos hay."""
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.deliver(message)
+        return len(subscribers)
+
+    def subscriber_count(self, channel=None) -> int:
+        with self._lock:
+            if channel is not None:
+                return len(self._subscribers.get(channel, ()))
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                backend = getattr(settings, "PUBSUB_BACKEND", DEFAULT_BACKEND)
+                _broker = import_string(backend)()
+    return _broker
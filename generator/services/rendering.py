@@ -0,0 +1,79 @@
+import hashlib
+
+import markdown
+from django.utils.safestring import mark_safe
+
+CHAT_MARKDOWN_EXTENSIONS = ["extra", "nl2br"]
+PROJECT_MARKDOWN_EXTENSIONS = ["extra", "nl2br", "sane_lists"]
+
+
+def renderer_version(extensions) -> str:
+    """
+    Identifica la configuración del renderer: si cambian las extensiones
+    o la versión de Markdown, el HTML guardado queda obsoleto.
+    """
+    raw = f"{markdown.__version__}|{','.join(extensions)}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:12]
+
+
+CHAT_RENDERER_VERSION = renderer_version(CHAT_MARKDOWN_EXTENSIONS)
+PROJECT_RENDERER_VERSION = renderer_version(PROJECT_MARKDOWN_EXTENSIONS)
+
+
+# -------------------------
+# MENSAJES DEL CHAT
+# -------------------------
+def render_chat_markdown(text: str) -> str:
+    return markdown.markdown(text, extensions=CHAT_MARKDOWN_EXTENSIONS)
+
+
+def render_message(message) -> bool:
+    """Rellena rendered_html si falta o es de otra versión. True si cambió."""
+    if message.is_user or message.rendered_version == CHAT_RENDERER_VERSION:
+        return False
+    message.rendered_html = render_chat_markdown(message.content)
+    message.rendered_version = CHAT_RENDERER_VERSION
+    return True
+
+
+def ensure_messages_rendered(messages):
+    """
+    Renderiza (y persiste) solo los mensajes IA obsoletos; el resto usa
+    el HTML guardado al escribir el mensaje.
+    """
+    from ..models import ChatMessage
+
+    messages = list(messages)
+    stale = [message for message in messages if render_message(message)]
+    if stale:
+        ChatMessage.objects.bulk_update(stale, ["rendered_html", "rendered_version"])
+
+    for message in messages:
+        if not message.is_user:
+            message.rendered_html = mark_safe(message.rendered_html)
+    return messages
+
+
+# -------------------------
+# CASOS DE PROYECTO
+# -------------------------
+def render_project_markdown(text: str) -> str:
+    return markdown.markdown(text, extensions=PROJECT_MARKDOWN_EXTENSIONS)
+
+
+def set_project_test_cases(project, test_cases: str):
+    """Asigna los casos junto con su HTML (hay que guardar el proyecto)."""
+    project.test_cases = test_cases
+    project.test_cases_html = render_project_markdown(test_cases) if test_cases else ""
+    project.test_cases_html_version = PROJECT_RENDERER_VERSION if test_cases else ""
+
+
+def project_test_cases_html(project) -> str:
+    if not project.test_cases:
+        return ""
+
+    if project.test_cases_html_version != PROJECT_RENDERER_VERSION:
+        set_project_test_cases(project, project.test_cases)
+        project.save(update_fields=["test_cases_html", "test_cases_html_version"])
+
+    return project.test_cases_html
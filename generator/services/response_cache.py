@@ -0,0 +1,239 @@
+import hashlib
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import F
+from django.utils.timezone import now
+
+from ..models import CachedResponse, ChatMessage
+from .telemetry import Counter, Gauge
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+# -------------------------
+# CLAVE
+# -------------------------
+def normalize_text(text: str) -> str:
+    """
+    Normaliza un requerimiento para que variaciones triviales
+    (mayúsculas, espacios, puntuación final) compartan entrada.
+    """
+    text = unicodedata.normalize("NFKC", text or "").casefold()
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.rstrip(" .;:!?¡¿")
+
+
+def cache_key(requirement: str, context: str = "", version: str = None) -> str:
+    version = version or _setting("AI_BACKEND_VERSION", "v1")
+    raw = "\x1f".join([version, normalize_text(requirement), normalize_text(context)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def replay_lines(text: str):
+    """Reproduce una respuesta cacheada con el mismo formato que el stream."""
+    for line in text.splitlines():
+        if line:
+            yield line + "\n"
+
+
+# -------------------------
+# NIVEL 1: LRU + TTL EN MEMORIA
+# -------------------------
+class LRUCache:
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+# -------------------------
+# CACHÉ DE DOS NIVELES
+# -------------------------
+class ResponseCache:
+    """
+    Caché de respuestas de generación: LRU en memoria por proceso y
+    tabla CachedResponse compartida entre procesos.
+    """
+
+    def __init__(self):
+        self.memory = LRUCache(
+            max_entries=_setting("AI_CACHE_MAX_ENTRIES", 500),
+            ttl=_setting("AI_CACHE_TTL", 60 * 60 * 24),
+        )
+        self._lock = threading.Lock()
+        self.counters = {"memory_hits": 0, "db_hits": 0, "misses": 0, "stores": 0}
+
+    @property
+    def enabled(self):
+        return _setting("AI_CACHE_ENABLED", True)
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _persistent_cutoff(self):
+        return now() - timedelta(seconds=_setting("AI_CACHE_PERSISTENT_TTL", 60 * 60 * 24 * 30))
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+
+        value = self.memory.get(key)
+        if value is not None:
+            self._count("memory_hits")
+            return value
+
+        entry = (
+            CachedResponse.objects
+            .filter(key=key, created_at__gte=self._persistent_cutoff())
+            .values_list("response", flat=True)
+            .first()
+        )
+        if entry is None:
+            self._count("misses")
+            return None
+
+        CachedResponse.objects.filter(key=key).update(hits=F("hits") + 1, last_hit_at=now())
+        self.memory.set(key, entry)
+        self._count("db_hits")
+        return entry
+
+    def set(self, key, requirement, context, response):
+        if not self.enabled or not response.strip():
+            return
+
+        self.memory.set(key, response)
+        CachedResponse.objects.update_or_create(
+            key=key,
+            defaults={
+                "backend_version": _setting("AI_BACKEND_VERSION", "v1"),
+                "requirement": requirement,
+                "context": context or "",
+                "response": response,
+                "created_at": now(),
+            },
+        )
+        self._count("stores")
+
+    async def aget(self, key):
+        return await sync_to_async(self.get)(key)
+
+    async def aset(self, key, requirement, context, response):
+        await sync_to_async(self.set)(key, requirement, context, response)
+
+    def purge_expired(self) -> int:
+        deleted, _ = CachedResponse.objects.filter(created_at__lt=self._persistent_cutoff()).delete()
+        return deleted
+
+    def stats(self) -> dict:
+        with self._lock:
+            data = dict(self.counters)
+        lookups = data["memory_hits"] + data["db_hits"] + data["misses"]
+        data["hit_rate"] = round((data["memory_hits"] + data["db_hits"]) / lookups, 3) if lookups else 0.0
+        data["memory_entries"] = len(self.memory)
+        return data
+
+
+response_cache = ResponseCache()
+
+
+def render_cache_metrics() -> str:
+    """
+    Aciertos, fallos y escrituras de la caché de este proceso en formato
+    de Prometheus. La tasa de aciertos se calcula en la consulta.
+    """
+    stats = response_cache.stats()
+    lookups = Counter("qa_ai_cache_lookups_total", "Búsquedas en la caché de respuestas por resultado", ["result"])
+    for key, result in (("memory_hits", "memory_hit"), ("db_hits", "db_hit"), ("misses", "miss")):
+        lookups.inc(result, amount=stats[key])
+    stores = Counter("qa_ai_cache_stores_total", "Respuestas guardadas en la caché")
+    stores.inc(amount=stats["stores"])
+    entries = Gauge("qa_ai_cache_memory_entries", "Entradas en la LRU en memoria de este proceso")
+    entries.inc(amount=stats["memory_entries"])
+
+    lines = []
+    for metric in (lookups, stores, entries):
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# -------------------------
+# PRECARGA DESDE EL HISTORIAL
+# -------------------------
+def warm_from_history(limit=None) -> int:
+    """
+    Carga en la caché los pares (mensaje de usuario, respuesta IA)
+    consecutivos de cada chat, con la misma clave que usó la petición: el
+    contexto se rehace repitiendo, mensaje a mensaje, lo que hizo
+    build_chat_context (ventana reciente + resumen acumulado). Devuelve
+    cuántas entradas se guardaron.
+    """
+    from .chat_context import assemble_context  # chat_context -> project_generation -> este módulo
+
+    messages = (
+        ChatMessage.objects
+        .order_by("chat_id", "id")
+        .only("id", "chat_id", "is_user", "content", "success")
+    )
+
+    stored = 0
+    chat_id, summary, pending, asked = None, "", [], None
+    for message in messages.iterator(chunk_size=2000):
+        if message.chat_id != chat_id:
+            chat_id, summary, pending, asked = message.chat_id, "", [], None
+
+        if message.is_user:
+            # Contexto enviado con este mensaje: el historial anterior a él
+            context, summary, summary_until = assemble_context(reversed(pending), summary)
+            if summary_until is not None:
+                pending = [previous for previous in pending if previous.id > summary_until]
+            asked = (message.content, context)
+        elif asked is not None and message.success:
+            requirement, context = asked
+            response_cache.set(cache_key(requirement, context), requirement, context, message.content)
+            stored += 1
+            if limit and stored >= limit:
+                break
+            asked = None
+        else:
+            asked = None
+
+        pending.append(message)
+
+    return stored
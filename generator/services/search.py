@@ -0,0 +1,213 @@
+import re
+from html import escape
+
+from django.conf import settings
+from django.db import NotSupportedError, connection, transaction
+from django.urls import reverse
+
+from ..models import ChatMessage, ChatSession, Project
+
+# Tabla FTS5 creada en la migración 0015 y mantenida por triggers.
+# rowid = (user_id << 40) + (tipo << 38) + id: por usuario, un rango
+# contiguo por tipo
+SEARCH_TABLE = "generator_search"
+USER_SHIFT = 40
+KIND_SHIFT = 38
+
+KIND_MESSAGE = "message"
+KIND_CHAT = "chat"
+KIND_PROJECT = "project"
+KINDS = {1: KIND_MESSAGE, 2: KIND_CHAT, 3: KIND_PROJECT}
+
+# Solo se usan las palabras: comillas, operadores (AND, NEAR, *) y demás
+# sintaxis de FTS5 del usuario no llegan al MATCH
+WORD = re.compile(r"\w+")
+MAX_TERMS = 10
+
+# Marcas del snippet: el texto se escapa después y se cambian por <mark>
+MARK_START, MARK_END = "\x02", "\x03"
+
+REBUILD_SQL = [
+    f"DELETE FROM {SEARCH_TABLE}",
+    f"""
+    INSERT INTO {SEARCH_TABLE}(rowid, title, body)
+    SELECT (s.user_id << {USER_SHIFT}) + (1 << {KIND_SHIFT}) + m.id, '', m.content
+    FROM generator_chatmessage m JOIN generator_chatsession s ON s.id = m.chat_id
+    """,
+    f"""
+    INSERT INTO {SEARCH_TABLE}(rowid, title, body)
+    SELECT (user_id << {USER_SHIFT}) + (2 << {KIND_SHIFT}) + id, title, '' FROM generator_chatsession
+    """,
+    f"""
+    INSERT INTO {SEARCH_TABLE}(rowid, title, body)
+    SELECT (user_id << {USER_SHIFT}) + (3 << {KIND_SHIFT}) + id, name, test_cases FROM generator_project
+    """,
+    f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('optimize')",
+]
+
+# ¿Hay al menos N coincidencias? (para decidir si completar la última palabra)
+ENOUGH_SQL = f"""
+    SELECT 1 FROM {SEARCH_TABLE}
+    WHERE {SEARCH_TABLE} MATCH %s AND rowid BETWEEN %s AND %s
+    LIMIT 1 OFFSET %s
+"""
+
+# rowid del N-ésimo mensaje más reciente que coincide (recorrer el índice
+# por rowid es barato; lo caro es calcular bm25 de cada coincidencia)
+WINDOW_SQL = f"""
+    SELECT rowid FROM {SEARCH_TABLE}
+    WHERE {SEARCH_TABLE} MATCH %s AND rowid BETWEEN %s AND %s
+    ORDER BY rowid DESC
+    LIMIT 1 OFFSET %s
+"""
+
+# Desde la ventana de mensajes hasta el último proyecto es un solo rango de
+# rowids (mensajes, chats y proyectos van en ese orden dentro del usuario).
+# Pesos de bm25 por columna: el título pesa más que el cuerpo
+SEARCH_SQL = f"""
+    SELECT rowid,
+           snippet({SEARCH_TABLE}, 0, %s, %s, '…', 12),
+           snippet({SEARCH_TABLE}, 1, %s, %s, '…', 16)
+    FROM {SEARCH_TABLE}
+    WHERE {SEARCH_TABLE} MATCH %s AND rowid BETWEEN %s AND %s
+    ORDER BY bm25({SEARCH_TABLE}, 10.0, 1.0)
+    LIMIT %s OFFSET %s
+"""
+
+
+def _check_backend():
+    if connection.vendor != "sqlite":
+        raise NotSupportedError("La búsqueda de texto completo requiere SQLite con FTS5")
+
+
+# -------------------------
+# CONSULTA
+# -------------------------
+def build_match(query: str, prefix=False):
+    """
+    Expresión MATCH de FTS5: todas las palabras; con `prefix` la última
+    como prefijo (para buscar mientras se escribe). None si la consulta
+    no tiene palabras.
+    """
+    terms = WORD.findall(query)[:MAX_TERMS]
+    if not terms:
+        return None
+    phrases = [f'"{term}"' for term in terms]
+    if prefix:
+        phrases[-1] += "*"
+    return " ".join(phrases)
+
+
+def kind_rowids(user_id: int, first_kind: int, last_kind: int = None):
+    """Primer y último rowid de esos tipos del usuario en el índice."""
+    base = user_id << USER_SHIFT
+    last_kind = last_kind or first_kind
+    return base + (first_kind << KIND_SHIFT), base + ((last_kind + 1) << KIND_SHIFT) - 1
+
+
+def decode_rowid(rowid: int):
+    """(tipo, id) de una fila del índice."""
+    local = rowid & ((1 << USER_SHIFT) - 1)
+    return KINDS[local >> KIND_SHIFT], local & ((1 << KIND_SHIFT) - 1)
+
+
+def _snippet_html(snippet: str) -> str:
+    return escape(snippet).replace(MARK_START, "<mark>").replace(MARK_END, "</mark>")
+
+
+def search(user, query: str, page: int = 1, limit: int = None) -> dict:
+    """
+    Mensajes, chats y proyectos del usuario que contienen `query`, del más
+    al menos relevante (bm25), con un fragmento resaltado.
+    Devuelve {"results": [...], "next_page": n | None}.
+
+    La última palabra se completa como prefijo solo si la palabra exacta no
+    llena una página: un prefijo en FTS5 recorre el índice de todos los
+    usuarios, la palabra exacta solo el rango del usuario. Con términos muy
+    comunes solo se ordenan los SEARCH_RANK_WINDOW mensajes más recientes
+    que coinciden (chats y proyectos siempre): calcular bm25 de cientos de
+    miles de coincidencias costaría más que la búsqueda misma.
+    """
+    _check_backend()
+    limit = limit or getattr(settings, "SEARCH_PAGE_SIZE", 20)
+    match = build_match(query)
+    if match is None:
+        return {"results": [], "next_page": None}
+    first, last = kind_rowids(user.id, 1, 3)
+    messages_first, messages_last = kind_rowids(user.id, 1)
+
+    with connection.cursor() as cursor:
+        cursor.execute(ENOUGH_SQL, [match, first, last, limit - 1])
+        if cursor.fetchone() is None:
+            match = build_match(query, prefix=True)
+
+        cursor.execute(WINDOW_SQL, [
+            match, messages_first, messages_last, getattr(settings, "SEARCH_RANK_WINDOW", 500),
+        ])
+        floor = cursor.fetchone()
+
+        cursor.execute(SEARCH_SQL, [
+            MARK_START, MARK_END, MARK_START, MARK_END, match,
+            floor[0] if floor else first, last, limit + 1, (page - 1) * limit,
+        ])
+        rows = cursor.fetchall()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    ids = {KIND_MESSAGE: [], KIND_CHAT: [], KIND_PROJECT: []}
+    for rowid, _, _ in rows:
+        kind, pk = decode_rowid(rowid)
+        ids[kind].append(pk)
+
+    # Una consulta por tipo, no por resultado
+    messages = {
+        row["id"]: row
+        for row in ChatMessage.objects
+        .filter(id__in=ids[KIND_MESSAGE], chat__user=user)
+        .values("id", "chat_id", "chat__title")
+    }
+    chats = {
+        row["id"]: row
+        for row in ChatSession.objects.filter(id__in=ids[KIND_CHAT], user=user).values("id", "title")
+    }
+    projects = {
+        row["id"]: row
+        for row in Project.objects.filter(id__in=ids[KIND_PROJECT], user=user).values("id", "name")
+    }
+
+    results = []
+    for rowid, title_snippet, body_snippet in rows:
+        kind, pk = decode_rowid(rowid)
+        snippet = body_snippet if MARK_START in (body_snippet or "") else title_snippet
+
+        if kind == KIND_MESSAGE and pk in messages:
+            row = messages[pk]
+            title, url = row["chat__title"], reverse("chat", args=[row["chat_id"]])
+        elif kind == KIND_CHAT and pk in chats:
+            title, url = chats[pk]["title"], reverse("chat", args=[pk])
+        elif kind == KIND_PROJECT and pk in projects:
+            title, url = projects[pk]["name"], reverse("project_test_cases", args=[pk])
+        else:
+            continue  # borrado entre la búsqueda y la carga
+
+        results.append({
+            "kind": kind,
+            "id": pk,
+            "title": title or "Chat sin título",
+            "snippet": _snippet_html(snippet or ""),
+            "url": url,
+        })
+
+    return {"results": results, "next_page": page + 1 if has_more else None}
+
+
+# -------------------------
+# MANTENIMIENTO
+# -------------------------
+def rebuild_index():
+    """Regenera el índice desde las tablas (los triggers lo mantienen luego)."""
+    _check_backend()
+    with transaction.atomic(), connection.cursor() as cursor:
+        for sql in REBUILD_SQL:
+            cursor.execute(sql)
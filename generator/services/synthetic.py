@@ -0,0 +1,219 @@
+import random
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from ..models import ChatMessage, ChatSession, Project, UsageMetric, UserProfile
+from .rendering import CHAT_RENDERER_VERSION, render_chat_markdown, set_project_test_cases
+
+# Usuarios sintéticos: `seed_synthetic --clear` borra solo los de este prefijo
+SYNTHETIC_PREFIX = "synthetic-"
+
+# Fecha fija: los datos no dependen de cuándo se generan
+BASE_DATE = datetime(2025, 1, 1, 9, 0, tzinfo=timezone.utc)
+METRIC_DAYS = 90
+MESSAGE_INTERVAL = timedelta(seconds=40)
+
+FEATURES = [
+    "login", "registro", "recuperar contraseña", "carrito", "pago con tarjeta",
+    "factura", "exportar reporte", "filtro de búsqueda", "perfil de usuario",
+    "notificaciones", "roles y permisos", "carga de archivos", "API de pedidos",
+]
+
+USER_PROMPTS = [
+    "Genera casos de prueba para {feature}",
+    "Qué casos negativos faltan en {feature}?",
+    "Agrega casos de borde para {feature} con datos inválidos",
+    "Resume los casos de {feature} en una tabla",
+]
+
+AI_TEMPLATES = [
+    "**ID:** TC-001\n**Título:** {feature} con datos válidos\n"
+    "**Pasos:**\n1. Abrir {feature}\n2. Completar los datos\n3. Confirmar\n"
+    "**Resultado esperado:** La operación se completa\n\n"
+    "**ID:** TC-002\n**Título:** {feature} con campos vacíos\n"
+    "**Pasos:**\n1. Abrir {feature}\n2. Confirmar sin datos\n"
+    "**Resultado esperado:** Se muestran los errores de validación\n",
+
+    "| ID | Caso | Resultado esperado |\n|---|---|---|\n"
+    "| TC-001 | {feature} feliz | Éxito |\n| TC-002 | {feature} sin permisos | 403 |\n"
+    "| TC-003 | {feature} con timeout | Reintento y mensaje |\n",
+
+    "Casos negativos sugeridos para **{feature}**:\n\n"
+    "- Valores fuera de rango\n- Caracteres especiales y `<script>`\n"
+    "- Sesión expirada a mitad del flujo\n- Doble envío del formulario\n",
+]
+
+
+@contextmanager
+def explicit_timestamps(*fields):
+    """
+    Desactiva auto_now_add en esos campos para que bulk_create respete las
+    fechas deterministas (si no, todas serían "ahora").
+    """
+    saved = [(field, field.auto_now_add) for field in fields]
+    try:
+        for field, _ in saved:
+            field.auto_now_add = False
+        yield
+    finally:
+        for field, value in saved:
+            field.auto_now_add = value
+
+
+def _user_shares(users):
+    """Reparto de mensajes tipo Zipf: el primer usuario es el más pesado."""
+    weights = [1 / (i + 1) for i in range(users)]
+    total = sum(weights)
+    return [weight / total for weight in weights]
+
+
+def _ai_variants(feature):
+    variants = []
+    for template in AI_TEMPLATES:
+        content = template.format(feature=feature)
+        variants.append((content, render_chat_markdown(content)))
+    return variants
+
+
+def _content(ai_variants, feature, position):
+    """(texto, html) del mensaje `position` de un chat: pares usuario, impares IA."""
+    if position % 2 == 0:
+        return USER_PROMPTS[position // 2 % len(USER_PROMPTS)].format(feature=feature), ""
+    return ai_variants[feature][position % len(AI_TEMPLATES)]
+
+
+def clear_synthetic(prefix=SYNTHETIC_PREFIX) -> int:
+    with transaction.atomic():
+        # Las métricas primero: así no se fusionan con las filas sin proyecto
+        # al borrar cada proyecto (signals.merge_project_metrics) solo para
+        # borrarse después con el usuario
+        metrics, _ = UsageMetric.objects.filter(user__username__startswith=prefix).delete()
+        deleted, _ = User.objects.filter(username__startswith=prefix).delete()
+    return metrics + deleted
+
+
+def seed_synthetic(messages=10_000, users=20, messages_per_chat=50, projects_per_user=4,
+                   seed=42, prefix=SYNTHETIC_PREFIX, batch_size=5000, log=None) -> dict:
+    """
+    Usuarios, proyectos, chats, mensajes y métricas sintéticos, siempre los
+    mismos para la misma semilla y escala. Todo con bulk_create: no pasa por
+    save() ni por las señales, así que los campos que mantienen (totales y
+    último mensaje del chat) se calculan aquí. Los triggers del índice de
+    búsqueda sí se ejecutan.
+    """
+    rng = random.Random(seed)
+    log = log or (lambda message: None)
+    ai_variants = {feature: _ai_variants(feature) for feature in FEATURES}
+    password = make_password(None)
+
+    with transaction.atomic():
+        # -------------------------
+        # Usuarios
+        # -------------------------
+        created_users = User.objects.bulk_create([
+            User(username=f"{prefix}{i:04d}", password=password, date_joined=BASE_DATE)
+            for i in range(users)
+        ])
+        UserProfile.objects.bulk_create([UserProfile(user=user) for user in created_users])
+
+        # -------------------------
+        # Proyectos y métricas diarias
+        # -------------------------
+        projects = []
+        for index, user in enumerate(created_users):
+            for p in range(projects_per_user):
+                feature = FEATURES[(index + p) % len(FEATURES)]
+                project = Project(user=user, name=f"Proyecto {p + 1} - {feature}")
+                set_project_test_cases(project, ai_variants[feature][0][0])
+                projects.append(project)
+
+        with explicit_timestamps(Project._meta.get_field("created_at")):
+            for project in projects:
+                project.created_at = BASE_DATE
+            projects = Project.objects.bulk_create(projects, batch_size=batch_size)
+
+        metrics = []
+        for project in projects:
+            for day in range(0, METRIC_DAYS, rng.randint(1, 4)):
+                cases = rng.randint(1, 20)
+                metrics.append(UsageMetric(
+                    user_id=project.user_id,
+                    project=project,
+                    date=(BASE_DATE + timedelta(days=day)).date(),
+                    total_ai_responses=cases,
+                    estimated_time_saved_minutes=cases * 3,
+                    estimated_accuracy=round(rng.uniform(0.8, 0.98), 2),
+                ))
+        with explicit_timestamps(UsageMetric._meta.get_field("date")):
+            UsageMetric.objects.bulk_create(metrics, batch_size=batch_size)
+        log(f"{len(created_users)} usuarios, {len(projects)} proyectos, {len(metrics)} métricas")
+
+        # -------------------------
+        # Chats y mensajes
+        # -------------------------
+        timestamp_fields = (
+            ChatSession._meta.get_field("created_at"),
+            ChatMessage._meta.get_field("created_at"),
+        )
+        shares = _user_shares(users)
+        planned = inserted = 0
+        batch = []
+
+        with explicit_timestamps(*timestamp_fields):
+            for index, user in enumerate(created_users):
+                remaining = round(messages * shares[index]) if index < users - 1 else messages - planned
+                planned += remaining
+
+                # Largo y comienzo de cada chat, decididos antes de insertar
+                plans = []
+                while remaining > 0:
+                    size = min(remaining, rng.randint(2, messages_per_chat * 2))
+                    start = BASE_DATE + timedelta(minutes=rng.randint(0, METRIC_DAYS * 24 * 60))
+                    plans.append((size, start, rng.choice(FEATURES)))
+                    remaining -= size
+
+                chats = ChatSession.objects.bulk_create([
+                    ChatSession(
+                        user=user,
+                        title=f"Casos de {feature}",
+                        created_at=start,
+                        total_messages=size,
+                        total_ai_messages=size // 2,
+                        last_message_at=start + MESSAGE_INTERVAL * (size - 1),
+                        last_message_preview=_content(ai_variants, feature, size - 1)[0][:200],
+                    )
+                    for size, start, feature in plans
+                ], batch_size=batch_size)
+
+                for chat, (size, start, feature) in zip(chats, plans):
+                    for j in range(size):
+                        is_user = j % 2 == 0
+                        content, html = _content(ai_variants, feature, j)
+                        batch.append(ChatMessage(
+                            chat=chat,
+                            is_user=is_user,
+                            content=content,
+                            created_at=start + MESSAGE_INTERVAL * j,
+                            response_time_ms=None if is_user else rng.randint(400, 6000),
+                            rendered_html=html,
+                            rendered_version="" if is_user else CHAT_RENDERER_VERSION,
+                        ))
+                        if len(batch) >= batch_size:
+                            inserted += len(ChatMessage.objects.bulk_create(batch))
+                            batch = []
+                            if inserted % (batch_size * 20) == 0:
+                                log(f"{inserted} mensajes")
+
+            if batch:
+                inserted += len(ChatMessage.objects.bulk_create(batch))
+
+    return {
+        "users": len(created_users),
+        "projects": len(projects),
+        "metrics": len(metrics),
+        "messages": inserted,
+    }
@@ -0,0 +1,277 @@
+import bisect
+import threading
+import time
+
+from .tokens import count_tokens, get_tokenizer
+
+# Buckets en segundos (latencias) y en tokens/s. El backend responde entre
+# cientos de ms (caché del modelo) y varios minutos (proyectos grandes).
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+GAP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+RATE_BUCKETS = (1, 5, 10, 20, 40, 80, 160, 320)
+TOKEN_BUCKETS = (16, 64, 256, 512, 1024, 2048, 4096, 8192)
+
+OUTCOME_OK = "ok"
+OUTCOME_ERROR = "error"
+OUTCOME_CACHE = "cache"
+
+
+# -------------------------
+# MÉTRICAS (FORMATO TEXTO DE PROMETHEUS)
+# -------------------------
+def _labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{value}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _number(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    """Valor actual por etiquetas (se arma en cada scrape)."""
+
+    def render(self):
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class Histogram:
+    """Histograma acumulativo por etiquetas, como prometheus_client pero sin la dependencia."""
+
+    def __init__(self, name, help_text, buckets, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._series = {}  # labels -> [conteo por bucket (+Inf al final), suma]
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.setdefault(labels, [[0] * (len(self.buckets) + 1), 0.0])
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def count(self, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            return sum(series[0]) if series else 0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + ("+Inf",), counts):
+                    cumulative += count
+                    le = bound if bound == "+Inf" else _number(bound)
+                    lines.append(
+                        f"{self.name}_bucket{_labels(self.labelnames + ('le',), labels + (le,))} {cumulative}"
+                    )
+                label_text = _labels(self.labelnames, labels)
+                lines.append(f"{self.name}_sum{label_text} {_number(round(total, 6))}")
+                lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+TIME_TO_FIRST_TOKEN = Histogram(
+    "qa_ai_time_to_first_token_seconds",
+    "Tiempo hasta el primer fragmento de la respuesta del backend de IA",
+    LATENCY_BUCKETS, ["endpoint"],
+)
+INTER_CHUNK = Histogram(
+    "qa_ai_inter_chunk_seconds",
+    "Tiempo entre fragmentos consecutivos de una respuesta en streaming",
+    GAP_BUCKETS, ["endpoint"],
+)
+DURATION = Histogram(
+    "qa_ai_generation_duration_seconds",
+    "Duración total de una generación del backend de IA",
+    LATENCY_BUCKETS, ["endpoint"],
+)
+TOKENS_PER_SECOND = Histogram(
+    "qa_ai_tokens_per_second",
+    "Tokens estimados de la respuesta por segundo desde el primer fragmento",
+    RATE_BUCKETS, ["endpoint"],
+)
+COMPLETION_TOKENS = Histogram(
+    "qa_ai_completion_tokens",
+    "Tokens estimados por respuesta del backend de IA (tokenizer local)",
+    TOKEN_BUCKETS, ["endpoint"],
+)
+TOKENS = Counter(
+    "qa_ai_tokens_total", "Tokens estimados enviados y recibidos (tokenizer local)", ["endpoint", "kind"]
+)
+GENERATIONS = Counter("qa_ai_generations_total", "Generaciones por resultado", ["endpoint", "outcome"])
+
+REGISTRY = [TIME_TO_FIRST_TOKEN, INTER_CHUNK, DURATION, TOKENS_PER_SECOND, COMPLETION_TOKENS, TOKENS, GENERATIONS]
+
+
+def render_metrics() -> str:
+    # Los tokens se cuentan aquí, no los devuelve el backend: este gauge dice
+    # si el conteo usa el tokenizer del modelo (1) o el aproximado (0)
+    tokenizer = Gauge(
+        "qa_ai_tokenizer_exact", "1 si los tokens se cuentan con el tokenizer del modelo, 0 si son aproximados"
+    )
+    tokenizer.inc(amount=int(get_tokenizer().exact))
+
+    lines = []
+    for metric in REGISTRY + [tokenizer]:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# -------------------------
+# TELEMETRÍA DE UNA GENERACIÓN
+# -------------------------
+class GenerationTelemetry:
+    """
+    Tiempos y tokens de una llamada al backend: primer fragmento, pausas
+    entre fragmentos, duración total y tokens estimados con el tokenizer
+    local (el backend no los devuelve; ver tokens.py: sin AI_TOKENIZER el
+    conteo es aproximado). Quien llama la crea vacía y
+    ai_client la completa: start() al enviar, chunk() por fragmento y
+    finish() al terminar.
+    """
+
+    def __init__(self):
+        self.endpoint = ""
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.started = time.perf_counter()
+        self.first_chunk_at = None
+        self.last_chunk_at = None
+        self.finished_at = None
+        self.chunks = 0
+        self.gap_total = 0.0
+        self.max_gap = 0.0
+        self.outcome = None
+
+    def start(self, endpoint, prompt=""):
+        self.endpoint = endpoint
+        self.prompt_tokens = count_tokens(prompt)
+        self.started = time.perf_counter()
+
+    def chunk(self):
+        now = time.perf_counter()
+        if self.first_chunk_at is None:
+            self.first_chunk_at = now
+        else:
+            gap = now - self.last_chunk_at
+            self.gap_total += gap
+            self.max_gap = max(self.max_gap, gap)
+            if self.outcome is None:
+                INTER_CHUNK.observe(gap, self.endpoint)
+        self.last_chunk_at = now
+        self.chunks += 1
+
+    def finish(self, completion="", outcome=OUTCOME_OK):
+        if self.outcome is not None:
+            return
+        self.finished_at = time.perf_counter()
+        self.completion_tokens = count_tokens(completion)
+        self.outcome = outcome
+
+        GENERATIONS.inc(self.endpoint, outcome)
+        if outcome != OUTCOME_OK:
+            return
+        # Una respuesta de la caché no dice nada del backend
+        TOKENS.inc(self.endpoint, "prompt", amount=self.prompt_tokens)
+        TOKENS.inc(self.endpoint, "completion", amount=self.completion_tokens)
+        DURATION.observe(self.total_ms / 1000, self.endpoint)
+        COMPLETION_TOKENS.observe(self.completion_tokens, self.endpoint)
+        if self.first_token_ms is not None:
+            TIME_TO_FIRST_TOKEN.observe(self.first_token_ms / 1000, self.endpoint)
+        if self.tokens_per_second is not None:
+            TOKENS_PER_SECOND.observe(self.tokens_per_second, self.endpoint)
+
+    # -------------------------
+    # Valores derivados
+    # -------------------------
+    @property
+    def total_ms(self):
+        end = self.finished_at or time.perf_counter()
+        return int((end - self.started) * 1000)
+
+    @property
+    def first_token_ms(self):
+        if self.first_chunk_at is None:
+            return None
+        return int((self.first_chunk_at - self.started) * 1000)
+
+    @property
+    def chunk_gap_ms(self):
+        """Pausa media entre fragmentos (None con menos de dos)."""
+        if self.chunks < 2:
+            return None
+        return int(self.gap_total / (self.chunks - 1) * 1000)
+
+    @property
+    def tokens_per_second(self):
+        """Tokens de la respuesta entre el primer fragmento y el final."""
+        if self.first_chunk_at is None or not self.completion_tokens:
+            return None
+        seconds = (self.finished_at or time.perf_counter()) - self.first_chunk_at
+        return round(self.completion_tokens / seconds, 1) if seconds > 0 else None
+
+    def message_fields(self) -> dict:
+        """Campos de ChatMessage que completa esta generación."""
+        return {
+            "response_time_ms": self.total_ms,
+            "first_token_ms": self.first_token_ms,
+            "chunk_gap_ms": self.chunk_gap_ms,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+        }
+
+    def as_dict(self) -> dict:
+        return {
+            "outcome": self.outcome,
+            "total_ms": self.total_ms,
+            "first_token_ms": self.first_token_ms,
+            "chunk_gap_ms": self.chunk_gap_ms,
+            "max_chunk_gap_ms": int(self.max_gap * 1000),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "tokens_per_second": self.tokens_per_second,
+            "tokens_exact": get_tokenizer().exact,
+        }
+
+
+def summarize(telemetries) -> dict:
+    """Totales de las llamadas de una generación de proyecto (una por fragmento)."""
+    calls = [telemetry for telemetry in telemetries if telemetry.outcome == OUTCOME_OK]
+    first_tokens = [telemetry.first_token_ms for telemetry in calls if telemetry.first_token_ms is not None]
+    return {
+        "calls": len(calls),
+        "prompt_tokens": sum(telemetry.prompt_tokens for telemetry in calls),
+        "completion_tokens": sum(telemetry.completion_tokens for telemetry in calls),
+        "backend_ms": sum(telemetry.total_ms for telemetry in calls),
+        "max_first_token_ms": max(first_tokens) if first_tokens else None,
+        "max_duration_ms": max((telemetry.total_ms for telemetry in calls), default=None),
+        "tokens_exact": get_tokenizer().exact,
+    }
@@ -0,0 +1,124 @@
+import logging
+import os
+import threading
+
+from django.conf import settings
+from tokenizers import Tokenizer, pre_tokenizers
+
+logger = logging.getLogger(__name__)
+
+
+# -------------------------
+# CONTADOR APROXIMADO (sin vocabulario)
+# -------------------------
+class ApproximateTokenizer:
+    """
+    Respaldo cuando no hay tokenizer del modelo: usa el pre-tokenizer de
+    `tokenizers` (palabras y signos) y parte las palabras largas en piezas
+    de PIECE_CHARS caracteres, como haría BPE. Tiende a contar de más, pero
+    no es el vocabulario del modelo (código, URLs o idiomas raros pueden
+    dar más tokens reales): por eso token_budget() deja un margen.
+    """
+
+    PIECE_CHARS = 5
+    exact = False
+
+    def __init__(self):
+        self.pre_tokenizer = pre_tokenizers.Whitespace()
+
+    def offsets(self, text):
+        result = []
+        for _, (start, end) in self.pre_tokenizer.pre_tokenize_str(text):
+            for piece_start in range(start, end, self.PIECE_CHARS):
+                result.append((piece_start, min(piece_start + self.PIECE_CHARS, end)))
+        return result
+
+
+class ModelTokenizer:
+    """Tokenizer real del modelo (tokenizer.json o nombre en el Hub)."""
+
+    exact = True
+
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+
+    def offsets(self, text):
+        return self.tokenizer.encode(text, add_special_tokens=False).offsets
+
+
+def _load_tokenizer():
+    name = getattr(settings, "AI_TOKENIZER", "")
+    if name:
+        try:
+            if os.path.exists(name):
+                return ModelTokenizer(Tokenizer.from_file(name))
+            return ModelTokenizer(Tokenizer.from_pretrained(name))
+        except Exception:
+            logger.warning("No se pudo cargar el tokenizer %r, se usa el aproximado", name, exc_info=True)
+    else:
+        logger.info("AI_TOKENIZER vacío: conteo de tokens aproximado")
+    return ApproximateTokenizer()
+
+
+_tokenizer = None
+_tokenizer_lock = threading.Lock()
+
+
+def get_tokenizer():
+    global _tokenizer
+    if _tokenizer is None:
+        with _tokenizer_lock:
+            if _tokenizer is None:
+                _tokenizer = _load_tokenizer()
+    return _tokenizer
+
+
+# -------------------------
+# API
+# -------------------------
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    return len(get_tokenizer().offsets(text))
+
+
+def token_budget(max_tokens: int) -> int:
+    """
+    Presupuesto utilizable de `max_tokens`: entero con el tokenizer del
+    modelo; con el aproximado, la fracción AI_TOKENIZER_MARGIN, para que
+    un error de conteo no pase el límite real del modelo.
+    """
+    if get_tokenizer().exact:
+        return max_tokens
+    return max(int(max_tokens * getattr(settings, "AI_TOKENIZER_MARGIN", 0.8)), 1)
+
+
+def split_by_tokens(text: str, max_tokens: int) -> list:
+    """
+    Parte `text` en trozos de como mucho `max_tokens` tokens, cortando al
+    final de una línea cuando se puede. Tokeniza una sola vez y corta por
+    los offsets, así cada trozo respeta el presupuesto exacto.
+    """
+    offsets = get_tokenizer().offsets(text)
+    if len(offsets) <= max_tokens:
+        return [text] if text else []
+
+    parts, start_char, index = [], 0, 0
+    while index < len(offsets):
+        end_index = min(index + max_tokens, len(offsets))
+        end_char = offsets[end_index][0] if end_index < len(offsets) else len(text)
+
+        if end_index < len(offsets):
+            # Cortar tras el último salto de línea que cabe en el trozo
+            newline = text.rfind("\n", start_char, end_char)
+            if newline > start_char:
+                cut = end_index
+                while cut > index + 1 and offsets[cut - 1][0] > newline:
+                    cut -= 1
+                if offsets[cut][0] > newline:
+                    end_index, end_char = cut, newline + 1
+
+        parts.append(text[start_char:end_char])
+        start_char, index = end_char, end_index
+
+    return [part for part in parts if part.strip()]
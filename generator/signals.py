@@ -1,67 +1,167 @@
-import time
-from django.db.models.signals import post_save
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, F, OuterRef, QuerySet, Subquery, Value
+from django.db.models.functions import Greatest, Least
+from django.db.models.signals import post_delete, post_save, pre_delete
 from django.dispatch import receiver
 from django.utils.timezone import localdate
 from django.contrib.auth.models import User
-from .models import ChatMessage, UsageMetric, UserProfile
+from .models import ChatAttachment, ChatMessage, ChatSession, Project, UsageMetric, UserProfile
+from .services import dashboard
+from .services.attachments import release_blob
+
+# Cada respuesta IA suma precisión estimada hasta un tope
+ACCURACY_STEP = 0.8
+ACCURACY_MAX = 95.0
+TIME_SAVED_PER_AI_MESSAGE = 5
+
+# Largo del último mensaje guardado en ChatSession para el historial
+CHAT_PREVIEW_CHARS = 200
+
 
 @receiver(post_save, sender=ChatMessage)
 def update_metrics_on_message(sender, instance, created, **kwargs):
+    """
+    Actualiza contadores del chat, la métrica diaria y la versión del
+    dashboard con UPDATEs atómicos (F()/Least en SQL): 3 queries en una
+    sola transacción por mensaje y sin carreras entre escrituras
+    concurrentes.
+    """
     if not created:
         return
 
-    chat = instance.chat
-    user = chat.user
-    project = chat.project
-
-    # -------------------------
-    # Obtener o crear métrica diaria de manera segura
-    # -------------------------
-    metrics = UsageMetric.objects.filter(
-        user=user,
-        project=project,
-        date=localdate()
-    ).order_by('id')
-
-    if metrics.exists():
-        metric = metrics.first()
-
-        # Limpiar posibles duplicados antiguos
-        duplicates = metrics.exclude(id=metric.id)
-        if duplicates.exists():
-            duplicates.delete()
-    else:
-        metric = UsageMetric.objects.create(
-            user=user,
-            project=project,
-            date=localdate(),
-            total_messages=0,
-            total_ai_responses=0,
-            estimated_time_saved_minutes=0,
-            estimated_accuracy=0
+    is_ai = not instance.is_user
+    time_saved = 0
+    if is_ai:
+        time_saved = max((instance.response_time_ms or 0) // 1000, 1) + TIME_SAVED_PER_AI_MESSAGE
+
+    metric_filter = {
+        "user_id": instance.chat.user_id,
+        "project_id": instance.chat.project_id,
+        "date": localdate(),
+    }
+    metric_updates = {
+        "total_messages": F("total_messages") + 1,
+        "total_ai_responses": F("total_ai_responses") + int(is_ai),
+        "estimated_time_saved_minutes": F("estimated_time_saved_minutes") + time_saved,
+    }
+    if is_ai:
+        metric_updates["estimated_accuracy"] = Least(
+            F("estimated_accuracy") + ACCURACY_STEP, Value(ACCURACY_MAX)
         )
 
-    # -------------------------
-    # Actualizar métricas del chat
-    # -------------------------
-    chat.total_messages += 1
-    if not instance.is_user:
-        chat.total_ai_messages += 1
-        metric.total_ai_responses += 1
-        metric.estimated_time_saved_minutes += max(instance.response_time_ms // 1000, 1)
-        metric.estimated_accuracy = min(metric.estimated_accuracy + 0.3, 98)
-
-    chat.save(update_fields=["total_messages", "total_ai_messages"])
-
-    # -------------------------
-    # Actualizar métricas diarias adicionales
-    # -------------------------
-    metric.total_messages += 1
-    if not instance.is_user:
-        metric.estimated_time_saved_minutes += 5
-        metric.estimated_accuracy = min(metric.estimated_accuracy + 0.5, 95)
-
-    metric.save()
+    with transaction.atomic():
+        # -------------------------
+        # Métricas del chat
+        # -------------------------
+        ChatSession.objects.filter(id=instance.chat_id).update(
+            total_messages=F("total_messages") + 1,
+            total_ai_messages=F("total_ai_messages") + int(is_ai),
+            last_message_at=instance.created_at,
+            last_message_preview=instance.content[:CHAT_PREVIEW_CHARS],
+        )
+
+        # -------------------------
+        # Métrica diaria (upsert)
+        # -------------------------
+        updated = UsageMetric.objects.filter(**metric_filter).update(**metric_updates)
+        if not updated:
+            # Primer mensaje del día: otro escritor puede crearla a la vez;
+            # la restricción única decide y el perdedor hace el UPDATE.
+            try:
+                with transaction.atomic():
+                    UsageMetric.objects.create(
+                        **metric_filter,
+                        total_messages=1,
+                        total_ai_responses=int(is_ai),
+                        estimated_time_saved_minutes=time_saved,
+                        estimated_accuracy=ACCURACY_STEP if is_ai else 0,
+                    )
+            except IntegrityError:
+                UsageMetric.objects.filter(**metric_filter).update(**metric_updates)
+
+        # -------------------------
+        # Versión del dashboard, en la misma transacción
+        # -------------------------
+        invalidate_dashboard(instance.chat.user_id)
+
+
+# -------------------------
+# Borrar un proyecto: sus métricas pasan a la fila sin proyecto del día
+# -------------------------
+MERGED_COLUMNS = ["total_chats", "total_messages", "total_ai_responses", "estimated_time_saved_minutes"]
+
+
+@receiver(pre_delete, sender=Project)
+def merge_project_metrics(sender, instance, **kwargs):
+    """
+    UsageMetric.project es SET_NULL, pero solo hay una fila sin proyecto
+    por usuario y día (restricción única): si ya existe, se le suman las
+    filas del proyecto (la precisión queda en la mayor, como en la
+    migración 0011) y estas se borran; las demás quedan sin proyecto aquí
+    mismo, así el siguiente proyecto borrado en la misma operación ya
+    encuentra su fila. Tres queries, sin importar cuántos días tenga.
+    También al borrar el usuario: el SET NULL de la cascada se ejecuta
+    antes de borrar sus métricas.
+    """
+    project_rows = UsageMetric.objects.filter(project=instance)
+    same_day = project_rows.filter(user_id=OuterRef("user_id"), date=OuterRef("date"))
+
+    def project_value(column):
+        return Subquery(same_day.values(column)[:1])
+
+    UsageMetric.objects.filter(Exists(same_day), project=None).update(
+        **{column: F(column) + project_value(column) for column in MERGED_COLUMNS},
+        estimated_accuracy=Greatest(F("estimated_accuracy"), project_value("estimated_accuracy")),
+    )
+    project_rows.filter(Exists(
+        UsageMetric.objects.filter(project=None, user_id=OuterRef("user_id"), date=OuterRef("date"))
+    )).delete()
+    project_rows.update(project=None)
+
+
+# -------------------------
+# Invalidar el snapshot del dashboard
+# -------------------------
+def deleting_user(origin) -> bool:
+    """Si el borrado en curso es la cascada de borrar un usuario."""
+    return (origin.model if isinstance(origin, QuerySet) else type(origin)) is User
+
+
+def invalidate_dashboard(user_id):
+    """
+    La versión se escribe en la transacción del cambio: otros procesos la
+    ven junto con los datos y se revierte con ellos. El aviso a los SSE de
+    este proceso sale al confirmar.
+    """
+    version = dashboard.bump_version(user_id)
+    transaction.on_commit(lambda: dashboard.publish_version(user_id, version))
+
+
+@receiver(post_save, sender=ChatSession)
+def invalidate_dashboard_on_chat(sender, instance, created, **kwargs):
+    if created:
+        invalidate_dashboard(instance.user_id)
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+@receiver(post_save, sender=UsageMetric)
+@receiver(post_delete, sender=UsageMetric)
+@receiver(post_delete, sender=ChatSession)
+def invalidate_dashboard_on_change(sender, instance, origin=None, **kwargs):
+    # Sin dashboard que invalidar (la versión apuntaría a un usuario borrado)
+    if deleting_user(origin):
+        return
+    invalidate_dashboard(instance.user_id)
+
+
+# -------------------------
+# Adjuntos: soltar la referencia al blob (también al borrar el chat)
+# -------------------------
+@receiver(post_delete, sender=ChatAttachment)
+def release_attachment_blob(sender, instance, **kwargs):
+    if instance.blob_id:
+        release_blob(instance.blob_id)
 
 
 @receiver(post_save, sender=User)
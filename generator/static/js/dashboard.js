@@ -1,26 +1,21 @@
-async function refreshDashboardMetrics() {
-  try {
-    const response = await fetch("/api/dashboard/metrics/");
-    const data = await response.json();
+function renderDashboardMetrics(data) {
+  document.getElementById("kpi-cases").innerText = data.total_cases;
+  document.getElementById("kpi-projects").innerText = data.total_projects;
+  document.getElementById("kpi-time").innerText = data.time_saved + " min";
+  document.getElementById("kpi-accuracy").innerText = data.accuracy + "%";
 
-    document.getElementById("kpi-cases").innerText = data.total_cases;
-    document.getElementById("kpi-projects").innerText = data.total_projects;
-    document.getElementById("kpi-time").innerText = data.time_saved + " min";
-    document.getElementById("kpi-accuracy").innerText = data.accuracy + "%";
-
-    if (data.last_activity) {
-      document.getElementById("last-activity").innerHTML = `
-        <p class="text-slate-300">${data.last_activity.content}</p>
-        <p class="text-xs text-slate-500 mt-1">${data.last_activity.created_at}</p>
-      `;
-    }
-
-  } catch (error) {
-    console.error("Error actualizando métricas:", error);
+  if (data.last_activity) {
+    // textContent: el contenido del mensaje no se interpreta como HTML
+    const container = document.getElementById("last-activity");
+    const content = document.createElement("p");
+    content.className = "text-slate-300";
+    content.textContent = data.last_activity.content.slice(0, 120);
+    const date = document.createElement("p");
+    date.className = "text-xs text-slate-500 mt-1";
+    date.textContent = new Date(data.last_activity.created_at).toLocaleString();
+    container.replaceChildren(content, date);
   }
 }
 
-// Actualizar cada 10 segundos
-setInterval(refreshDashboardMetrics, 10000);
-// Cargar métricas al iniciar
-refreshDashboardMetrics();
\ No newline at end of file
+// Push por SSE (dashboard_live.js); polling cada 10 s solo como respaldo
+dashboardLive.subscribe("metrics", "/api/dashboard/metrics/", 10000, renderDashboardMetrics);
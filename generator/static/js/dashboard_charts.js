@@ -1,10 +1,7 @@
 let dailyChart;
 let projectChart;
 
-async function loadDashboardCharts() {
-  const response = await fetch("/api/dashboard/charts/");
-  const data = await response.json();
-
+function renderDashboardCharts(data) {
   // ===== DAILY CHART =====
   const dailyLabels = data.daily.map(item => item.date);
   const dailyValues = data.daily.map(item => item.cases);
@@ -63,8 +60,6 @@ async function loadDashboardCharts() {
   }
 }
 
-// Primera carga
-loadDashboardCharts();
+// Push por SSE (dashboard_live.js); polling cada 15 s solo como respaldo
+dashboardLive.subscribe("charts", "/api/dashboard/charts/", 15000, renderDashboardCharts);
 
-// Actualizar cada 15 segundos
-setInterval(loadDashboardCharts, 15000);
@@ -0,0 +1,60 @@
+// Conexión compartida con /api/dashboard/events/ (Server-Sent Events).
+// El servidor solo envía "metrics" o "charts" cuando cambian, así que un
+// dashboard sin actividad no genera peticiones. Si el navegador no soporta
+// EventSource o el servidor cierra la conexión (p.ej. 204 sin ASGI), cada
+// suscriptor vuelve a hacer polling de su endpoint JSON.
+window.dashboardLive = window.dashboardLive || (function () {
+  const subscriptions = [];
+  let source = null;
+  let polling = false;
+
+  function poll(subscription) {
+    const run = async () => {
+      try {
+        // Sin cambios el servidor responde 304 y fetch usa la copia cacheada
+        const response = await fetch(subscription.pollUrl);
+        subscription.handler(await response.json());
+      } catch (error) {
+        console.error("Error actualizando el dashboard:", error);
+      }
+    };
+    run();
+    setInterval(run, subscription.interval);
+  }
+
+  function startPolling() {
+    if (polling) return;
+    polling = true;
+    subscriptions.forEach(poll);
+  }
+
+  function connect() {
+    if (!window.EventSource) {
+      startPolling();
+      return;
+    }
+    source = new EventSource("/api/dashboard/events/");
+    source.onerror = () => {
+      // CONNECTING: EventSource reintenta solo; CLOSED: no volverá a intentarlo
+      if (source.readyState === EventSource.CLOSED) {
+        startPolling();
+      }
+    };
+  }
+
+  function subscribe(eventName, pollUrl, interval, handler) {
+    const subscription = { eventName, pollUrl, interval, handler };
+    subscriptions.push(subscription);
+
+    if (polling) {
+      poll(subscription);
+      return;
+    }
+    if (!source) connect();
+    if (source) {
+      source.addEventListener(eventName, (event) => handler(JSON.parse(event.data)));
+    }
+  }
+
+  return { subscribe };
+})();
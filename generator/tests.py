@@ -1,3 +1,2041 @@
-from django.test import TestCase
+import asyncio
+import hashlib
+import io
+import json
+import re
+import shutil
+import signal
+import tempfile
+import zipfile
+import threading
+import time
+import unittest
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+import httpx
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import F
+from django.test import LiveServerTestCase, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.timezone import now
+from reportlab.pdfgen import canvas
+
+from . import views
+from .management.commands.run_worker import run_processes
+from .models import (
+    AttachmentBlob,
+    CachedResponse,
+    ChatAttachment,
+    ChatMessage,
+    ChatSession,
+    DashboardVersion,
+    Job,
+    Project,
+    UsageMetric,
+)
+from .services import dashboard
+from .services.ai_simulator import AISimulator
+from .services.attachments import ATTACHMENT_VARIANTS_JOB, store_attachment
+from .services.chat_context import build_chat_context
+from .services.http_client import AIHttpClient, AsyncAIHttpClient
+from .services.ai_client import generate_test_cases
+from .services.jobs import HANDLERS, claim_job, enqueue, heartbeat, run_job
+from .services.load_test import run_load_test
+from .services.metric_rollups import _raw_range_metrics, range_metrics, rebuild_rollups
+from .services.pdf_export import html_to_flowables
+from .services.pdf_extraction import extract_pdf_text, extracted_text_path, reset_pool
+from .services.project_content import extract_project_content, format_file, plan_chunks, rank_files, split_files
+from .services.profiling import finish_profile, profile_buffer, profile_request
+from .services.project_generation import GENERATE_PROJECT_JOB, enqueue_project_generation, run_project_generation
+from .services.pubsub import get_broker
+from .services.rendering import (
+    CHAT_RENDERER_VERSION,
+    PROJECT_RENDERER_VERSION,
+    project_test_cases_html,
+    set_project_test_cases,
+)
+from .services.response_cache import (
+    LRUCache,
+    ResponseCache,
+    cache_key,
+    normalize_text,
+    response_cache,
+    warm_from_history,
+)
+from .services.search import rebuild_index
+from .services.synthetic import SYNTHETIC_PREFIX, clear_synthetic, seed_synthetic
+from .services.telemetry import OUTCOME_CACHE, TIME_TO_FIRST_TOKEN, GenerationTelemetry, render_metrics
+from .services.tokens import ModelTokenizer, count_tokens, token_budget
+from .uploads import get_content_addressed_storage
+
+
+def use_temp_media(test):
+    """MEDIA_ROOT temporal para los tests que escriben archivos."""
+    media_root = tempfile.mkdtemp(prefix="qa-media-")
+    test.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+    test.enterContext(override_settings(MEDIA_ROOT=media_root))
+
+
+def clear_response_cache(test):
+    """
+    La LRU de response_cache es global al proceso y no se revierte con la
+    transacción del test: los tests que llaman a la IA empiezan sin entradas
+    y no dejan las suyas a los siguientes.
+    """
+    response_cache.memory.clear()
+    test.addCleanup(response_cache.memory.clear)
+
+
+# -------------------------
+# CLIENTE HTTP DEL BACKEND DE IA
+# -------------------------
+class ScriptedBackend:
+    """Transport que responde (o falla) según una lista de pasos."""
+
+    def __init__(self, *steps):
+        self.steps = list(steps)
+        self.calls = 0
+
+    def __call__(self, request):
+        self.calls += 1
+        step = self.steps.pop(0) if len(self.steps) > 1 else self.steps[0]
+        if isinstance(step, type) and issubclass(step, Exception):
+            raise step("simulado", request=request)
+        return httpx.Response(step, json={"test_cases": f"respuesta {self.calls}"})
+
+
+class AIHttpClientRetryTests(TestCase):
+
+    def client_for(self, backend, **kwargs):
+        kwargs.setdefault("max_retries", 2)
+        kwargs.setdefault("backoff", 0)
+        client = AIHttpClient(base_url="http://backend", transport=httpx.MockTransport(backend), **kwargs)
+        self.addCleanup(client.close)
+        return client
+
+    def test_connection_and_pool_errors_are_always_retried(self):
+        for error in (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout):
+            backend = ScriptedBackend(error, error, 200)
+            response = self.client_for(backend).post("/generate", json={})
+            self.assertEqual((response.status_code, backend.calls), (200, 3), error)
+
+    def test_errors_after_sending_only_retry_idempotent_calls(self):
+        for error in (httpx.ReadTimeout, httpx.RemoteProtocolError, httpx.ReadError):
+            backend = ScriptedBackend(error, 200)
+            with self.assertRaises(error):
+                self.client_for(backend).post("/generate", json={})
+            self.assertEqual(backend.calls, 1)
+
+            backend = ScriptedBackend(error, 200)
+            self.assertEqual(self.client_for(backend).post("/health", idempotent=True).status_code, 200)
+            self.assertEqual(backend.calls, 2)
+
+    def test_gateway_errors_only_retry_idempotent_calls(self):
+        for status in (502, 503, 504):
+            backend = ScriptedBackend(status, 200)
+            self.assertEqual(self.client_for(backend).post("/generate", json={}).status_code, status)
+            self.assertEqual(backend.calls, 1)
+
+            backend = ScriptedBackend(status, 200)
+            self.assertEqual(self.client_for(backend).post("/health", idempotent=True).status_code, 200)
+            self.assertEqual(backend.calls, 2)
+
+        # Agotados los reintentos se devuelve la última respuesta
+        backend = ScriptedBackend(503)
+        self.assertEqual(self.client_for(backend).post("/health", idempotent=True).status_code, 503)
+        self.assertEqual(backend.calls, 3)
+
+    def test_other_errors_are_never_retried(self):
+        for status in (400, 422, 500):
+            backend = ScriptedBackend(status, 200)
+            self.assertEqual(self.client_for(backend).post("/health", idempotent=True).status_code, status)
+            self.assertEqual(backend.calls, 1)
+
+    def test_backoff_doubles_up_to_the_cap(self):
+        backend = ScriptedBackend(httpx.ConnectError)
+        client = self.client_for(backend, max_retries=4, backoff=0.5, backoff_max=3)
+
+        with mock.patch("generator.services.http_client.random.uniform", return_value=1.0), \
+                mock.patch("generator.services.http_client.time.sleep") as sleep:
+            with self.assertRaises(httpx.ConnectError):
+                client.post("/generate", json={})
+
+        self.assertEqual([call.args[0] for call in sleep.call_args_list], [0.5, 1.0, 2.0, 3])
+        self.assertEqual((backend.calls, client.stats()["retries"]), (5, 4))
+
+    async def test_async_client_classifies_the_same_way(self):
+        backend = ScriptedBackend(httpx.ConnectError, 504, 200)
+        client = AsyncAIHttpClient(
+            base_url="http://backend", transport=httpx.MockTransport(backend), max_retries=2, backoff=0,
+        )
+        async with client.stream("/generate", json={}) as response:
+            self.assertEqual(response.status_code, 504)  # el 504 de una generación no se repite
+        await client.close()
+        self.assertEqual(backend.calls, 2)
+
+    @override_settings(AI_HTTP_POOL_TIMEOUT=3)
+    def test_generation_waits_briefly_for_the_pool_and_never_repeats_work(self):
+        backend = ScriptedBackend(httpx.ReadTimeout, 200)
+        client = self.client_for(backend)
+        self.assertEqual(client._timeout(600).pool, 3)
+
+        clear_response_cache(self)
+        with mock.patch("generator.services.ai_client.get_client", return_value=client):
+            with self.assertRaises(httpx.ReadTimeout):
+                generate_test_cases({"requirement": "Validar login lento"})
+        self.assertEqual(backend.calls, 1)
+
+    def test_pool_counters_are_exported(self):
+        backend = ScriptedBackend(httpx.ConnectError, 200)
+        client = self.client_for(backend)
+        client.post("/generate", json={})
+
+        with mock.patch("generator.services.http_client._client", client):
+            response = self.client.get(reverse("prometheus_metrics"))
+        metrics = response.content.decode()
+        self.assertIn('qa_ai_http_requests_total{client="sync"} 2\n', metrics)
+        self.assertIn('qa_ai_http_retries_total{client="sync"} 1\n', metrics)
+        self.assertIn("# TYPE qa_ai_http_connections_open gauge", metrics)
+
+
+# -------------------------
+# STREAM CHAT (ASGI)
+# -------------------------
+BACKEND_DELAY = 0.5
+
+
+async def slow_backend(request):
+    # Simula la latencia de la GPU antes de devolver los casos
+    await asyncio.sleep(BACKEND_DELAY)
+    return httpx.Response(200, content=b"ID: TC-01\nPaso 1: abrir login\n")
+
+
+class ChatStreamConcurrencyTests(TestCase):
+    """
+    Prueba de carga de la vista async: con WSGI cada stream ocupa un hilo,
+    así que STREAMS peticiones sobre WSGI_WORKERS hilos tardan al menos
+    STREAMS * BACKEND_DELAY / WSGI_WORKERS segundos.
+    """
+
+    STREAMS = 100
+    WSGI_WORKERS = 10
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("qa", password="secret")
+        cls.chats = [
+            ChatSession.objects.create(user=cls.user, title="Nuevo Chat")
+            for _ in range(cls.STREAMS)
+        ]
+
+    def setUp(self):
+        clear_response_cache(self)
+
+    async def consume(self, chat):
+        # Un requerimiento distinto por chat para no acertar en la caché
+        response = await self.async_client.get(
+            reverse("chat_stream", args=[chat.id]),
+            {"message": f"Validar el login con usuario bloqueado #{chat.id}"}
+        )
+        return b"".join([chunk async for chunk in response.streaming_content])
+
+    async def test_concurrent_streams_share_one_process(self):
+        backend = AsyncAIHttpClient(
+            base_url="http://backend",
+            transport=httpx.MockTransport(slow_backend)
+        )
+        await self.async_client.aforce_login(self.user)
+
+        with mock.patch("generator.services.ai_client.get_async_client", return_value=backend):
+            start = time.perf_counter()
+            bodies = await asyncio.gather(*(self.consume(chat) for chat in self.chats))
+            elapsed = time.perf_counter() - start
+
+        wsgi_lower_bound = self.STREAMS * BACKEND_DELAY / self.WSGI_WORKERS
+        self.assertLess(elapsed, wsgi_lower_bound)
+        self.assertTrue(all(body.startswith(b"ID: TC-01") for body in bodies))
+        self.assertEqual(
+            await ChatMessage.objects.filter(chat__user=self.user, is_user=False).acount(),
+            self.STREAMS
+        )
+
+    def test_wsgi_requests_stream_line_by_line(self):
+        # Con WSGI la vista async se acumularía entera: se usa la sync
+        self.client.force_login(self.user)
+        lines = iter(["ID: TC-01\n", "Paso 1: abrir login\n"])
+        with mock.patch("generator.views.generate_test_cases_stream", return_value=lines):
+            response = self.client.get(reverse("chat_stream", args=[self.chats[0].id]), {"message": "login"})
+
+            self.assertFalse(response.is_async)
+            self.assertEqual(list(response.streaming_content), [b"ID: TC-01\n", b"Paso 1: abrir login\n"])
+
+
+# -------------------------
+# MÉTRICAS POR MENSAJE (signals)
+# -------------------------
+class UpdateMetricsOnMessageTests(TransactionTestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user("metrics", password="secret")
+        self.chat = ChatSession.objects.create(user=self.user, title="Chat")
+
+    def create_message(self, is_user=True, chat=None):
+        return ChatMessage.objects.create(
+            chat=chat or self.chat,
+            is_user=is_user,
+            content="mensaje",
+            response_time_ms=None if is_user else 4200,
+        )
+
+    def message_queries(self, is_user):
+        with CaptureQueriesContext(connection) as ctx:
+            self.create_message(is_user=is_user)
+        return [re.match(r'(\w+(?: IMMEDIATE)?)(?:.*?"(\w+)")?', q["sql"]).groups() for q in ctx.captured_queries]
+
+    def test_one_transaction_per_message(self):
+        self.create_message()  # crea la fila del día
+
+        for is_user in (True, False):
+            self.assertEqual(self.message_queries(is_user), [
+                ("INSERT", "generator_chatmessage"),
+                ("BEGIN IMMEDIATE", None),
+                ("UPDATE", "generator_chatsession"),
+                ("UPDATE", "generator_usagemetric"),
+                ("INSERT", "generator_dashboardversion"),  # upsert de la versión
+                ("COMMIT", None),
+            ])
+
+    def test_counters_and_accuracy_computed_in_sql(self):
+        self.create_message(is_user=True)
+        for _ in range(200):
+            self.create_message(is_user=False)
+
+        metric = UsageMetric.objects.get(user=self.user)
+        self.chat.refresh_from_db()
+
+        self.assertEqual(self.chat.total_messages, 201)
+        self.assertEqual(self.chat.total_ai_messages, 200)
+        self.assertEqual(metric.total_messages, 201)
+        self.assertEqual(metric.total_ai_responses, 200)
+        self.assertEqual(metric.estimated_time_saved_minutes, 200 * (4 + 5))
+        self.assertEqual(metric.estimated_accuracy, 95.0)
+
+    def test_parallel_writers_keep_exact_counts(self):
+        threads, per_thread = 8, 25
+        chats = [ChatSession.objects.create(user=self.user, title=f"Chat {i}") for i in range(threads)]
+        errors = []
+
+        def writer(chat):
+            try:
+                for i in range(per_thread):
+                    self.create_message(is_user=i % 2 == 0, chat=chat)
+            except Exception as exc:  # pragma: no cover - se reporta abajo
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=writer, args=(chat,)) for chat in chats]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(errors, [])
+        metric = UsageMetric.objects.get(user=self.user, project=None)
+        self.assertEqual(metric.total_messages, threads * per_thread)
+        self.assertEqual(metric.total_ai_responses, threads * (per_thread // 2))
+        for chat in ChatSession.objects.filter(id__in=[c.id for c in chats]):
+            self.assertEqual(chat.total_messages, per_thread)
+
+
+class ProjectDeletionMetricsTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user("borrar", password="secret")
+        self.client.force_login(self.user)
+        self.projects = [Project.objects.create(user=self.user, name=f"Proyecto {i}") for i in range(2)]
+        self.today, self.yesterday = date(2025, 3, 10), date(2025, 3, 9)
+
+    def metric(self, project, day, cases, minutes, accuracy):
+        metric = UsageMetric.objects.create(
+            user=self.user, project=project, total_messages=cases * 2, total_ai_responses=cases,
+            estimated_time_saved_minutes=minutes, estimated_accuracy=accuracy,
+        )
+        UsageMetric.objects.filter(pk=metric.pk).update(date=day)
+
+    def totals(self):
+        return {
+            (row.project_id, row.date): (row.total_messages, row.total_ai_responses,
+                                         row.estimated_time_saved_minutes, row.estimated_accuracy)
+            for row in UsageMetric.objects.filter(user=self.user)
+        }
+
+    def test_deleted_projects_merge_into_the_day_without_project(self):
+        self.metric(None, self.today, 1, 5, 10.0)
+        self.metric(self.projects[0], self.today, 3, 20, 40.0)
+        self.metric(self.projects[0], self.yesterday, 2, 7, 5.0)
+        self.metric(self.projects[1], self.today, 4, 30, 20.0)
+        self.metric(self.projects[1], self.yesterday, 1, 1, 8.0)
+
+        for project in self.projects:
+            response = self.client.post(reverse("delete_project", args=[project.id]))
+            self.assertEqual(response.status_code, 302)
+
+        self.assertEqual(self.totals(), {
+            (None, self.today): (16, 8, 55, 40.0),
+            (None, self.yesterday): (6, 3, 8, 8.0),
+        })
+
+    def test_deleting_several_projects_at_once(self):
+        self.metric(self.projects[0], self.today, 3, 20, 40.0)
+        self.metric(self.projects[1], self.today, 4, 30, 20.0)
+
+        Project.objects.filter(user=self.user).delete()
+
+        self.assertEqual(self.totals(), {(None, self.today): (14, 7, 50, 40.0)})
+
+    def test_deleting_the_user_removes_everything(self):
+        self.metric(None, self.today, 1, 5, 10.0)
+        self.metric(self.projects[0], self.today, 3, 20, 40.0)
+        self.metric(self.projects[1], self.today, 4, 30, 20.0)
+
+        self.user.delete()
+
+        self.assertFalse(UsageMetric.objects.exists())
+        self.assertFalse(DashboardVersion.objects.exists())
+
+
+# -------------------------
+# PAGINACIÓN DEL CHAT
+# -------------------------
+@override_settings(CHAT_PAGE_SIZE=20)
+class ChatPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("pages", password="secret")
+        cls.chat = ChatSession.objects.create(user=cls.user, title="Largo")
+        ChatMessage.objects.bulk_create([
+            ChatMessage(chat=cls.chat, is_user=i % 2 == 0, content=f"mensaje {i}")
+            for i in range(95)
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_chat_page_renders_only_latest_messages(self):
+        response = self.client.get(reverse("chat", args=[self.chat.id]))
+
+        contents = [msg.content for msg in response.context["messages"]]
+        self.assertEqual(contents, [f"mensaje {i}" for i in range(75, 95)])
+        self.assertTrue(response.context["older_cursor"])
+
+    def test_api_walks_history_with_cursor(self):
+        url = reverse("chat_messages_api", args=[self.chat.id])
+        cursor = self.client.get(reverse("chat", args=[self.chat.id])).context["older_cursor"]
+
+        seen = []
+        while cursor:
+            data = self.client.get(url, {"before": cursor}).json()
+            seen = [msg["id"] for msg in data["messages"]] + seen
+            cursor = data["next_cursor"]
+
+        self.assertEqual(len(seen), 75)
+        self.assertEqual(seen, sorted(seen))
+
+    def test_invalid_cursor(self):
+        url = reverse("chat_messages_api", args=[self.chat.id])
+        self.assertEqual(self.client.get(url, {"before": "nope"}).status_code, 400)
+
+    def test_attachments_walk_with_cursor(self):
+        ChatAttachment.objects.bulk_create([
+            ChatAttachment(chat=self.chat, file=f"chat_files/captura-{i}.png", file_type="image")
+            for i in range(45)
+        ])
+        response = self.client.get(reverse("chat", args=[self.chat.id]))
+        seen = [att.id for att in response.context["attachments"]]
+        cursor = response.context["attachments_cursor"]
+        self.assertEqual(len(seen), 20)
+
+        url = reverse("chat_attachments_api", args=[self.chat.id])
+        while cursor:
+            data = self.client.get(url, {"before": cursor}).json()
+            seen += [att["id"] for att in data["attachments"]]
+            cursor = data["next_cursor"]
+
+        # Todos, sin repetir, del más reciente al más antiguo
+        self.assertEqual(seen, sorted(ChatAttachment.objects.values_list("id", flat=True), reverse=True))
+        self.assertEqual(self.client.get(url, {"before": "nope"}).status_code, 400)
+
+
+# -------------------------
+# HTML RENDERIZADO AL GUARDAR
+# -------------------------
+AI_MARKDOWN = "**ID:** TC-01\n\n| Paso | Resultado |\n|---|---|\n| Login | Bloqueado |"
+
+
+class RenderedHtmlTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user("render", password="secret")
+        self.client.force_login(self.user)
+        self.chat = ChatSession.objects.create(user=self.user, title="Render")
+
+    def ai_message(self, content=AI_MARKDOWN, html="", version=""):
+        return ChatMessage.objects.create(
+            chat=self.chat, is_user=False, content=content, rendered_html=html, rendered_version=version,
+        )
+
+    def test_ai_messages_are_rendered_once_when_saved(self):
+        views.save_ai_message(self.chat, AI_MARKDOWN, GenerationTelemetry())
+        message = ChatMessage.objects.get(chat=self.chat)
+        self.assertEqual(message.rendered_version, CHAT_RENDERER_VERSION)
+        self.assertIn("<strong>ID:</strong>", message.rendered_html)
+        self.assertIn("<table>", message.rendered_html)
+
+        # Leer el chat no vuelve a pasar por Markdown
+        with mock.patch("generator.services.rendering.render_chat_markdown", side_effect=AssertionError):
+            response = self.client.get(reverse("chat", args=[self.chat.id]))
+        self.assertContains(response, "<strong>ID:</strong>")
+
+    def test_renderer_version_bump_rerenders_stale_messages_on_read(self):
+        message = self.ai_message(html="<p>viejo</p>", version=CHAT_RENDERER_VERSION)
+
+        with mock.patch("generator.services.rendering.CHAT_RENDERER_VERSION", "nueva"):
+            self.client.get(reverse("chat", args=[self.chat.id]))
+            message.refresh_from_db()
+            self.assertEqual(message.rendered_version, "nueva")
+            self.assertIn("<strong>ID:</strong>", message.rendered_html)
+
+            # Ya al día: la siguiente lectura no escribe
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(reverse("chat_messages_api", args=[self.chat.id]))
+            self.assertFalse([q for q in queries.captured_queries if q["sql"].startswith("UPDATE")])
+
+    def test_project_cases_rerender_when_renderer_changes(self):
+        project = Project.objects.create(user=self.user, name="Render")
+        set_project_test_cases(project, AI_MARKDOWN)
+        project.save()
+        self.assertEqual(project_test_cases_html(project), project.test_cases_html)
+
+        Project.objects.filter(pk=project.pk).update(test_cases_html="<p>viejo</p>", test_cases_html_version="viejo")
+        project.refresh_from_db()
+        self.assertIn("<table>", project_test_cases_html(project))
+        project.refresh_from_db()
+        self.assertEqual(project.test_cases_html_version, PROJECT_RENDERER_VERSION)
+
+    def test_backfill_only_touches_stale_rows(self):
+        fresh = [self.ai_message(html="<p>guardado</p>", version=CHAT_RENDERER_VERSION) for _ in range(3)]
+        stale = [self.ai_message(version=version) for version in ("", "viejo", "", "viejo", "")]
+        user_message = ChatMessage.objects.create(chat=self.chat, is_user=True, content="**pedido**")
+
+        current = Project.objects.create(user=self.user, name="Al día", test_cases=AI_MARKDOWN,
+                                         test_cases_html="<p>guardado</p>",
+                                         test_cases_html_version=PROJECT_RENDERER_VERSION)
+        outdated = Project.objects.create(user=self.user, name="Viejo", test_cases=AI_MARKDOWN,
+                                          test_cases_html_version="viejo")
+        Project.objects.create(user=self.user, name="Sin casos")
+
+        out = io.StringIO()
+        call_command("backfill_rendered_html", "--batch-size", "2", stdout=out)
+
+        self.assertIn("5 mensajes y 1 proyectos", out.getvalue())
+        for message in fresh:
+            message.refresh_from_db()
+            self.assertEqual(message.rendered_html, "<p>guardado</p>")
+        for message in stale:
+            message.refresh_from_db()
+            self.assertEqual(message.rendered_version, CHAT_RENDERER_VERSION)
+            self.assertIn("<strong>ID:</strong>", message.rendered_html)
+        user_message.refresh_from_db()
+        self.assertEqual((user_message.rendered_html, user_message.rendered_version), ("", ""))
+
+        current.refresh_from_db()
+        outdated.refresh_from_db()
+        self.assertEqual(current.test_cases_html, "<p>guardado</p>")
+        self.assertEqual(outdated.test_cases_html_version, PROJECT_RENDERER_VERSION)
+
+        # Una segunda pasada no encuentra nada
+        out = io.StringIO()
+        call_command("backfill_rendered_html", stdout=out)
+        self.assertIn("0 mensajes y 0 proyectos", out.getvalue())
+
+
+# -------------------------
+# CACHÉ DE RESPUESTAS IA
+# -------------------------
+class ResponseCacheTests(TestCase):
+
+    def setUp(self):
+        clear_response_cache(self)
+        self.user = User.objects.create_user("cache", password="secret")
+        self.backend_calls = 0
+
+    def backend(self, request):
+        self.backend_calls += 1
+        return httpx.Response(200, json={"test_cases": f"ID: TC-0{self.backend_calls}"})
+
+    def test_key_ignores_trivial_variations_and_tracks_backend_version(self):
+        self.assertEqual(normalize_text("  Validar   LOGIN bloqueado.  "), "validar login bloqueado")
+        self.assertEqual(cache_key("Validar login bloqueado"), cache_key("validar  login BLOQUEADO?"))
+        self.assertNotEqual(cache_key("Validar login"), cache_key("Validar login", "otro contexto"))
+        with override_settings(AI_BACKEND_VERSION="v2"):
+            self.assertNotEqual(cache_key("Validar login"), cache_key("Validar login", version="v1"))
+
+    def test_lru_evicts_least_recently_used(self):
+        lru = LRUCache(max_entries=2, ttl=60)
+        lru.set("a", 1)
+        lru.set("b", 2)
+        lru.get("a")  # "b" pasa a ser el menos usado
+        lru.set("c", 3)
+
+        self.assertEqual((lru.get("a"), lru.get("b"), lru.get("c")), (1, None, 3))
+        self.assertEqual(len(lru), 2)
+
+    def test_memory_entries_expire_after_ttl(self):
+        with mock.patch("generator.services.response_cache.time.monotonic", return_value=1000):
+            lru = LRUCache(max_entries=10, ttl=60)
+            lru.set("a", 1)
+        with mock.patch("generator.services.response_cache.time.monotonic", return_value=1059):
+            self.assertEqual(lru.get("a"), 1)
+        with mock.patch("generator.services.response_cache.time.monotonic", return_value=1061):
+            self.assertIsNone(lru.get("a"))
+            self.assertEqual(len(lru), 0)
+
+    @override_settings(AI_CACHE_PERSISTENT_TTL=3600)
+    def test_other_processes_read_the_persistent_table(self):
+        key = cache_key("Validar login")
+        response_cache.set(key, "Validar login", "", "ID: TC-01")
+
+        other_process = ResponseCache()
+        self.assertEqual(other_process.get(key), "ID: TC-01")
+        self.assertEqual(other_process.get(key), "ID: TC-01")
+        self.assertEqual((other_process.counters["db_hits"], other_process.counters["memory_hits"]), (1, 1))
+        self.assertEqual(CachedResponse.objects.get(key=key).hits, 1)
+
+        # Vencida en la tabla: nadie la usa y purge_expired la borra
+        CachedResponse.objects.update(created_at=now() - timedelta(hours=2))
+        self.assertIsNone(ResponseCache().get(key))
+        self.assertEqual(response_cache.purge_expired(), 1)
+
+    def test_repeated_requirement_skips_the_backend(self):
+        backend = AIHttpClient(base_url="http://backend", transport=httpx.MockTransport(self.backend))
+        with mock.patch("generator.services.ai_client.get_client", return_value=backend):
+            first = generate_test_cases({"requirement": "Validar login"})
+            self.assertEqual(generate_test_cases({"requirement": "validar LOGIN."}), first)
+            self.assertEqual(self.backend_calls, 1)
+
+            # Otro modelo desplegado: las respuestas anteriores ya no valen
+            with override_settings(AI_BACKEND_VERSION="v2"):
+                self.assertNotEqual(generate_test_cases({"requirement": "Validar login"}), first)
+            self.assertEqual(self.backend_calls, 2)
+
+    @override_settings(AI_CACHE_ENABLED=False)
+    def test_disabled_cache_always_calls_the_backend(self):
+        backend = AIHttpClient(base_url="http://backend", transport=httpx.MockTransport(self.backend))
+        with mock.patch("generator.services.ai_client.get_client", return_value=backend):
+            generate_test_cases({"requirement": "Validar login"})
+            generate_test_cases({"requirement": "Validar login"})
+
+        self.assertEqual(self.backend_calls, 2)
+        self.assertFalse(CachedResponse.objects.exists())
+
+    def test_warm_command_loads_successful_pairs_from_history(self):
+        chat = ChatSession.objects.create(user=self.user, title="Historial")
+        for requirement, response, success in (
+            ("Validar registro", "ID: TC-01 registro", True),
+            ("Validar pago", "Error del backend", False),
+        ):
+            ChatMessage.objects.create(chat=chat, is_user=True, content=requirement)
+            ChatMessage.objects.create(chat=chat, is_user=False, content=response, success=success)
+        CachedResponse.objects.create(
+            key="vieja", backend_version="v1", requirement="x", response="y",
+        )
+        CachedResponse.objects.filter(key="vieja").update(created_at=now() - timedelta(days=365))
+
+        out = io.StringIO()
+        call_command("warm_response_cache", "--purge-expired", stdout=out)
+
+        self.assertIn("Entradas expiradas eliminadas: 1", out.getvalue())
+        self.assertIn("1 respuestas cargadas", out.getvalue())
+        response_cache.memory.clear()
+        self.assertEqual(response_cache.get(cache_key("validar registro")), "ID: TC-01 registro")
+        self.assertIsNone(response_cache.get(cache_key("Validar pago")))
+
+    @override_settings(CHAT_CONTEXT_TOKENS=200, CHAT_SUMMARY_TOKENS=60, CHAT_SUMMARY_TURN_TOKENS=15)
+    def test_warmed_keys_match_the_context_each_request_sent(self):
+        chat = ChatSession.objects.create(user=self.user, title="Largo")
+        sent = []
+        for i in range(12):
+            # Como chat_stream_view: contexto antes de guardar el mensaje
+            context = build_chat_context(chat)
+            requirement = f"Requerimiento {i}: validar el alta de usuarios con datos inválidos"
+            ChatMessage.objects.create(chat=chat, is_user=True, content=requirement)
+            ChatMessage.objects.create(chat=chat, is_user=False, content=f"ID: TC-{i}\nPaso 1: abrir el alta\n")
+            sent.append((requirement, context))
+        self.assertIn("RESUMEN", sent[-1][1])  # las últimas peticiones ya llevaban resumen
+
+        self.assertEqual(warm_from_history(), 12)
+        CachedResponse.objects.all().delete()  # solo cuenta la LRU
+        for i, (requirement, context) in enumerate(sent):
+            self.assertEqual(response_cache.get(cache_key(requirement, context)), f"ID: TC-{i}\nPaso 1: abrir el alta\n")
+
+    def test_counters_are_exported(self):
+        cache = ResponseCache()  # los contadores del global suman todo el run
+        key = cache_key("Validar login")
+        cache.get(key)
+        cache.set(key, "Validar login", "", "ID: TC-01")
+        cache.get(key)
+
+        with mock.patch("generator.services.response_cache.response_cache", cache):
+            metrics = self.client.get(reverse("prometheus_metrics")).content.decode()
+        self.assertIn('qa_ai_cache_lookups_total{result="memory_hit"} 1\n', metrics)
+        self.assertIn('qa_ai_cache_lookups_total{result="miss"} 1\n', metrics)
+        self.assertIn("qa_ai_cache_stores_total 1\n", metrics)
+        self.assertIn("qa_ai_cache_memory_entries 1\n", metrics)
+
+
+# -------------------------
+# DASHBOARD CACHEADO
+# -------------------------
+class DashboardMetricsApiTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("dash", password="secret")
+        self.chat = ChatSession.objects.create(user=self.user, title="Dash")
+        self.client.force_login(self.user)
+        self.url = reverse("dashboard_metrics_api")
+
+    def test_unchanged_dashboard_returns_304(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+
+        second = self.client.get(self.url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(second.status_code, 304)
+
+    def test_new_message_changes_etag(self):
+        first = self.client.get(self.url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ChatMessage.objects.create(chat=self.chat, is_user=False, content="Caso nuevo")
+
+        second = self.client.get(self.url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second["ETag"], first["ETag"])
+        self.assertEqual(second.json()["total_cases"], 1)
+        self.assertEqual(second.json()["last_activity"]["content"], "Caso nuevo")
+
+    def test_writes_from_worker_process_change_etag(self):
+        first = self.client.get(self.url)
+
+        # El worker de jobs tiene su propia caché en memoria: solo comparte la base
+        worker_cache = LocMemCache("worker", {})
+        with mock.patch.object(dashboard, "cache", worker_cache), self.captureOnCommitCallbacks(execute=True):
+            UsageMetric.objects.create(user=self.user, total_ai_responses=7)
+
+        second = self.client.get(self.url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json()["total_cases"], 7)
+
+    def test_dashboard_page_loads_the_live_charts(self):
+        response = self.client.get(reverse("dashboard"))
+
+        self.assertContains(response, 'id="dailyMetricsChart"')
+        self.assertContains(response, 'id="projectMetricsChart"')
+        self.assertContains(response, "js/dashboard_charts.js")
+
+
+@override_settings(DASHBOARD_SSE_HEARTBEAT=60)
+class DashboardEventsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("live", password="secret")
+
+    async def test_pushes_only_changed_sections(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse("dashboard_events"))
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        events = aiter(response.streaming_content)
+
+        self.assertEqual(await anext(events), b"retry: 5000\n\n")
+        self.assertTrue((await anext(events)).startswith(b"event: metrics\n"))
+        self.assertTrue((await anext(events)).startswith(b"event: charts\n"))
+
+        # Un proyecto nuevo cambia los KPIs pero no las gráficas
+        await Project.objects.acreate(user=self.user, name="Nuevo")
+        await sync_to_async(dashboard.invalidate)(self.user.pk)
+
+        chunk = await asyncio.wait_for(anext(events), 2)
+        self.assertTrue(chunk.startswith(b"event: metrics\n"))
+        self.assertIn(b'"total_projects": 1', chunk)
+
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(anext(events), 0.3)
+
+        await events.aclose()
+        self.assertEqual(get_broker().subscriber_count(), 0)
+
+    @override_settings(DASHBOARD_SSE_POLL=0.1)
+    async def test_changes_from_other_processes_arrive_by_polling(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse("dashboard_events"))
+        events = aiter(response.streaming_content)
+        for _ in range(3):  # retry, metrics, charts
+            await anext(events)
+
+        # Escritura en el worker: cambia la versión en la base pero el aviso
+        # del broker en memoria no llega a este proceso
+        with mock.patch.object(get_broker(), "publish", return_value=0):
+            await Project.objects.acreate(user=self.user, name="Desde el worker")
+            await sync_to_async(dashboard.invalidate)(self.user.pk)
+
+        chunk = await asyncio.wait_for(anext(events), 2)
+        self.assertIn(b'"total_projects": 1', chunk)
+        await events.aclose()
+
+    def test_wsgi_gets_204_instead_of_holding_a_thread(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("dashboard_events"))
+        self.assertEqual(response.status_code, 204)
+
+
+# -------------------------
+# COLA DE JOBS
+# -------------------------
+@override_settings(JOB_VISIBILITY_TIMEOUT=60, JOB_MAX_ATTEMPTS=3, JOB_RETRY_BACKOFF=10)
+class JobQueueTests(TestCase):
+
+    def setUp(self):
+        # Reloj fijo por delante del run_after que reciben los jobs al crearse
+        self.start = now() + timedelta(seconds=1)
+        clock = mock.patch("generator.services.jobs.now", return_value=self.start)
+        self.clock = clock.start()
+        self.addCleanup(clock.stop)
+
+        self.calls = []
+        handlers = mock.patch.dict(HANDLERS, {"prueba": self.handler})
+        handlers.start()
+        self.addCleanup(handlers.stop)
+
+    def handler(self, job):
+        self.calls.append(job.attempts)
+        if job.payload.get("fail"):
+            raise RuntimeError(f"falla {job.attempts}")
+        return {"ok": True}
+
+    def advance(self, seconds):
+        self.clock.return_value += timedelta(seconds=seconds)
+
+    def test_claim_locks_job_until_visibility_expires(self):
+        job = enqueue("prueba")
+
+        claimed = claim_job("worker-a")
+        self.assertEqual(claimed.id, job.id)
+        self.assertEqual(claimed.status, Job.STATUS_RUNNING)
+        self.assertEqual((claimed.locked_by, claimed.attempts), ("worker-a", 1))
+        self.assertEqual(claimed.locked_until, self.start + timedelta(seconds=60))
+        self.assertIsNone(claim_job("worker-b"))
+
+        # El worker A murió sin latidos: al vencer el lock otro lo re-reclama
+        self.advance(61)
+        reclaimed = claim_job("worker-b")
+        self.assertEqual(reclaimed.id, job.id)
+        self.assertEqual((reclaimed.locked_by, reclaimed.attempts), ("worker-b", 2))
+
+        # El worker viejo ya no puede extender ni cerrar el job
+        self.assertFalse(heartbeat(claimed))
+        run_job(claimed)
+        reclaimed.refresh_from_db()
+        self.assertEqual(reclaimed.status, Job.STATUS_RUNNING)
+
+    def test_heartbeat_extends_the_lock(self):
+        enqueue("prueba")
+        job = claim_job("worker-a")
+
+        self.advance(50)
+        self.assertTrue(heartbeat(job))
+        job.refresh_from_db()
+        self.assertEqual(job.locked_until, self.start + timedelta(seconds=110))
+
+        self.advance(30)  # vencido sin el latido
+        self.assertIsNone(claim_job("worker-b"))
+
+    def test_failures_retry_with_backoff_then_fail(self):
+        job = enqueue("prueba", payload={"fail": True})
+
+        for attempt, delay in ((1, 10), (2, 20)):
+            with self.assertLogs("generator.services.jobs", "ERROR"):
+                run_job(claim_job("worker"))
+            job.refresh_from_db()
+            self.assertEqual(job.status, Job.STATUS_PENDING)
+            self.assertEqual(job.error, f"RuntimeError: falla {attempt}")
+            self.assertEqual(job.run_after, self.clock.return_value + timedelta(seconds=delay))
+            self.assertEqual((job.locked_by, job.locked_until), ("", None))
+
+            self.assertIsNone(claim_job("worker"))  # aún en backoff
+            self.advance(delay)
+
+        with self.assertLogs("generator.services.jobs", "ERROR"):
+            run_job(claim_job("worker"))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_FAILED)
+        self.assertEqual(job.error, "RuntimeError: falla 3")
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(self.calls, [1, 2, 3])
+        self.advance(3600)
+        self.assertIsNone(claim_job("worker"))
+
+    def test_reclaimed_past_max_attempts_fails_without_running(self):
+        job = enqueue("prueba", max_attempts=1)
+        claim_job("worker-a")
+        self.advance(61)
+
+        run_job(claim_job("worker-b"))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_FAILED)
+        self.assertEqual(job.error, "Se agotaron los intentos")
+        self.assertEqual(self.calls, [])
+
+    def test_success_stores_result(self):
+        job = enqueue("prueba")
+        run_job(claim_job("worker"))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result, job.progress), (Job.STATUS_DONE, {"ok": True}, 100))
+
+    def test_sigterm_to_the_parent_stops_every_child_process(self):
+        children = [mock.Mock(is_alive=mock.Mock(return_value=True)) for _ in range(3)]
+        handlers = {}
+
+        def join():
+            # El padre recibe SIGTERM mientras espera a los hijos
+            handlers[signal.SIGTERM](signal.SIGTERM, None)
+
+        children[0].join.side_effect = join
+        worker = "generator.management.commands.run_worker"
+        with mock.patch(f"{worker}.multiprocessing.Process", side_effect=children), \
+                mock.patch(f"{worker}.signal.signal", handlers.__setitem__), \
+                mock.patch(f"{worker}.connections"):
+            run_processes("host-1", 3, 2, 1, False, None)
+
+        for child in children:
+            child.start.assert_called_once()
+            child.terminate.assert_called_once()
+            child.join.assert_called_once()
+
+
+# -------------------------
+# SUBIDAS DEDUPLICADAS POR HASH
+# -------------------------
+SPEC = ("Requerimiento: el usuario se bloquea tras tres intentos fallidos de login.\n" * 10).encode()
+
+
+class ProjectUploadDedupTests(TestCase):
+
+    def setUp(self):
+        use_temp_media(self)
+        self.users = [User.objects.create_user(f"equipo{i}", password="secret") for i in range(2)]
+
+    def upload(self, user, name, content=SPEC):
+        self.client.force_login(user)
+        return self.client.post(reverse("upload_project"), {
+            "name": name,
+            "file": SimpleUploadedFile("spec.txt", content, content_type="text/plain"),
+        })
+
+    def delete_file(self, project):
+        request = RequestFactory().post("/")
+        request.user = project.user
+        return views.delete_project_file(request, project.id)
+
+    def test_hash_is_computed_while_uploading(self):
+        # Si el handler no dejara el hash, project_file_path volvería a leer el archivo
+        with mock.patch("generator.uploads.file_sha256", side_effect=AssertionError("releído")):
+            self.upload(self.users[0], "Spec")
+
+        project = Project.objects.get()
+        self.assertEqual(project.file_hash, hashlib.sha256(SPEC).hexdigest())
+        self.assertEqual(project.file.name, f"projects/{project.file_hash[:2]}/{project.file_hash}.txt")
+
+    def test_same_file_is_stored_once_and_reuses_cases(self):
+        self.upload(self.users[0], "Spec")
+        first = Project.objects.get()
+        set_project_test_cases(first, "**ID:** TC-001\n**Título:** Bloqueo tras tres intentos\n")
+        first.save()
+
+        self.upload(self.users[1], "Spec de otro equipo")
+        second = Project.objects.get(user=self.users[1])
+
+        self.assertEqual(second.file.name, first.file.name)
+        self.assertEqual(second.test_cases, first.test_cases)
+        self.assertEqual(second.extracted_content, first.extracted_content)
+        self.assertEqual(second.content_index, first.content_index)
+        # Reutilizado: solo el primero pasó por la cola de generación
+        self.assertEqual(list(Job.objects.values_list("project", flat=True)), [first.id])
+
+        storage = get_content_addressed_storage()
+        self.assertEqual(storage.listdir(f"projects/{first.file_hash[:2]}")[1], [f"{first.file_hash}.txt"])
+
+    def test_different_content_gets_its_own_file(self):
+        self.upload(self.users[0], "Spec")
+        self.upload(self.users[0], "Spec v2", SPEC + b"Nuevo requisito: recuperar la clave.\n")
+
+        first, second = Project.objects.order_by("id")
+        self.assertNotEqual(first.file.name, second.file.name)
+        self.assertEqual(Job.objects.count(), 2)
+
+    def test_shared_file_survives_until_last_reference(self):
+        self.upload(self.users[0], "Spec")
+        self.upload(self.users[1], "Spec")
+        first, second = Project.objects.order_by("id")
+        storage = get_content_addressed_storage()
+
+        self.delete_file(first)
+        first.refresh_from_db()
+        self.assertFalse(first.file)
+        self.assertTrue(storage.exists(second.file.name))
+        with second.file.open("rb") as file:
+            self.assertEqual(file.read(), SPEC)
+
+        name = second.file.name
+        self.delete_file(second)
+        self.assertFalse(storage.exists(name))
+
+
+# -------------------------
+# GENERACIÓN DE PROYECTOS POR FRAGMENTOS
+# -------------------------
+CHUNK_DELAY = 0.3
+
+
+def project_backend(request):
+    # Cada fragmento devuelve un caso propio y uno común (duplicado entre fragmentos)
+    time.sleep(CHUNK_DELAY)
+    chunk = json.loads(request.content)["project_content"]
+    first_file = chunk.split("\n", 1)[0].removeprefix("### FILE: ")
+    return httpx.Response(200, json={"test_cases": (
+        "# Casos\n"
+        f"**ID:** TC-001\n**Título:** Revisar {first_file}\n\n"
+        "**ID:** TC-002\n**Título:** Login con usuario bloqueado\n"
+    )})
+
+
+@override_settings(PROJECT_CHUNK_TOKENS=150, PROJECT_GENERATION_CONCURRENCY=4)
+class ProjectGenerationTests(TestCase):
+
+    FILES = 12
+
+    def setUp(self):
+        use_temp_media(self)
+        clear_response_cache(self)
+        self.user = User.objects.create_user("mono", password="secret")
+        content = "".join(
+            format_file(f"src/module_{i}.py", f"def handler_{i}():\n" + "    pass\n" * 50)
+            for i in range(self.FILES)
+        ) + format_file("src/generated.py", "VALUE = 1\n" * 200)
+        self.project = Project.objects.create(user=self.user, name="Monorepo", extracted_content=content)
+
+    def test_plan_keeps_every_file_within_budget(self):
+        chunks = plan_chunks(self.project.extracted_content, max_tokens=150)
+
+        self.assertTrue(all(count_tokens(chunk) <= 150 for chunk in chunks))
+        joined = "".join(chunks)
+        self.assertTrue(all(f"src/module_{i}.py" in joined for i in range(self.FILES)))
+        self.assertIn("src/generated.py (parte 1/", joined)
+
+    @override_settings(AI_TOKENIZER_MARGIN=0.5)
+    def test_approximate_count_leaves_margin(self):
+        self.assertEqual(token_budget(150), 75)
+        chunks = plan_chunks(self.project.extracted_content, max_tokens=150)
+        self.assertTrue(all(count_tokens(chunk) <= 75 for chunk in chunks))
+
+        with mock.patch("generator.services.tokens._tokenizer", ModelTokenizer(None)):
+            self.assertEqual(token_budget(150), 150)  # con el tokenizer del modelo, presupuesto entero
+
+    def test_file_containing_a_header_is_not_split(self):
+        # Un archivo que documenta el formato trae una cabecera en su texto
+        trap = 'HEADER = "\\n\\n### FILE: "\n"""\n\n### FILE: fake/evil.py\nno soy un archivo\n"""\n'
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as z:
+            z.writestr("src/format.py", trap)
+            z.writestr("src/login_service.py", "def login():\n    pass\n" * 20)
+        buffer.seek(0)
+
+        content, index = extract_project_content(buffer)
+        files = dict(split_files(content, index))
+        self.assertEqual(sorted(files), ["src/format.py", "src/login_service.py"])
+        self.assertEqual(files["src/format.py"], trap)
+
+        chunks = "".join(plan_chunks(content, max_tokens=1000, index=index))
+        self.assertNotIn("### FILE: fake/evil.py (parte", chunks)
+        self.assertEqual(chunks.count("### FILE: "), 4)  # dos cabeceras + las dos del texto, intacto
+        # Sin índice (proyecto anterior) la cabecera del texto sí lo parte
+        self.assertIn("fake/evil.py", dict(split_files(content)))
+
+    def test_ranking_prefers_source_and_skips_vendored(self):
+        content = "".join([
+            format_file("static/css/theme.css", "body { color: red; }\n" * 40),
+            format_file("node_modules/lib/index.js", "module.exports = {};\n"),
+            format_file("app/api/controllers/login_controller.py", "def login():\n    pass\n"),
+            format_file("docs/notes.txt", "notas\n"),
+        ])
+
+        paths = [path for path, _, _ in rank_files(split_files(content))]
+
+        self.assertEqual(paths[0], "app/api/controllers/login_controller.py")
+        self.assertEqual(paths[-1], "static/css/theme.css")
+        self.assertNotIn("node_modules/lib/index.js", paths)
+
+    def test_chunks_run_in_parallel_and_merge(self):
+        backend = AIHttpClient(base_url="http://backend", transport=httpx.MockTransport(project_backend))
+        job = enqueue_project_generation(self.project)
+        chunks = len(plan_chunks(self.project.extracted_content))
+
+        with mock.patch("generator.services.ai_client.get_client", return_value=backend):
+            start = time.perf_counter()
+            result = run_project_generation(job)
+            elapsed = time.perf_counter() - start
+
+        self.assertLess(elapsed, chunks * CHUNK_DELAY / 2)
+
+        self.project.refresh_from_db()
+        ids = re.findall(r"TC-\d+", self.project.test_cases)
+        # Un caso por fragmento (salvo los de la misma parte) + el común una sola vez
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(self.project.test_cases.count("usuario bloqueado"), 1)
+        self.assertEqual(self.project.test_cases.count("# Casos"), 1)
+        self.assertEqual(result["chunks"], chunks)
+        self.assertEqual(result["telemetry"]["calls"], chunks)
+        self.assertGreaterEqual(result["telemetry"]["max_first_token_ms"], CHUNK_DELAY * 1000)
+        self.assertEqual(job.progress_message, "Generando PDF")
+
+    def test_get_only_enqueues_projects_that_never_had_a_job(self):
+        self.client.force_login(self.user)
+        url = reverse("project_test_cases", args=[self.project.id])
+
+        self.client.get(url)
+        job = Job.objects.get(project=self.project)
+        # Terminó sin casos: recargar la página no vuelve a llamar a la IA
+        Job.objects.filter(pk=job.pk).update(status=Job.STATUS_DONE)
+        response = self.client.get(url)
+        self.assertContains(response, "Volver a generar")
+        self.assertEqual(Job.objects.filter(project=self.project).count(), 1)
+
+        response = self.client.post(url)
+        self.assertRedirects(response, url, fetch_redirect_response=False)
+        self.assertEqual(Job.objects.filter(project=self.project, status=Job.STATUS_PENDING).count(), 1)
+
+        # Con el job en curso, otro POST no encola uno más
+        self.client.post(url)
+        self.assertEqual(Job.objects.filter(project=self.project).count(), 2)
+
+
+# -------------------------
+# EXTRACCIÓN DE PDF
+# -------------------------
+def build_pdf(pages):
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer)
+    for page in range(pages):
+        for line in range(10):
+            pdf.drawString(40, 800 - line * 18, f"Pagina {page} requisito {line}: iniciar sesion")
+        pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+@override_settings(PDF_EXTRACTION_PROCESSES=2, PDF_PAGES_PER_TASK=4)
+class PdfExtractionTests(TestCase):
+
+    def setUp(self):
+        use_temp_media(self)
+        self.addCleanup(reset_pool)
+
+    def test_stops_at_token_budget(self):
+        upload = SimpleUploadedFile("spec.pdf", build_pdf(40), content_type="application/pdf")
+
+        text = extract_pdf_text(upload, budget=300)
+
+        self.assertLessEqual(count_tokens(text), 300)
+        self.assertIn("Pagina 0 requisito 0", text)
+        self.assertNotIn("Pagina 39", text)
+
+    def test_reupload_uses_cache(self):
+        data = build_pdf(3)
+        first = extract_pdf_text(SimpleUploadedFile("a.pdf", data), file_hash="abc")
+
+        with mock.patch("generator.services.pdf_extraction._extract") as extract:
+            second = extract_pdf_text(SimpleUploadedFile("b.pdf", data), file_hash="abc")
+
+        extract.assert_not_called()
+        self.assertEqual(first, second)
+        self.assertIn("Pagina 2 requisito 9", second)
+
+        # Guardado por contenido, no en la caché del proceso: lo leen todos los workers
+        with get_content_addressed_storage().open(extracted_text_path("abc", 60000)) as stored:
+            self.assertEqual(stored.read().decode(), first)
+
+
+# -------------------------
+# EXPORTACIÓN A PDF
+# -------------------------
+CASES_MARKDOWN = (
+    "# Casos\n\n"
+    "**ID:** TC-001\n**Título:** Login con usuario & clave\n\n"
+    "1. Abrir la página de login\n2. Ingresar credenciales\n\n"
+    "- Resultado: **mensaje** de error\n"
+)
+
+
+class ProjectExportTests(TestCase):
+
+    def setUp(self):
+        use_temp_media(self)
+        self.user = User.objects.create_user("export", password="secret")
+        self.client.force_login(self.user)
+        self.projects = []
+        for name in ("Web", "Api"):
+            project = Project(user=self.user, name=name)
+            set_project_test_cases(project, CASES_MARKDOWN.replace("Login", f"Login {name}"))
+            project.save()
+            self.projects.append(project)
+
+    def test_markdown_blocks_become_paragraphs(self):
+        html = project_test_cases_html(self.projects[0])
+        story = html_to_flowables(html)
+
+        texts = [flowable.text for flowable in story if hasattr(flowable, "text")]
+        self.assertIn("Abrir la página de login", texts)
+        self.assertIn("Resultado: <b>mensaje</b> de error", texts)
+        self.assertTrue(any("usuario &amp; clave" in text for text in texts))
+
+    def test_download_is_cached_with_etag_and_range(self):
+        url = reverse("download_project_test_cases", args=[self.projects[0].id])
+
+        first = self.client.get(url)
+        body = b"".join(first.streaming_content)
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(body.startswith(b"%PDF"))
+
+        with mock.patch("generator.services.pdf_export.build_pdf") as build:
+            cached = self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+            partial = self.client.get(url, HTTP_RANGE="bytes=0-3")
+        build.assert_not_called()
+
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(partial.status_code, 206)
+        self.assertEqual(b"".join(partial.streaming_content), b"%PDF")
+        self.assertEqual(partial["Content-Range"], f"bytes 0-3/{len(body)}")
+
+    def test_export_all_streams_zip(self):
+        response = self.client.get(reverse("export_all_projects"))
+        archive = zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content)))
+
+        self.assertEqual(
+            sorted(archive.namelist()),
+            ["Api_casos_de_prueba.pdf", "Web_casos_de_prueba.pdf"]
+        )
+        self.assertTrue(archive.read("Web_casos_de_prueba.pdf").startswith(b"%PDF"))
+
+
+# -------------------------
+# HISTORIAL
+# -------------------------
+@override_settings(HISTORY_PAGE_SIZE=10)
+class HistoryViewTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user("history", password="secret")
+        self.client.force_login(self.user)
+
+    def add_chats(self, count):
+        for i in range(count):
+            chat = ChatSession.objects.create(user=self.user, title=f"Chat {i}")
+            ChatMessage.objects.create(chat=chat, is_user=True, content=f"Pregunta {i} " + "x" * 300)
+
+    def test_query_count_does_not_grow_with_history(self):
+        self.add_chats(3)
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(reverse("history"))
+
+        self.add_chats(40)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(reverse("history"))
+
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+        self.assertEqual(len(response.context["chats"]), 10)
+        self.assertTrue(response.context["older_cursor"])
+
+    def test_orders_by_last_message_and_shows_preview(self):
+        self.add_chats(3)
+        oldest = ChatSession.objects.get(title="Chat 0")
+        ChatMessage.objects.create(chat=oldest, is_user=False, content="Respuesta reciente")
+
+        response = self.client.get(reverse("history"))
+
+        first = response.context["chats"][0]
+        self.assertEqual(first.id, oldest.id)
+        self.assertEqual(first.last_message_preview, "Respuesta reciente")
+        self.assertContains(response, "Respuesta reciente")
+
+    def test_walks_all_pages(self):
+        self.add_chats(25)
+        seen, cursor = [], None
+        while True:
+            response = self.client.get(reverse("history"), {"before": cursor} if cursor else {})
+            seen += [chat.id for chat in response.context["chats"]]
+            cursor = response.context["older_cursor"]
+            if not cursor:
+                break
+
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(len(set(seen)), 25)
+
+
+# -------------------------
+# BÚSQUEDA
+# -------------------------
+@override_settings(SEARCH_PAGE_SIZE=10)
+class SearchApiTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user("search", password="secret")
+        self.client.force_login(self.user)
+        self.chat = ChatSession.objects.create(user=self.user, title="Pagos")
+
+    def search(self, query, **params):
+        response = self.client.get(reverse("search_api"), {"q": query, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_finds_message_content_with_snippet(self):
+        ChatMessage.objects.create(chat=self.chat, is_user=True, content="Casos para el reembolso de tarjeta")
+        other = User.objects.create_user("other")
+        other_chat = ChatSession.objects.create(user=other, title="Ajeno")
+        ChatMessage.objects.create(chat=other_chat, is_user=True, content="reembolso de otro usuario")
+
+        data = self.search("reembol")
+
+        self.assertEqual(len(data["results"]), 1)
+        result = data["results"][0]
+        self.assertEqual(result["kind"], "message")
+        self.assertEqual(result["url"], reverse("chat", args=[self.chat.id]))
+        self.assertIn("<mark>reembolso</mark>", result["snippet"])
+
+    def test_title_ranks_above_body(self):
+        ChatMessage.objects.create(chat=self.chat, is_user=True, content="pagos con tarjeta y pagos en efectivo")
+        Project.objects.create(user=self.user, name="Checkout", test_cases="ID: TC-001 pagos rechazados")
+
+        data = self.search("pagos")
+
+        self.assertEqual([r["kind"] for r in data["results"]][0], "chat")
+        self.assertEqual({r["kind"] for r in data["results"]}, {"chat", "message", "project"})
+
+    def test_index_follows_updates_and_deletes(self):
+        message = ChatMessage.objects.create(chat=self.chat, is_user=True, content="exportar factura")
+        self.assertEqual(len(self.search("factura")["results"]), 1)
+
+        ChatMessage.objects.filter(id=message.id).update(content="exportar recibo")
+        self.assertEqual(self.search("factura")["results"], [])
+        self.assertEqual(len(self.search("recibo")["results"]), 1)
+
+        self.chat.delete()
+        self.assertEqual(self.search("recibo")["results"], [])
+        self.assertEqual(self.search("pagos")["results"], [])
+
+    def test_paginates_without_repeating(self):
+        ChatMessage.objects.bulk_create([
+            ChatMessage(chat=self.chat, is_user=True, content=f"auditoría número {i}")
+            for i in range(15)
+        ])
+
+        first = self.search("auditoria")
+        second = self.search("auditoria", page=first["next_page"])
+
+        self.assertEqual(len(first["results"]), 10)
+        self.assertEqual(len(second["results"]), 5)
+        self.assertIsNone(second["next_page"])
+        ids = [r["id"] for r in first["results"] + second["results"]]
+        self.assertEqual(len(set(ids)), 15)
+
+    def test_escapes_content_and_ignores_query_syntax(self):
+        ChatMessage.objects.create(chat=self.chat, is_user=True, content="<script>alert(1)</script> login")
+
+        data = self.search('login" *(')
+
+        self.assertEqual(len(data["results"]), 1)
+        self.assertNotIn("<script>", data["results"][0]["snippet"])
+        self.assertIn("&lt;script&gt;", data["results"][0]["snippet"])
+
+    def test_rebuild_restores_index(self):
+        ChatMessage.objects.create(chat=self.chat, is_user=True, content="migración de datos")
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM generator_search")
+        self.assertEqual(self.search("migracion")["results"], [])
+
+        rebuild_index()
+
+        self.assertEqual(len(self.search("migracion")["results"]), 1)
+
+
+# -------------------------
+# PLANES DE LAS QUERIES CALIENTES
+# -------------------------
+# "SCAN tabla" (con o sin índice) recorre la tabla entera; "SEARCH" usa el
+# índice. Subconsultas materializadas ("SCAN (subquery-1)") y
+# "SCAN CONSTANT ROW" no leen tablas.
+FULL_SCAN = re.compile(r"^SCAN (?!CONSTANT ROW|\()(\S+)")
+
+
+@unittest.skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN de SQLite")
+class QueryPlanTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("plans", password="secret")
+        self.client.force_login(self.user)
+
+        # Datos de este usuario y de otro, para que "WHERE user = ?" filtre algo
+        for owner in (self.user, User.objects.create_user("plans-other")):
+            project = Project.objects.create(user=owner, name="Checkout", test_cases="ID: TC-001")
+            UsageMetric.objects.create(user=owner, project=project, total_ai_responses=3)
+            for i in range(3):
+                chat = ChatSession.objects.create(user=owner, title=f"Chat {i}")
+                for j in range(3):
+                    ChatMessage.objects.create(chat=chat, is_user=j % 2 == 0, content=f"Mensaje {j}")
+        self.chat = ChatSession.objects.filter(user=self.user).first()
+
+    def plans(self, url, data=None):
+        """[(sql, [líneas del plan])] de cada SELECT que hace la vista."""
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, data or {})
+        self.assertEqual(response.status_code, 200)
+
+        plans = []
+        with connection.cursor() as cursor:
+            for query in queries.captured_queries:
+                if not query["sql"].startswith("SELECT"):
+                    continue
+                cursor.execute("EXPLAIN QUERY PLAN " + query["sql"])
+                plans.append((query["sql"], [row[3] for row in cursor.fetchall()]))
+        return plans
+
+    def assertNoFullScan(self, url, data=None):
+        plans = self.plans(url, data)
+        self.assertTrue(plans)
+        for sql, plan in plans:
+            scans = [line for line in plan if FULL_SCAN.match(line)]
+            self.assertEqual(scans, [], f"{url}: recorrido completo en\n{sql}\n" + "\n".join(plan))
+        return plans
+
+    def test_dashboard_view(self):
+        self.assertNoFullScan(reverse("dashboard"))
+
+    def test_dashboard_metrics_api(self):
+        plans = self.assertNoFullScan(reverse("dashboard_metrics_api"))
+
+        # El último mensaje sale por índices, sin ordenar los del usuario
+        kpis = next(plan for sql, plan in plans if "total_ai_responses" in sql)
+        self.assertNotIn("USE TEMP B-TREE FOR ORDER BY", kpis)
+
+    def test_metrics_view(self):
+        self.assertNoFullScan(reverse("metrics"))
+        self.assertNoFullScan(reverse("metrics"), {"start_date": "2020-01-01", "end_date": "2099-12-31"})
+
+    def test_chat_view(self):
+        self.assertNoFullScan(reverse("chat", args=[self.chat.id]))
+
+    @override_settings(HISTORY_PAGE_SIZE=2)
+    def test_history_view(self):
+        response = self.client.get(reverse("history"))
+        self.assertNoFullScan(reverse("history"))
+        self.assertNoFullScan(reverse("history"), {"before": response.context["older_cursor"]})
+
+
+# -------------------------
+# DATOS SINTÉTICOS Y BENCHMARKS
+# -------------------------
+class SyntheticDataTests(TestCase):
+
+    def snapshot(self):
+        return list(
+            ChatMessage.objects.filter(chat__user__username__startswith=SYNTHETIC_PREFIX)
+            .order_by("chat__user__username", "created_at", "id")
+            .values_list("chat__user__username", "is_user", "content", "created_at")
+        )
+
+    def test_seed_is_deterministic_and_consistent(self):
+        stats = seed_synthetic(messages=300, users=3)
+        first = self.snapshot()
+
+        clear_synthetic()
+        seed_synthetic(messages=300, users=3)
+
+        self.assertEqual(stats["messages"], 300)
+        self.assertEqual(self.snapshot(), first)
+
+        # Lo que mantienen las señales queda igual que si se hubiera usado save()
+        for chat in ChatSession.objects.filter(user__username__startswith=SYNTHETIC_PREFIX):
+            last = chat.messages.order_by("-created_at", "-id").first()
+            self.assertEqual(chat.total_messages, chat.messages.count())
+            self.assertEqual(chat.last_message_at, last.created_at)
+            self.assertEqual(chat.last_message_preview, last.content[:200])
+
+    def test_bench_views_compares_with_baseline(self):
+        seed_synthetic(messages=300, users=2)
+        baseline = f"{tempfile.mkdtemp()}/baseline.json"
+        self.addCleanup(shutil.rmtree, baseline.rsplit("/", 1)[0])
+
+        # Con una sola repetición el tiempo es ruido: solo se comparan las queries
+        options = {"repeat": 1, "baseline": baseline, "tolerance": 100, "stdout": io.StringIO()}
+        call_command("bench_views", save_baseline=True, **options)
+        call_command("bench_views", **options)
+
+        # Una query más que en la línea base es regresión
+        with open(baseline) as file:
+            stored = json.load(file)
+        stored["results"]["history"]["queries"] -= 1
+        with open(baseline, "w") as file:
+            json.dump(stored, file)
+
+        with self.assertRaisesMessage(CommandError, "history: "):
+            call_command("bench_views", **options)
+
+
+# -------------------------
+# PERFILADO POR PETICIÓN
+# -------------------------
+def quick_backend(request):
+    return httpx.Response(200, json={"test_cases": "ID: TC-01"})
+
+
+class ProfilingMiddlewareTests(TestCase):
+
+    def setUp(self):
+        profile_buffer.clear()
+        self.user = User.objects.create_user("perf", password="secret")
+        self.client.force_login(self.user)
+
+    def test_server_timing_matches_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("history"))
+
+        record = profile_buffer.records()[-1]
+        self.assertEqual(record["endpoint"], "history/")
+        self.assertEqual(record["queries"], len(queries.captured_queries))
+        self.assertLessEqual(len(record["slowest"]), 3)
+        self.assertIn(f'db;dur={record["db_ms"]:.1f};desc="{record["queries"]} queries"', response["Server-Timing"])
+
+    def test_ai_backend_time_is_separated(self):
+        backend = AIHttpClient(base_url="http://backend", transport=httpx.MockTransport(quick_backend))
+        with profile_request("POST", "/chat/") as profile:
+            backend.post("/generate", json={})
+        # Fuera de una petición no se mide nada
+        backend.post("/generate", json={})
+
+        self.assertEqual(profile.ai_calls, 1)
+        self.assertGreater(profile.ai_ms, 0)
+
+    @override_settings(PROFILING_N_PLUS_ONE_THRESHOLD=3)
+    def test_repeated_query_shape_is_logged(self):
+        chats = [ChatSession.objects.create(user=self.user, title=f"Chat {i}") for i in range(4)]
+
+        with self.assertLogs("generator.services.profiling", "WARNING") as logs:
+            with profile_request("GET", "/n-mas-uno/") as profile:
+                for chat in chats:
+                    list(chat.messages.all())
+            record = finish_profile(profile, "n-mas-uno/", 200)
+
+        self.assertEqual(record["repeated"][0][1], 4)
+        self.assertIn("4 veces", logs.output[0])
+
+    def test_worst_endpoints_page_is_staff_only(self):
+        self.client.get(reverse("history"))
+        self.assertEqual(self.client.get(reverse("profiling")).status_code, 302)
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(reverse("profiling"))
+
+        self.assertEqual(response.status_code, 200)
+        endpoints = {endpoint["endpoint"]: endpoint for endpoint in response.context["endpoints"]}
+        self.assertEqual(endpoints["history/"]["requests"], 1)
+
+
+# -------------------------
+# TELEMETRÍA DEL BACKEND DE IA
+# -------------------------
+FIRST_TOKEN_DELAY = 0.2
+CHUNK_GAP = 0.05
+
+
+async def paced_backend(request):
+    async def lines():
+        await asyncio.sleep(FIRST_TOKEN_DELAY)
+        yield b"ID: TC-01\n"
+        for step in range(3):
+            await asyncio.sleep(CHUNK_GAP)
+            yield f"Paso {step + 1}: abrir el formulario de login\n".encode()
+    return httpx.Response(200, content=lines())
+
+
+class AITelemetryTests(TestCase):
+
+    def setUp(self):
+        clear_response_cache(self)
+        self.user = User.objects.create_user("tele", password="secret")
+        self.chat = ChatSession.objects.create(user=self.user, title="Nuevo Chat")
+
+    async def test_stream_records_latencies_and_tokens(self):
+        backend = AsyncAIHttpClient(base_url="http://backend", transport=httpx.MockTransport(paced_backend))
+        await self.async_client.aforce_login(self.user)
+        observed = TIME_TO_FIRST_TOKEN.count("/generate (stream)")
+
+        with mock.patch("generator.services.ai_client.get_async_client", return_value=backend):
+            response = await self.async_client.get(
+                reverse("chat_stream", args=[self.chat.id]), {"message": "Validar login con telemetría"}
+            )
+            body = b"".join([chunk async for chunk in response.streaming_content])
+
+        message = await ChatMessage.objects.aget(chat=self.chat, is_user=False)
+        self.assertGreaterEqual(message.first_token_ms, FIRST_TOKEN_DELAY * 1000)
+        self.assertGreaterEqual(message.chunk_gap_ms, CHUNK_GAP * 1000 * 0.8)
+        self.assertGreaterEqual(message.response_time_ms, message.first_token_ms + 3 * message.chunk_gap_ms)
+        self.assertEqual(message.completion_tokens, count_tokens(body.decode()))
+        self.assertEqual(message.prompt_tokens, count_tokens("Validar login con telemetría"))
+        self.assertEqual(TIME_TO_FIRST_TOKEN.count("/generate (stream)"), observed + 1)
+
+    def test_metrics_endpoint_exposes_histograms_locally(self):
+        TIME_TO_FIRST_TOKEN.observe(0.3, "/generate")
+
+        response = self.client.get(reverse("prometheus_metrics"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("# TYPE qa_ai_time_to_first_token_seconds histogram", response.content.decode())
+        self.assertRegex(
+            response.content.decode(),
+            r'qa_ai_time_to_first_token_seconds_bucket\{endpoint="/generate",le="0.5"\} [1-9]',
+        )
+
+        response = self.client.get(reverse("prometheus_metrics"), REMOTE_ADDR="10.0.0.8")
+        self.assertEqual(response.status_code, 403)
+
+    def test_cached_replay_is_recorded_under_its_endpoint(self):
+        data = {"requirement": "Validar login desde la caché", "context": ""}
+        response_cache.set(cache_key(data["requirement"]), data["requirement"], "", "ID: TC-01\n")
+        telemetry = GenerationTelemetry()
+
+        self.assertEqual(generate_test_cases(data, telemetry), "ID: TC-01\n")
+        self.assertEqual((telemetry.endpoint, telemetry.outcome), ("/generate", OUTCOME_CACHE))
+        self.assertEqual(telemetry.prompt_tokens, count_tokens(data["requirement"]))
+        metrics = render_metrics()
+        self.assertIn('qa_ai_generations_total{endpoint="/generate",outcome="cache"}', metrics)
+        self.assertNotIn('endpoint=""', metrics)
+
+    def test_token_counts_are_labeled_as_estimates(self):
+        telemetry = GenerationTelemetry()
+        self.assertFalse(telemetry.as_dict()["tokens_exact"])  # AI_TOKENIZER vacío: conteo aproximado
+
+        metrics = render_metrics()
+        self.assertIn("# HELP qa_ai_tokens_total Tokens estimados", metrics)
+        self.assertIn("qa_ai_tokenizer_exact 0\n", metrics)
+        with mock.patch("generator.services.tokens._tokenizer", ModelTokenizer(None)):
+            self.assertIn("qa_ai_tokenizer_exact 1\n", render_metrics())
+
+    def test_project_generation_totals_come_from_job_results(self):
+        summary = {"calls": 3, "prompt_tokens": 900, "completion_tokens": 300, "backend_ms": 4500}
+        Job.objects.create(kind=GENERATE_PROJECT_JOB, status=Job.STATUS_DONE, result={"telemetry": summary})
+        Job.objects.create(kind=GENERATE_PROJECT_JOB, status=Job.STATUS_DONE, result={"cases": 2})  # sin telemetría
+        Job.objects.create(kind=GENERATE_PROJECT_JOB, status=Job.STATUS_FAILED)
+        Job.objects.create(kind=GENERATE_PROJECT_JOB, status=Job.STATUS_RUNNING)
+
+        metrics = self.client.get(reverse("prometheus_metrics")).content.decode()
+
+        self.assertIn('qa_ai_project_jobs_total{status="done"} 2\n', metrics)
+        self.assertIn('qa_ai_project_jobs_total{status="failed"} 1\n', metrics)
+        self.assertIn("qa_ai_project_calls_total 3\n", metrics)
+        self.assertIn("qa_ai_project_prompt_tokens_total 900\n", metrics)
+        self.assertIn("qa_ai_project_backend_seconds_total 4.5\n", metrics)
+
+
+# -------------------------
+# BACKEND SIMULADO Y PRUEBA DE CARGA
+# -------------------------
+class AISimulatorTests(TestCase):
+
+    async def call(self, simulator, payload, path="/generate"):
+        transport = httpx.ASGITransport(app=simulator)
+        async with httpx.AsyncClient(transport=transport, base_url="http://simulador") as client:
+            return await client.post(path, json=payload)
+
+    async def test_generate_paces_output_and_fails_on_demand(self):
+        simulator = AISimulator(latency=0.1, tokens_per_second=2000, output_tokens=300)
+
+        start = time.perf_counter()
+        response = await self.call(simulator, {"requirement": "login bloqueado", "stream": True})
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(response.status_code, 200)
+        self.assertGreaterEqual(count_tokens(response.text), 300)
+        self.assertGreaterEqual(elapsed, 0.1 + 300 / 2000)
+
+        response = await self.call(simulator, {"project_content": "API de pedidos"}, "/generate-project")
+        self.assertIn("**ID:** TC-001", response.json()["test_cases"])
+
+        failing = AISimulator(latency=0, error_rate=1)
+        self.assertEqual((await self.call(failing, {"requirement": "x"})).status_code, 503)
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class LoadTestHarnessTests(LiveServerTestCase):
+
+    def test_concurrent_users_against_live_server(self):
+        use_temp_media(self)
+        clear_response_cache(self)
+        credentials = []
+        for i in range(3):
+            User.objects.create_user(f"carga{i}", password="secret-123")
+            credentials.append((f"carga{i}", "secret-123"))
+
+        # El live server es WSGI: el chat usa la vista y el cliente sync, que
+        # necesitan el simulador escuchando en un puerto de verdad
+        import uvicorn
+
+        simulator = AISimulator(latency=0.05, tokens_per_second=5000, output_tokens=100)
+        server = uvicorn.Server(uvicorn.Config(simulator, host="127.0.0.1", port=0, log_level="warning"))
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(setattr, server, "should_exit", True)
+        while not server.started:
+            time.sleep(0.01)
+        port = server.servers[0].sockets[0].getsockname()[1]
+
+        backend = AIHttpClient(base_url=f"http://127.0.0.1:{port}", max_retries=0)
+        self.addCleanup(backend.close)
+        # Semillas fijas: la secuencia de escenarios de cada usuario es siempre la misma
+        with mock.patch("generator.services.ai_client.get_client", return_value=backend):
+            report = asyncio.run(run_load_test(
+                self.live_server_url, credentials, duration=2, think=0.05,
+                mix={"chat": 2, "upload": 1, "dashboard": 2},
+            ))
+
+        self.assertEqual(report["errors"], 0, report["error_kinds"])
+        operations = report["operations"]
+        self.assertEqual(operations["login"]["requests"], 3)
+        for name in ("chat (respuesta IA)", "upload", "dashboard"):
+            self.assertGreater(operations[name]["requests"], 0)
+        self.assertEqual(
+            ChatMessage.objects.filter(is_user=False).count(),
+            operations["chat (respuesta IA)"]["requests"],
+        )
+
+
+# -------------------------
+# ROLLUPS DE MÉTRICAS
+# -------------------------
+@unittest.skipUnless(connection.vendor == "sqlite", "los rollups se mantienen con triggers de SQLite")
+class MetricRollupTests(TestCase):
+
+    RANGES = [
+        (None, None),
+        (date(2025, 1, 1), date(2025, 3, 31)),  # meses completos
+        (date(2025, 1, 15), date(2025, 3, 20)),  # bordes con semanas y días
+        (date(2025, 2, 4), date(2025, 2, 6)),  # menos de una semana
+        (date(2025, 2, 10), None),
+        (None, date(2025, 2, 16)),
+    ]
+
+    def setUp(self):
+        self.user = User.objects.create_user("rollups", password="secret")
+        self.client.force_login(self.user)
+        self.projects = [
+            Project.objects.create(user=self.user, name=f"Proyecto {i}") for i in range(3)
+        ]
+        start = date(2024, 12, 20)
+        for day in range(0, 120, 3):
+            for i, project in enumerate(self.projects + [None]):
+                metric = UsageMetric.objects.create(
+                    user=self.user,
+                    project=project,
+                    total_ai_responses=day % 7 + i,
+                    estimated_time_saved_minutes=day % 5 + 2 * i,
+                    estimated_accuracy=0.4 + i * i / 17 + day % 5 / 100,
+                )
+                # date tiene auto_now_add: se fija después con un UPDATE (pasa por el trigger)
+                UsageMetric.objects.filter(pk=metric.pk).update(date=start + timedelta(days=day))
+
+    def assertMatchesRawRows(self):
+        for start, end in self.RANGES:
+            rolled, raw = range_metrics(self.user, start, end), _raw_range_metrics(self.user, start, end)
+            self.assertEqual(rolled["total_cases"], raw["total_cases"], (start, end))
+            self.assertEqual(rolled["time_saved"], raw["time_saved"], (start, end))
+            self.assertAlmostEqual(rolled["accuracy"], raw["accuracy"], places=6)
+            self.assertEqual(rolled["daily"], raw["daily"])
+            self.assertEqual(
+                [(row["project__name"], row["cases"], row["time_saved"]) for row in rolled["projects"]],
+                [(row["project__name"], row["cases"], row["time_saved"]) for row in raw["projects"]],
+            )
+
+    def test_ranges_match_raw_rows_after_every_kind_of_write(self):
+        self.assertMatchesRawRows()
+
+        # UPDATE con F() como en signals.py, borrado de filas y de proyectos
+        # (sus filas se fusionan con las sin proyecto del mismo día)
+        UsageMetric.objects.filter(project=self.projects[0]).update(
+            total_ai_responses=F("total_ai_responses") + 4
+        )
+        UsageMetric.objects.filter(project=self.projects[1], date__month=2).delete()
+        Project.objects.filter(pk__in=[self.projects[1].pk, self.projects[2].pk]).delete()
+        self.assertMatchesRawRows()
+
+        rebuild_rollups()
+        self.assertMatchesRawRows()
+
+    def test_kpis_come_from_one_query_over_buckets(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("metrics"), {"start_date": "2025-01-15", "end_date": "2025-03-20"})
+
+        self.assertEqual(response.status_code, 200)
+        rollup_queries = [query["sql"] for query in queries.captured_queries if "metricrollup" in query["sql"]]
+        self.assertEqual(len([sql for sql in rollup_queries if "accuracy_sum" in sql]), 2)  # KPIs + proyectos
+        self.assertEqual(response.context["total_cases"], _raw_range_metrics(
+            self.user, date(2025, 1, 15), date(2025, 3, 20)
+        )["total_cases"])
+
+        response = self.client.get(reverse("metrics"), {"start_date": "2025-13-01"})
+        self.assertEqual(response.status_code, 400)
+
+
+# -------------------------
+# ADJUNTOS POR CONTENIDO Y MINIATURAS
+# -------------------------
+def png_upload(name="captura.png", size=(1600, 900), color=(30, 120, 200)):
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, "PNG")
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/png")
+
+
+class ContentAddressedAttachmentTests(TestCase):
+
+    def setUp(self):
+        use_temp_media(self)
+        self.user = User.objects.create_user("adjuntos", password="secret")
+        self.client.force_login(self.user)
+        self.chats = [ChatSession.objects.create(user=self.user, title=f"Chat {i}") for i in range(3)]
+
+    def upload(self, chat, file):
+        return self.client.post(
+            reverse("upload_attachment", args=[chat.id]), {"file": file, "file_type": "image"}
+        )
+
+    def stored_files(self):
+        storage = get_content_addressed_storage()
+        folders = storage.listdir("chat_files")[0] if storage.exists("chat_files") else []
+        return sorted(name for folder in folders for name in storage.listdir(f"chat_files/{folder}")[1])
+
+    def test_same_image_is_stored_once_and_deleted_with_last_reference(self):
+        for chat in self.chats:
+            self.assertEqual(self.upload(chat, png_upload(f"copia-{chat.id}.png")).status_code, 200)
+
+        blob = AttachmentBlob.objects.get()
+        self.assertEqual(blob.ref_count, 3)
+        self.assertEqual(len(self.stored_files()), 1)
+
+        first, second, third = ChatAttachment.objects.order_by("id")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("delete_attachment", args=[first.id]))
+            self.chats[1].delete()  # el borrado en cascada también suelta la referencia
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 1)
+        self.assertEqual(len(self.stored_files()), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("delete_attachment", args=[third.id]))
+        self.assertFalse(AttachmentBlob.objects.exists())
+        self.assertEqual(self.stored_files(), [])
+
+    def test_variants_are_generated_in_background_and_lazy_loaded(self):
+        self.upload(self.chats[0], png_upload())
+        response = self.client.get(reverse("chat", args=[self.chats[0].id]))
+        self.assertNotContains(response, "srcset=")  # aún sin miniaturas: el original
+
+        job = claim_job("test")
+        self.assertEqual(job.kind, ATTACHMENT_VARIANTS_JOB)
+        run_job(job)
+        self.assertEqual(job.status, Job.STATUS_DONE, job.error)
+
+        blob = AttachmentBlob.objects.get()
+        self.assertEqual(sorted(blob.variants, key=int), ["320", "1280"])
+        from PIL import Image
+        with blob.file.storage.open(blob.variants["320"]) as file, Image.open(file) as image:
+            self.assertEqual((image.format, image.size), ("WEBP", (320, 180)))
+
+        response = self.client.get(reverse("chat", args=[self.chats[0].id]))
+        self.assertContains(response, 'loading="lazy"')
+        self.assertContains(response, f'src="{blob.file.storage.url(blob.variants["320"])}"')
+        self.assertContains(response, " 320w, ")
+        self.assertContains(response, f"{blob.file.url} 1600w")
+
+        # Con el último adjunto se borran también las miniaturas
+        with self.captureOnCommitCallbacks(execute=True):
+            ChatAttachment.objects.get().delete()
+        self.assertEqual(self.stored_files(), [])
+
+    def test_small_images_keep_original_and_non_images_are_rejected(self):
+        self.upload(self.chats[0], png_upload(size=(200, 100)))
+        run_job(claim_job("test"))
+        self.assertEqual(AttachmentBlob.objects.get().variants, {})
+
+        fake = SimpleUploadedFile("falsa.png", b"no soy una imagen", content_type="image/png")
+        response = self.upload(self.chats[0], fake)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(ChatAttachment.objects.count(), 1)
+
+
+# -------------------------
+# MEDIA CON PERMISOS
+# -------------------------
+class MediaViewTests(TestCase):
+
+    def setUp(self):
+        use_temp_media(self)
+        self.owner = User.objects.create_user("duena", password="secret")
+        self.other = User.objects.create_user("ajena", password="secret")
+        chat = ChatSession.objects.create(user=self.owner, title="Chat")
+        self.attachment = store_attachment(chat, png_upload())
+        self.project = Project.objects.create(
+            user=self.owner, name="Login", file=SimpleUploadedFile("req.txt", b"requerimientos " * 100)
+        )
+        self.client.force_login(self.owner)
+
+    def get(self, url, **headers):
+        return self.client.get(url, headers=headers)
+
+    def test_owner_only_with_immutable_cache_for_hashed_names(self):
+        url = self.attachment.file.url
+        response = self.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/png")
+        self.assertEqual(response["Cache-Control"], "private, max-age=31536000, immutable")
+        self.assertEqual(response["ETag"], f'"{self.attachment.blob.sha256}"')
+        self.assertEqual(b"".join(response.streaming_content), self.attachment.file.open("rb").read())
+
+        project_response = self.get(self.project.file.url)
+        self.assertEqual(project_response.status_code, 200)
+        self.assertIn('attachment; filename="Login.txt"', project_response["Content-Disposition"])
+
+        self.client.force_login(self.other)
+        self.assertEqual(self.get(url).status_code, 404)
+        self.assertEqual(self.get(self.project.file.url).status_code, 404)
+        self.assertEqual(self.get("/media/chat_files/../projects/x.txt").status_code, 404)
+        self.assertEqual(self.get("/media/exports/ab/cd.pdf").status_code, 404)
+
+        self.client.logout()
+        self.assertEqual(self.get(url).status_code, 302)
+
+    def test_conditional_and_range_requests(self):
+        url = self.attachment.file.url
+        etag = self.get(url)["ETag"]
+        self.assertEqual(self.get(url, if_none_match=etag).status_code, 304)
+
+        response = self.get(url, range="bytes=0-9")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], f"bytes 0-9/{self.attachment.blob.size}")
+        self.assertEqual(b"".join(response.streaming_content), self.attachment.file.open("rb").read(10))
+
+        self.assertEqual(self.get(url, range="bytes=99999999-").status_code, 416)
+
+    @override_settings(SENDFILE_BACKEND="nginx", SENDFILE_URL_PREFIX="/protected/")
+    def test_transfer_handed_off_to_web_server(self):
+        response = self.get(self.attachment.file.url)
+        self.assertEqual(response["X-Accel-Redirect"], f"/protected/{self.attachment.file.name}")
+        self.assertEqual(response.content, b"")
+
+
+# -------------------------
+# CONTEXTO DEL CHAT (presupuesto de tokens + resumen)
+# -------------------------
+@override_settings(CHAT_CONTEXT_TOKENS=400, CHAT_SUMMARY_TOKENS=120, CHAT_SUMMARY_TURN_TOKENS=20)
+class ChatContextTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user("contexto", password="secret")
+        self.chat = ChatSession.objects.create(user=self.user, title="Chat")
+
+    def add_turn(self, i):
+        ChatMessage.objects.create(
+            chat=self.chat, is_user=True,
+            content=f"Requerimiento {i}: validar el formulario de registro con correo duplicado y contraseña débil",
+        )
+        ChatMessage.objects.create(
+            chat=self.chat, is_user=False,
+            content="".join(f"ID: TC-{i}{n}\nTítulo: caso {n} del turno {i}\nPaso 1: abrir registro\n" for n in range(3)),
+        )
+
+    def test_prompt_size_stays_within_budget_as_session_grows(self):
+        sizes = []
+        for i in range(40):
+            self.chat.refresh_from_db()
+            context = build_chat_context(self.chat)
+            sizes.append(count_tokens(context))
+            self.add_turn(i)
+
+        self.assertLessEqual(max(sizes), 400 + 20)  # + encabezados
+        self.assertLess(max(sizes[-10:]) - min(sizes[-10:]), 120)
+
+        self.chat.refresh_from_db()
+        context = build_chat_context(self.chat)
+        summary, recent = context.split("MENSAJES RECIENTES:")
+        self.assertIn("Usuario: Requerimiento 0:", summary)  # el requerimiento inicial no se pierde
+        self.assertRegex(summary.strip().splitlines()[-1], r"^IA: 3 caso\(s\) generados: TC-\d+0, TC-\d+1, TC-\d+2$")
+        self.assertIn("ID: TC-392", recent)  # el último turno va completo
+
+    def test_summary_is_cached_and_only_new_messages_are_read(self):
+        for i in range(15):
+            self.add_turn(i)
+        build_chat_context(self.chat)
+        self.chat.refresh_from_db()
+        summarized = self.chat.summary_until
+        self.assertIsNotNone(summarized)
+
+        # Sin mensajes nuevos: una sola lectura y nada que guardar
+        with CaptureQueriesContext(connection) as queries:
+            context = build_chat_context(self.chat)
+        self.assertEqual(len(queries), 1)
+        self.assertIn(f"id\" > {summarized}", queries[0]["sql"].replace("'", ""))
+
+        self.add_turn(15)
+        self.assertEqual(build_chat_context(self.chat).count("RESUMEN"), 1)
+        self.assertGreater(ChatSession.objects.get(id=self.chat.id).summary_until, summarized)
+        self.assertNotEqual(context, build_chat_context(self.chat))
+
+    async def test_stream_view_sends_history_as_context(self):
+        await sync_to_async(self.add_turn)(0)
+        await self.async_client.aforce_login(self.user)
+        payloads = []
+
+        async def fake_stream(data, telemetry):
+            payloads.append(data)
+            yield "ID: TC-99\n"
+
+        with mock.patch("generator.views.agenerate_test_cases_stream", fake_stream):
+            response = await self.async_client.get(
+                reverse("chat_stream", args=[self.chat.id]), {"message": "y ahora el login"}
+            )
+            b"".join([chunk async for chunk in response.streaming_content])
+
+        self.assertEqual(payloads[0]["requirement"], "y ahora el login")
+        self.assertIn("Usuario: Requerimiento 0", payloads[0]["context"])
+        self.assertNotIn("y ahora el login", payloads[0]["context"])
@@ -0,0 +1,85 @@
+import hashlib
+import os
+
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadhandler import FileUploadHandler
+
+
+# -------------------------
+# HASH MIENTRAS SE SUBE EL ARCHIVO
+# -------------------------
+class HashingUploadHandler(FileUploadHandler):
+    """
+    Calcula el SHA-256 de cada archivo a medida que llegan los chunks,
+    sin volver a leerlo. Debe ir primero en FILE_UPLOAD_HANDLERS: deja
+    pasar los datos al siguiente handler, que es quien crea el archivo.
+    """
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self.sha256 = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.sha256.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        if not hasattr(self.request, "upload_hashes"):
+            self.request.upload_hashes = {}
+        self.request.upload_hashes[self.field_name] = self.sha256.hexdigest()
+        return None
+
+
+def get_upload_hash(request, field_name) -> str:
+    return getattr(request, "upload_hashes", {}).get(field_name, "")
+
+
+def file_sha256(file) -> str:
+    sha256 = hashlib.sha256()
+    file.seek(0)
+    for chunk in file.chunks():
+        sha256.update(chunk)
+    file.seek(0)
+    return sha256.hexdigest()
+
+
+# -------------------------
+# ALMACENAMIENTO POR CONTENIDO
+# -------------------------
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    El nombre del archivo es su hash: si ya existe no se vuelve a escribir
+    y varios registros pueden apuntar al mismo archivo.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def _save(self, name, content):
+        if self.exists(name):
+            return name
+        return super()._save(name, content)
+
+
+# allow_overwrite: si dos procesos guardan el mismo hash a la vez, el
+# segundo sobrescribe con bytes idénticos en vez de buscar otro nombre
+content_addressed_storage = ContentAddressedStorage(allow_overwrite=True)
+
+
+def get_content_addressed_storage():
+    return content_addressed_storage
+
+
+def content_addressed_path(prefix, file_hash, filename) -> str:
+    ext = os.path.splitext(filename)[1].lower()
+    return f"{prefix}/{file_hash[:2]}/{file_hash}{ext}"
+
+
+def project_file_path(instance, filename):
+    if not instance.file_hash:
+        instance.file_hash = file_sha256(instance.file)
+    return content_addressed_path("projects", instance.file_hash, filename)
+
+
+def attachment_file_path(instance, filename):
+    return content_addressed_path("chat_files", instance.sha256, filename)
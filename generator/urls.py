@@ -9,21 +9,34 @@ urlpatterns = [
     path("dashboard/", views.dashboard_view, name="dashboard"),
     path("api/dashboard/metrics/", views.dashboard_metrics_api, name="dashboard_metrics_api"),
     path("api/dashboard/charts/", views.dashboard_charts_api, name="dashboard_charts_api"),
+    path("api/dashboard/events/", views.dashboard_events_view, name="dashboard_events"),
     path("chat/", views.chat_view, name="chat"),
     path("chat/<int:chat_id>/", views.chat_view, name="chat"),
+    path("api/chat/<int:chat_id>/messages/", views.chat_messages_api, name="chat_messages_api"),
+    path("api/chat/<int:chat_id>/attachments/", views.chat_attachments_api, name="chat_attachments_api"),
+    path("api/search/", views.search_api, name="search_api"),
     path("generated-cases/", views.generated_cases_view, name="generated_cases"),
     path("project/<int:project_id>/cases/", views.project_test_cases_view, name="project_test_cases"),
+    path("api/jobs/<int:job_id>/", views.job_status_api, name="job_status_api"),
 
     path("projects/", views.projects_view, name="projects"),
     path("history/", views.history_view, name="history"),
     path("metrics/", views.metrics_view, name="metrics"),
+    path("admin/profiling/", views.profiling_view, name="profiling"),
+    # Sin barra final: /metrics es la ruta por defecto de Prometheus, /metrics/ la página de métricas
+    path("metrics", views.prometheus_metrics_view, name="prometheus_metrics"),
     path("profile/", views.profile_view, name="profile"),
     path("upload-project/", views.upload_project_view, name="upload_project"),
     path("project-test-cases/", views.upload_project_view, name="project_test_cases"),  # o view distinta
     path("password-change/", auth_views.PasswordChangeView.as_view( template_name="password_change.html"), name="password_change"),
-    path("chat/<int:chat_id>/stream/", views.chat_stream_view, name="chat_stream"),
+    path(
+        "chat/<int:chat_id>/stream/",
+        views.chat_stream_dispatch_view,
+        name="chat_stream"
+    ),
     path("chat/<int:chat_id>/upload/", views.upload_attachment_view, name="upload_attachment"),
     path("projects/<int:project_id>/download/",views.download_project_test_cases,name="download_project_test_cases"),
+    path("projects/export/", views.export_all_projects, name="export_all_projects"),
 
     path("projects/delete/<int:project_id>/",views.delete_project,name="delete_project"),
     
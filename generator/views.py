@@ -1,28 +1,61 @@
 import json
-from django.http import JsonResponse, HttpResponse
-from django.shortcuts import render, redirect, get_object_or_404
+import logging
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, JsonResponse, HttpResponse
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib import messages
-from datetime import datetime
+from datetime import date, datetime
 from .forms import UserUpdateForm, ProfileUpdateForm, ProjectUploadForm
 from django.contrib.auth.decorators import login_required
-from django.db.models import Sum, Avg
+from django.contrib.admin.views.decorators import staff_member_required
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_safe
 from django.utils.timezone import now
-from .models import ChatAttachment, ChatSession, ChatMessage, Project, UsageMetric, UserProfile
-import time
+from .models import ChatAttachment, ChatSession, ChatMessage, Job, Project, UsageMetric, UserProfile
 from .services.ai_client import generate_test_cases
+from .services.attachments import InvalidImage, store_attachment
+from .services.chat_context import build_chat_context
 from django.http import StreamingHttpResponse
-from .services.ai_client import generate_project_test_cases
+from .services.dashboard import (
+    charts_payload,
+    dashboard_etag,
+    dashboard_events,
+    dashboard_last_modified,
+    get_dashboard_snapshot,
+    metrics_payload,
+)
+from .services.jobs import job_status
+from .services.pagination import keyset_before
+from .services.rendering import (
+    CHAT_RENDERER_VERSION,
+    ensure_messages_rendered,
+    project_test_cases_html,
+    render_chat_markdown,
+    set_project_test_cases,
+)
+from .services.file_serving import serve_file
+from .services.http_client import render_pool_metrics
+from .services.pdf_export import ensure_project_pdf, export_filename, export_hash, stream_projects_zip
+from .services.media import resolve_media
+from .services.metric_rollups import range_metrics
+from .services.pdf_extraction import extract_pdf_text
+from .services.profiling import profile_buffer
+from .services.response_cache import render_cache_metrics
+from .services.search import search
+from .services.telemetry import GenerationTelemetry, render_metrics
+from .services.project_content import extract_project_content, join_files
+from .services.project_generation import active_project_job, enqueue_project_generation, render_project_metrics
+from .uploads import content_addressed_storage, get_upload_hash
+from django.urls import reverse
+from urllib.parse import urlencode
 from .services.ai_client import generate_test_cases_stream
-import pdfplumber
+from .services.ai_client import agenerate_test_cases_stream
+from asgiref.sync import sync_to_async
 import re
-from reportlab.platypus import SimpleDocTemplate, Paragraph
-from reportlab.lib.styles import getSampleStyleSheet
-from io import BytesIO
-import markdown
-from django.utils.safestring import mark_safe
-
 
+logger = logging.getLogger(__name__)
 
 
 # -------------------------
@@ -49,117 +82,83 @@ def logout_view(request):
     return redirect("login")
 
 
+def is_asgi(request):
+    """Servido por ASGI (uvicorn): los streams async no bloquean hilos."""
+    return isinstance(request, ASGIRequest)
+
+
 # -------------------------
 # DASHBOARD
 # -------------------------
 @login_required
 def dashboard_view(request):
-    user = request.user
-
-    # -------------------------
-    # MÉTRICAS GENERALES
-    # -------------------------
-    total_chats = ChatSession.objects.filter(user=user).count()
-
-    total_cases = ChatMessage.objects.filter(
-        chat__user=user,
-        is_user=False,
-        success=True
-    ).count()
-
-    total_projects = Project.objects.filter(user=user).count()
-
-    metrics = UsageMetric.objects.filter(user=user)
-
-    time_saved = metrics.aggregate(
-        total=Sum("estimated_time_saved_minutes")
-    )["total"] or 0
-
-    accuracy = metrics.aggregate(
-        avg=Avg("estimated_accuracy")
-    )["avg"] or 0
-
-    # -------------------------
-    # ÚLTIMA ACTIVIDAD
-    # -------------------------
-    last_message = ChatMessage.objects.filter(
-        chat__user=user
-    ).order_by("-created_at").first()
+    snapshot = get_dashboard_snapshot(request.user)
 
     # -------------------------
     # CONTEXTO
     # -------------------------
     context = {
-        "total_cases": total_cases,
-        "total_projects": total_projects,
-        "time_saved": time_saved,
-        "accuracy": round(accuracy, 1),
-        "last_activity": last_message,
+        "total_cases": snapshot["total_cases"],
+        "total_projects": snapshot["total_projects"],
+        "time_saved": snapshot["time_saved"],
+        "accuracy": snapshot["accuracy"],
+        "last_activity": snapshot["last_activity"],
     }
 
     return render(request, "dashboard.html", context)
 
 
+# Polling del dashboard: 304 con una sola lectura (DashboardVersion) mientras
+# no cambie nada (la versión se invalida desde signals.py al escribir
+# mensajes/proyectos/métricas, también desde el worker de jobs)
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=dashboard_etag, last_modified_func=dashboard_last_modified)
 def dashboard_metrics_api(request):
-    user = request.user
-
-    metrics = UsageMetric.objects.filter(user=user)
-
-    data = {
-        "total_cases": metrics.aggregate(
-            total=Sum("total_ai_responses")
-        )["total"] or 0,
-
-        "total_projects": Project.objects.filter(user=user).count(),
-
-        "time_saved": metrics.aggregate(
-            total=Sum("estimated_time_saved_minutes")
-        )["total"] or 0,
-
-        "accuracy": round(
-            metrics.aggregate(avg=Avg("estimated_accuracy"))["avg"] or 0,
-            1
-        ),
-
-        "last_activity": (
-            ChatMessage.objects
-            .filter(chat__user=user)
-            .order_by("-created_at")
-            .values("content", "created_at")
-            .first()
-        )
-    }
+    return JsonResponse(metrics_payload(get_dashboard_snapshot(request.user)))
 
-    return JsonResponse(data)
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=dashboard_etag, last_modified_func=dashboard_last_modified)
 def dashboard_charts_api(request):
-    user = request.user
+    return JsonResponse(charts_payload(get_dashboard_snapshot(request.user)))
 
-    daily = (
-        UsageMetric.objects
-        .filter(user=user)
-        .values("date")
-        .annotate(cases=Sum("total_ai_responses"))
-        .order_by("date")
-    )
 
-    projects = (
-        UsageMetric.objects
-        .filter(user=user, project__isnull=False)
-        .values("project__name")
-        .annotate(cases=Sum("total_ai_responses"))
+@login_required
+async def dashboard_events_view(request):
+    """
+    Server-Sent Events del dashboard: empuja KPIs y gráficas solo cuando
+    cambian. Necesita ASGI: con WSGI (runserver, gunicorn sync) el stream
+    infinito ocuparía un hilo para siempre, así que responde 204, que hace
+    que EventSource no reconecte y el JS vuelva al polling.
+    """
+    if not is_asgi(request):
+        return HttpResponse(status=204)
+
+    user = await request.auser()
+    response = StreamingHttpResponse(
+        dashboard_events(user, heartbeat=settings.DASHBOARD_SSE_HEARTBEAT, poll=settings.DASHBOARD_SSE_POLL),
+        content_type="text/event-stream",
     )
-
-    return JsonResponse({
-        "daily": list(daily),
-        "projects": list(projects),
-    })
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # nginx: no acumular el stream
+    return response
 
 # -------------------------
 # CHAT
 # -------------------------
+def chat_attachments_page(chat, cursor=None, limit=None):
+    """Adjuntos del chat, del más reciente al más antiguo (keyset sobre uploaded_at)."""
+    return keyset_before(
+        chat.attachments.select_related("blob"),
+        cursor=cursor,
+        limit=limit or settings.CHAT_PAGE_SIZE,
+        field="uploaded_at",
+        chronological=False,
+    )
+
+
 @login_required
 def chat_view(request, chat_id=None):
 
@@ -169,24 +168,94 @@ def chat_view(request, chat_id=None):
 
     chat = get_object_or_404(ChatSession, id=chat_id, user=request.user)
 
-    messages = chat.messages.all()
+    # Solo los últimos mensajes; los anteriores se piden al hacer scroll
+    page, older_cursor = keyset_before(chat.messages.all(), limit=settings.CHAT_PAGE_SIZE)
 
-    for msg in messages:
-        if not msg.is_user:
-            msg.rendered_html = mark_safe(
-                markdown.markdown(
-                    msg.content,
-                    extensions=["extra", "nl2br"]
-                )
-            )
-        else:
-            msg.rendered_html = msg.content
+    # HTML guardado al escribir; solo se re-renderiza lo obsoleto
+    messages = ensure_messages_rendered(page)
+
+    # Adjuntos igual: los más recientes y el resto al desplazar la tira
+    attachments, attachments_cursor = chat_attachments_page(chat)
 
     return render(request, "chat.html", {
         "chat": chat,
         "messages": messages,
-        "attachments": chat.attachments.all(),
-        "chats": ChatSession.objects.filter(user=request.user).order_by("-created_at")
+        "older_cursor": older_cursor,
+        "attachments": attachments,
+        "attachments_cursor": attachments_cursor,
+        # Solo los recientes: los demás se encuentran con la búsqueda
+        "chats": (
+            ChatSession.objects.filter(user=request.user)
+            .only("id", "title")
+            .order_by("-last_message_at", "-id")[:settings.CHAT_SIDEBAR_SIZE]
+        ),
+    })
+
+
+@login_required
+def search_api(request):
+    try:
+        page = int(request.GET.get("page", 1))
+    except ValueError:
+        return JsonResponse({"error": "Página inválida"}, status=400)
+    if page < 1:
+        return JsonResponse({"error": "Página inválida"}, status=400)
+
+    return JsonResponse(search(request.user, request.GET.get("q", ""), page=page))
+
+
+@login_required
+def chat_messages_api(request, chat_id):
+    """Mensajes anteriores a `before` (paginación por cursor)."""
+    chat = get_object_or_404(ChatSession, id=chat_id, user=request.user)
+
+    try:
+        limit = min(int(request.GET.get("limit", settings.CHAT_PAGE_SIZE)), 200)
+        page, older_cursor = keyset_before(
+            chat.messages.all(),
+            cursor=request.GET.get("before"),
+            limit=max(limit, 1)
+        )
+    except ValueError:
+        return JsonResponse({"error": "Parámetros inválidos"}, status=400)
+
+    return JsonResponse({
+        "messages": [
+            {
+                "id": msg.id,
+                "is_user": msg.is_user,
+                "content": msg.content if msg.is_user else "",
+                "html": "" if msg.is_user else msg.rendered_html,
+                "created_at": msg.created_at.isoformat(),
+            }
+            for msg in ensure_messages_rendered(page)
+        ],
+        "next_cursor": older_cursor,
+    })
+
+@login_required
+def chat_attachments_api(request, chat_id):
+    """Adjuntos anteriores a `before` (paginación por cursor)."""
+    chat = get_object_or_404(ChatSession, id=chat_id, user=request.user)
+
+    try:
+        page, older_cursor = chat_attachments_page(chat, cursor=request.GET.get("before"))
+    except ValueError:
+        return JsonResponse({"error": "Parámetros inválidos"}, status=400)
+
+    return JsonResponse({
+        "attachments": [
+            {
+                "id": att.id,
+                "url": att.file.url,
+                "preview_url": att.preview_url,
+                "srcset": att.srcset,
+                "width": att.blob.width if att.blob_id else None,
+                "height": att.blob.height if att.blob_id else None,
+            }
+            for att in page
+        ],
+        "next_cursor": older_cursor,
     })
 
 @login_required
@@ -201,7 +270,12 @@ def generated_cases_view(request):
     return render(request, "generated_cases.html", {
         "projects": projects_with_cases,
         "chat_id": chat_id,  # <-- pasamos al template
-        "chats": ChatSession.objects.filter(user=request.user).order_by("-created_at")
+        # Solo los recientes: los demás se encuentran con la búsqueda
+        "chats": (
+            ChatSession.objects.filter(user=request.user)
+            .only("id", "title")
+            .order_by("-last_message_at", "-id")[:settings.CHAT_SIDEBAR_SIZE]
+        ),
     })
 
 
@@ -213,52 +287,35 @@ def projects_view(request):
     projects = Project.objects.filter(user=request.user)
     return render(request, "projects.html", {"projects": projects})
 
-import zipfile
-
-ALLOWED_EXTENSIONS = (
-    ".py", ".js", ".ts", ".java", ".cs",
-    ".html", ".css", ".sql",
-    ".md", ".txt"
-)
-
-MAX_PROJECT_CHARS = 6000
-
-def is_allowed_file(filename: str) -> bool:
-    return filename.lower().endswith(ALLOWED_EXTENSIONS)
-
-def extract_project_content(file) -> str:
-    content = ""
-
-    with zipfile.ZipFile(file) as z:
-        for info in z.infolist():
-            if info.is_dir():
-                continue
-
-            if not is_allowed_file(info.filename):
-                continue
-
-            with z.open(info) as f:
-                try:
-                    text = f.read().decode("utf-8", errors="ignore")
-                except:
-                    continue
-
-            content += f"\n\n### FILE: {info.filename}\n{text}"
-
-            if len(content) >= MAX_PROJECT_CHARS:
-                break
-
-    return content[:MAX_PROJECT_CHARS]
+def find_processed_project(file_hash):
+    """Proyecto (de cualquier usuario) ya generado a partir del mismo archivo."""
+    if not file_hash:
+        return None
+    return (
+        Project.objects
+        .filter(file_hash=file_hash)
+        .exclude(test_cases="")
+        .exclude(extracted_content="")
+        .order_by("-created_at")
+        .first()
+    )
 
 
-def extract_pdf_text(file) -> str:
-    text = ""
-    with pdfplumber.open(file) as pdf:
-        for page in pdf.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + "\n"
-    return text.strip()
+def find_extracted_content(file_hash):
+    """
+    (texto, índice) ya extraídos del mismo archivo, aunque su generación no
+    haya terminado.
+    """
+    if not file_hash:
+        return "", None
+    return (
+        Project.objects
+        .filter(file_hash=file_hash)
+        .exclude(extracted_content="")
+        .order_by("-created_at")
+        .values_list("extracted_content", "content_index")
+        .first()
+    ) or ("", None)
 
 
 @login_required
@@ -277,60 +334,78 @@ def upload_project_view(request):
                     "error": "Ya existe un proyecto con este nombre. Usa un nombre diferente."
                 })
 
-            # 🔹 leer archivo para generar casos
-            content = ""
-
+            # 🔹 si este mismo archivo ya se procesó, reutilizar contenido y casos
             if project.file:
-                filename = project.file.name.lower()
-
-                if filename.endswith(".zip"):
-                    content = extract_project_content(project.file)
-                elif filename.endswith(".pdf"):
-                    content = extract_pdf_text(project.file)
-                else:
-                    try:
-                        content = project.file.read().decode("utf-8", errors="ignore")
-                    except:
-                        content = ""
-
-            content = content[:MAX_PROJECT_CHARS]
-
-            if len(content.strip()) < 200:
-                return render(request, "upload_project.html", {
-                    "form": form,
-                    "error": "El archivo no contiene texto suficiente para generar casos de prueba."
-            })
-
-            print("contenido" + content)
-            print("enviando....")
-            # 🔥 generar casos de prueba
-            test_cases = generate_project_test_cases(content)
-
-            project.test_cases = test_cases
-            project.save()  # ✅ aquí ya guarda archivo + proyecto
-
-            UsageMetric.objects.create(
-                user=request.user,
-                project=project,
-                total_ai_responses=test_cases.count("ID:"),
-                estimated_time_saved_minutes=10,
-                estimated_accuracy=0.9
-            )
+                project.file_hash = get_upload_hash(request, "file")
+
+            processed = find_processed_project(project.file_hash)
+
+            if processed:
+                content, index = processed.extracted_content, processed.content_index
+                test_cases = processed.test_cases
+            else:
+                # 🔹 leer archivo para generar casos
+                content, index = find_extracted_content(project.file_hash)
+
+                if project.file and not content:
+                    filename = project.file.name.lower()
+
+                    if filename.endswith(".zip"):
+                        content, index = extract_project_content(project.file)
+                    elif filename.endswith(".pdf"):
+                        content = extract_pdf_text(project.file, file_hash=project.file_hash)
+                    else:
+                        try:
+                            content = project.file.read().decode("utf-8", errors="ignore")
+                        except:
+                            content = ""
+
+                    if not filename.endswith(".zip"):
+                        # Un solo documento: aunque contenga "### FILE:" no se parte
+                        content, index = join_files([("", content)])
+
+                # Sin truncar: el job lo reparte en fragmentos (project_content.plan_chunks)
+                test_cases = ""
+
+                if len(content.strip()) < 200:
+                    return render(request, "upload_project.html", {
+                        "form": form,
+                        "error": "El archivo no contiene texto suficiente para generar casos de prueba."
+                })
 
+                logger.debug("Proyecto %s: %s caracteres extraídos", project.name, len(content))
 
-            chat_id = request.GET.get("chat_id")
+            project.extracted_content = content
+            project.content_index = index
+            set_project_test_cases(project, test_cases)
+            project.save()  # ✅ aquí ya guarda archivo (una sola vez por hash) + proyecto
 
-            html_cases = markdown.markdown(
-                test_cases,
-                extensions=["extra", "nl2br", "sane_lists"]
-            )
+            if processed:
+                UsageMetric.objects.create(
+                    user=request.user,
+                    project=project,
+                    total_ai_responses=test_cases.count("ID:"),
+                    estimated_time_saved_minutes=10,
+                    estimated_accuracy=0.9
+                )
+                job = None
+            else:
+                # 🔥 la generación corre en el worker (run_worker)
+                job = enqueue_project_generation(project)
+
+            url = reverse("project_test_cases", args=[project.id])
+            params = {"chat_id": request.GET.get("chat_id")} if request.GET.get("chat_id") else {}
+            if job:
+                params["job"] = job.id
+
+            if request.headers.get("x-requested-with") == "XMLHttpRequest":
+                return JsonResponse({
+                    "project_id": project.id,
+                    "job_id": job.id if job else None,
+                    "redirect": url,
+                })
 
-            return render(request, "project_test_cases.html", {
-                "project": project,
-                "project_name": project.name,
-                "test_cases_html": html_cases,
-                "chat_id": chat_id
-            })
+            return redirect(f"{url}?{urlencode(params)}" if params else url)
 
     else:
         form = ProjectUploadForm()
@@ -341,40 +416,37 @@ def upload_project_view(request):
 
 @login_required
 def project_test_cases_view(request, project_id):
-    from .services.ai_client import generate_test_cases
-
     project = get_object_or_404(Project, id=project_id, user=request.user)
+    chat_id = request.GET.get("chat_id")  # si viene en la URL
 
+    job = None
     if not project.test_cases:
-        content = project.description or ""
-        if project.file:
-            try:
-                content = project.file.read().decode("utf-8")
-            except Exception:
-                project.file.seek(0)
-                content = str(project.file.read())
-
-        # Generar casos de prueba usando FastAPI
-        test_cases = generate_test_cases(content, max_tokens=800)
-
-        project.test_cases = test_cases
-        project.save()
-    else:
-        test_cases = project.test_cases
-        chat_id = request.GET.get("chat_id")  # si viene en la URL
-        print("Chat ID recibido:", chat_id)
+        job = active_project_job(project)
 
-        html_cases = markdown.markdown(
-            test_cases,
-            extensions=["extra", "nl2br", "sane_lists"]
-        )
+        # Un GET solo encola si el proyecto nunca tuvo job (subido antes de
+        # los jobs); regenerar después de un job terminado es un POST explícito
+        can_enqueue = bool(project.extracted_content) and not (job and job.is_active)
+        if can_enqueue and (job is None or request.method == "POST"):
+            job = enqueue_project_generation(project)
 
-        return render(request, "project_test_cases.html", {
-            "project": project,
-            "project_name": project.name,
-            "test_cases_html": html_cases,
-            "chat_id": chat_id
-        })
+    if request.method == "POST":
+        return redirect(request.get_full_path())
+
+    html_cases = project_test_cases_html(project)
+
+    return render(request, "project_test_cases.html", {
+        "project": project,
+        "project_name": project.name,
+        "test_cases_html": html_cases,
+        "chat_id": chat_id,
+        "job": job,
+    })
+
+
+@login_required
+def job_status_api(request, job_id):
+    job = get_object_or_404(Job, id=job_id, user=request.user)
+    return JsonResponse(job_status(job))
 
 
 # -------------------------
@@ -382,9 +454,24 @@ def project_test_cases_view(request, project_id):
 # -------------------------
 @login_required
 def history_view(request):
-    chats = ChatSession.objects.filter(user=request.user).order_by("-created_at")
+    # Keyset sobre (last_message_at, id): el último mensaje ya viene en el chat,
+    # así que la página son siempre las mismas queries
+    try:
+        chats, older_cursor = keyset_before(
+            ChatSession.objects
+            .filter(user=request.user)
+            .only("id", "title", "created_at", "last_message_at", "last_message_preview"),
+            cursor=request.GET.get("before"),
+            limit=settings.HISTORY_PAGE_SIZE,
+            field="last_message_at",
+            chronological=False,
+        )
+    except ValueError:
+        return HttpResponse("Cursor inválido", status=400)
+
     return render(request, "history.html", {
-        "chats": chats
+        "chats": chats,
+        "older_cursor": older_cursor,
     })
 
 
@@ -401,69 +488,38 @@ def metrics_view(request):
     start_date = request.GET.get("start_date")
     end_date = request.GET.get("end_date")
 
-    metrics_qs = UsageMetric.objects.filter(user=user)
-
-    if start_date:
-        metrics_qs = metrics_qs.filter(date__gte=start_date)
-
-    if end_date:
-        metrics_qs = metrics_qs.filter(date__lte=end_date)
-
-    # -------------------------
-    # KPIs
-    # -------------------------
-    total_cases = metrics_qs.aggregate(
-        total=Sum("total_ai_responses")
-    )["total"] or 0
-
-    total_chats = ChatSession.objects.filter(
-        user=user
-    ).count()
-
-    total_projects = Project.objects.filter(user=user).count()
-
-    time_saved = metrics_qs.aggregate(
-        total=Sum("estimated_time_saved_minutes")
-    )["total"] or 0
-
-    accuracy = metrics_qs.aggregate(
-        avg=Avg("estimated_accuracy")
-    )["avg"] or 0
-
-    # -------------------------
-    # MÉTRICAS DIARIAS
-    # -------------------------
-    daily_metrics = list(
-        metrics_qs
-        .values("date")
-        .annotate(
-            cases=Sum("total_ai_responses"),
-            time_saved=Sum("estimated_time_saved_minutes")
-        )
-        .order_by("date")
-    )
+    snapshot = get_dashboard_snapshot(user)
+
+    if not start_date and not end_date:
+        # Sin filtro: todo sale del snapshot compartido con el dashboard
+        kpis = {
+            "total_cases": snapshot["total_cases"],
+            "time_saved": snapshot["time_saved"],
+            "accuracy": snapshot["accuracy"],
+        }
+        daily_metrics = snapshot["daily"]
+        project_metrics = snapshot["projects"]
+    else:
+        # Rango: meses/semanas/días pre-agregados (services/metric_rollups.py)
+        try:
+            metrics = range_metrics(
+                user,
+                date.fromisoformat(start_date) if start_date else None,
+                date.fromisoformat(end_date) if end_date else None,
+            )
+        except ValueError:
+            return HttpResponse("Fecha inválida", status=400)
 
-    # -------------------------
-    # MÉTRICAS POR PROYECTO
-    # -------------------------
-    project_metrics = list(
-        metrics_qs
-        .filter(project__isnull=False)
-        .values("project__name")
-        .annotate(
-            cases=Sum("total_ai_responses"),
-            time_saved=Sum("estimated_time_saved_minutes"),
-            accuracy=Avg("estimated_accuracy")
-        )
-        .order_by("-cases")
-    )
+        kpis = metrics
+        daily_metrics = metrics["daily"]
+        project_metrics = metrics["projects"]
 
     return render(request, "metrics.html", {
-        "total_cases": total_cases,
-        "total_chats": total_chats,
-        "total_projects": total_projects,
-        "time_saved": time_saved,
-        "accuracy": round(accuracy, 1),
+        "total_cases": kpis["total_cases"],
+        "total_chats": snapshot["total_chats"],
+        "total_projects": snapshot["total_projects"],
+        "time_saved": kpis["time_saved"],
+        "accuracy": kpis["accuracy"],
         "daily_metrics": daily_metrics,
         "project_metrics": project_metrics,
         "start_date": start_date,
@@ -471,6 +527,40 @@ def metrics_view(request):
     })
 
 
+# -------------------------
+# PERFILADO DE PETICIONES (STAFF)
+# -------------------------
+@staff_member_required
+def profiling_view(request):
+    if request.method == "POST":
+        profile_buffer.clear()
+        return redirect("profiling")
+
+    records = profile_buffer.records()
+    slowest = sorted(records, key=lambda record: record["total_ms"], reverse=True)[:20]
+    return render(request, "admin/profiling.html", {
+        "title": "Endpoints más lentos",
+        "endpoints": profile_buffer.worst_endpoints(),
+        "slowest": slowest,
+        "buffered": len(records),
+        "n_plus_one_threshold": getattr(settings, "PROFILING_N_PLUS_ONE_THRESHOLD", 10),
+    })
+
+
+
+def prometheus_metrics_view(request):
+    """
+    Histogramas del backend de IA en formato texto de Prometheus, más los
+    totales de la generación de proyectos (corre en run_worker), el pool
+    de conexiones y la caché de respuestas de este proceso. Sin login (el
+    scraper no tiene sesión): solo desde METRICS_ALLOWED_IPS.
+    """
+    if request.META.get("REMOTE_ADDR") not in getattr(settings, "METRICS_ALLOWED_IPS", ()):
+        return HttpResponse(status=403)
+    body = render_metrics() + render_project_metrics() + render_pool_metrics() + render_cache_metrics()
+    return HttpResponse(body, content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 
 # -------------------------
 # PERFIL
@@ -519,17 +609,23 @@ def upload_attachment_view(request, chat_id):
                 status=400
             )
 
-        attachment = ChatAttachment.objects.create(
-            chat=chat,
-            file=file,
-            file_type="image"
-        )
+        # Misma imagen en otro chat: se reutiliza el archivo (por SHA-256)
+        try:
+            attachment = store_attachment(chat, file, get_upload_hash(request, "file"))
+        except InvalidImage:
+            return JsonResponse(
+                {"success": False, "error": "El archivo no es una imagen válida"},
+                status=400
+            )
 
         return JsonResponse({
             "success": True,
             "file_name": attachment.file.name.split("/")[-1],
             "file_url": attachment.file.url,
-            "file_type": "image"
+            "file_type": "image",
+            "width": attachment.blob.width,
+            "height": attachment.blob.height,
+            "srcset": attachment.srcset,
         })
 
     return JsonResponse({"success": False}, status=400)
@@ -551,15 +647,7 @@ def is_test_case_request(text: str) -> bool:
 # ==========================
 # 🔥 NIVEL 7 – STREAM CHAT
 # ==========================
-@login_required
-def chat_stream_view(request, chat_id):
-    chat = get_object_or_404(ChatSession, id=chat_id, user=request.user)
-    user_message = request.GET.get("message", "").strip()
-
-    if not user_message:
-        return StreamingHttpResponse("", content_type="text/plain")
-
-    # Guardar mensaje del usuario
+def save_user_message(chat, user_message):
     ChatMessage.objects.create(
         chat=chat,
         is_user=True,
@@ -571,10 +659,36 @@ def chat_stream_view(request, chat_id):
         chat.title = user_message.strip()[:50]
         chat.save(update_fields=["title"])
 
-    # CONTEXTO DE ARCHIVOS (si existieran)
-    context = ""
 
-    start_time = time.time()
+def save_ai_message(chat, ai_text, telemetry):
+    content = ai_text.strip()
+    ChatMessage.objects.create(
+        chat=chat,
+        is_user=False,
+        content=content,
+        rendered_html=render_chat_markdown(content),
+        rendered_version=CHAT_RENDERER_VERSION,
+        success=True,
+        language="es",
+        **telemetry.message_fields()
+    )
+
+
+@login_required
+def chat_stream_view(request, chat_id):
+    chat = get_object_or_404(ChatSession, id=chat_id, user=request.user)
+    user_message = request.GET.get("message", "").strip()
+
+    if not user_message:
+        return StreamingHttpResponse("", content_type="text/plain")
+
+    # Historial dentro del presupuesto de tokens (antes de guardar el mensaje nuevo)
+    context = build_chat_context(chat)
+
+    # Guardar mensaje del usuario
+    save_user_message(chat, user_message)
+
+    telemetry = GenerationTelemetry()
 
     def stream():
         ai_text = ""
@@ -582,24 +696,62 @@ def chat_stream_view(request, chat_id):
         for line in generate_test_cases_stream({
             "requirement": user_message,
             "context": context
-        }):
+        }, telemetry):
             # Espacios y saltos de línea conservados para que se vea bonito
             ai_text += line
             yield line   # línea completa con salto de línea
 
         # Guardar respuesta completa
-        response_time_ms = int((time.time() - start_time) * 1000)
-        ChatMessage.objects.create(
-            chat=chat,
-            is_user=False,
-            content=ai_text.strip(),
-            success=True,
-            language="es",
-            response_time_ms=response_time_ms
-        )
+        save_ai_message(chat, ai_text, telemetry)
 
     return StreamingHttpResponse(stream(), content_type="text/plain")
 
+
+@login_required
+async def chat_stream_async_view(request, chat_id):
+    """
+    Misma lógica que chat_stream_view pero async (ASGI): mientras espera
+    al backend el stream no bloquea ningún hilo del servidor.
+    """
+    user = await request.auser()
+    chat = await aget_object_or_404(ChatSession, id=chat_id, user=user)
+    user_message = request.GET.get("message", "").strip()
+
+    if not user_message:
+        return StreamingHttpResponse("", content_type="text/plain")
+
+    # Las escrituras (y los signals de métricas) pasan por sync_to_async
+    context = await sync_to_async(build_chat_context)(chat)
+    await sync_to_async(save_user_message)(chat, user_message)
+
+    telemetry = GenerationTelemetry()
+
+    async def stream():
+        ai_text = ""
+
+        async for line in agenerate_test_cases_stream({
+            "requirement": user_message,
+            "context": context
+        }, telemetry):
+            ai_text += line
+            yield line
+
+        await sync_to_async(save_ai_message)(chat, ai_text, telemetry)
+
+    return StreamingHttpResponse(stream(), content_type="text/plain")
+
+async def chat_stream_dispatch_view(request, chat_id):
+    """
+    Elige la vista del stream según el servidor de cada petición: con ASGI
+    la async (no ocupa un hilo mientras espera al backend); con WSGI
+    (runserver, gunicorn sync) la sync, porque Django acumularía el stream
+    async entero antes de enviar el primer byte.
+    """
+    if settings.ASYNC_STREAMING and is_asgi(request):
+        return await chat_stream_async_view(request, chat_id)
+    return await sync_to_async(chat_stream_view)(request, chat_id)
+
+
 @login_required
 def download_project_test_cases(request, project_id):
     project = get_object_or_404(Project, id=project_id, user=request.user)
@@ -607,43 +759,51 @@ def download_project_test_cases(request, project_id):
     if not project.test_cases:
         return HttpResponse("Este proyecto no tiene casos de prueba", status=404)
 
-    # 1️⃣ Markdown → HTML
-    html = markdown.markdown(
-        project.test_cases,
-        extensions=["extra", "nl2br", "sane_lists"]
-    )
+    # PDF guardado por hash de los casos (normalmente ya lo generó el worker)
+    name = ensure_project_pdf(project)
 
-    # 2️⃣ HTML compatible con ReportLab
-    html = (
-        html
-        .replace("<strong>", "<b>")
-        .replace("</strong>", "</b>")
-        .replace("<em>", "<i>")
-        .replace("</em>", "</i>")
+    return serve_file(
+        request,
+        content_addressed_storage,
+        name,
+        etag=export_hash(project),
+        filename=export_filename(project),
+        content_type="application/pdf",
     )
 
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer)
-    styles = getSampleStyleSheet()
-
-    story = []
 
-    # 3️⃣ Separar por párrafos HTML
-    for block in html.split("\n"):
-        if block.strip():
-            story.append(
-                Paragraph(block, styles["Normal"])
-            )
-
-    doc.build(story)
+@login_required
+@require_safe
+def media_view(request, name):
+    """
+    MEDIA_ROOT con permisos: adjuntos y archivos de proyecto solo para su
+    dueño. Los nombres por hash se cachean como inmutables; con
+    SENDFILE_BACKEND el archivo lo envía el servidor web.
+    """
+    media = resolve_media(request.user, name)
+    if media is None:
+        raise Http404
+    try:
+        return serve_file(request, **media)
+    except FileNotFoundError:
+        raise Http404
 
-    buffer.seek(0)
 
-    response = HttpResponse(buffer, content_type="application/pdf")
-    response["Content-Disposition"] = (
-        f'attachment; filename="{project.name}_casos_de_prueba.pdf"'
+@login_required
+def export_all_projects(request):
+    projects = (
+        Project.objects
+        .filter(user=request.user)
+        .exclude(test_cases="")
+        .order_by("name")
     )
 
+    # El zip se arma mientras se envía: nunca está completo en memoria
+    response = StreamingHttpResponse(
+        stream_projects_zip(projects.iterator()),
+        content_type="application/zip",
+    )
+    response["Content-Disposition"] = 'attachment; filename="casos_de_prueba.zip"'
     return response
 
 @login_required
@@ -655,7 +815,9 @@ def delete_project(request, project_id):
 @login_required
 def delete_attachment(request, attachment_id):
     att = get_object_or_404(ChatAttachment, id=attachment_id, chat__user=request.user)
-    att.file.delete()
+    # Con blob, el archivo se borra al soltar la última referencia (signals.py)
+    if att.blob_id is None:
+        att.file.delete()
     att.delete()
     return JsonResponse({"success": True})
 
@@ -685,7 +847,13 @@ def delete_chat_file(request, file_id):
 @login_required
 def delete_project_file(request, project_id):
     project = get_object_or_404(Project, id=project_id, user=request.user)
-    project.file.delete()
+
+    # El archivo se comparte entre proyectos con el mismo hash
+    shared = Project.objects.filter(file=project.file.name).exclude(id=project.id).exists()
+    if shared:
+        project.file = None
+    else:
+        project.file.delete(save=False)
     project.save()
     return redirect("projects")
 
@@ -13,4 +13,25 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'web.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Importar después de inicializar Django
+from generator.services.http_client import aclose_async_clients  # noqa: E402
+
+
+async def application(scope, receive, send):
+    """
+    Envuelve la app de Django para atender el protocolo `lifespan`
+    (uvicorn) y cerrar el pool async del backend de IA al apagar.
+    """
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await aclose_async_clients()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    await django_application(scope, receive, send)
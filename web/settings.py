@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,6 +43,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'generator.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -78,6 +80,15 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Varios escritores (web + workers): BEGIN IMMEDIATE y espera del lock
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        # Base de tests en archivo para poder probar escritores concurrentes
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
@@ -129,7 +140,122 @@ STATICFILES_DIRS = [BASE_DIR / 'generator' / 'static']
 LOGIN_URL = '/'
 LOGIN_REDIRECT_URL = '/dashboard/'
 LOGOUT_REDIRECT_URL = '/'
-FASTAPI_URL = "https://accessional-marci-corpulently.ngrok-free.dev"
+# Backend de IA. Para pruebas locales: `manage.py run_ai_simulator` y
+# FASTAPI_URL=http://127.0.0.1:8001
+FASTAPI_URL = os.environ.get("FASTAPI_URL", "https://accessional-marci-corpulently.ngrok-free.dev")
 
 MEDIA_URL = "/media/"
-MEDIA_ROOT = BASE_DIR / "media"
\ No newline at end of file
+MEDIA_ROOT = BASE_DIR / "media"
+
+# Cliente HTTP hacia el backend de IA (pool keep-alive compartido)
+AI_HTTP_POOL_SIZE = 10
+AI_HTTP_KEEPALIVE_EXPIRY = 60
+AI_HTTP2 = False  # requiere el paquete "h2"
+AI_HTTP_CONNECT_TIMEOUT = 10
+AI_HTTP_READ_TIMEOUT = 200
+AI_HTTP_POOL_TIMEOUT = 5  # espera por una conexión libre del pool
+AI_HTTP_MAX_RETRIES = 2
+AI_HTTP_BACKOFF = 0.5
+AI_HTTP_BACKOFF_MAX = 5
+
+# Stream del chat con la vista async cuando la petición llega por ASGI
+# (`uvicorn web.asgi:application`). Con runserver/WSGI se usa siempre la
+# vista sync, que envía cada línea apenas llega.
+ASYNC_STREAMING = True
+
+# Caché de respuestas del backend de IA (LRU en memoria + tabla CachedResponse).
+# Cambiar AI_BACKEND_VERSION al desplegar otro modelo invalida todas las entradas.
+AI_BACKEND_VERSION = "v1"
+AI_CACHE_ENABLED = True
+AI_CACHE_MAX_ENTRIES = 500
+AI_CACHE_TTL = 60 * 60 * 24  # memoria, en segundos
+AI_CACHE_PERSISTENT_TTL = 60 * 60 * 24 * 30  # tabla, en segundos
+
+# El primer handler calcula el SHA-256 de cada archivo mientras se sube
+FILE_UPLOAD_HANDLERS = [
+    "generator.uploads.HashingUploadHandler",
+    "django.core.files.uploadhandler.MemoryFileUploadHandler",
+    "django.core.files.uploadhandler.TemporaryFileUploadHandler",
+]
+
+# Cola de trabajos (tabla Job). Worker: `python manage.py run_worker`
+JOB_VISIBILITY_TIMEOUT = 120  # segundos sin heartbeat antes de re-entregar un job
+JOB_MAX_ATTEMPTS = 3
+JOB_RETRY_BACKOFF = 30  # segundos, se duplica en cada intento
+JOB_POLL_INTERVAL = 2
+
+# Mensajes por página en el chat (el resto se carga al hacer scroll)
+CHAT_PAGE_SIZE = 50
+HISTORY_PAGE_SIZE = 30  # chats por página en el historial
+CHAT_SIDEBAR_SIZE = 30  # chats recientes en la barra lateral; el resto, por búsqueda
+SEARCH_PAGE_SIZE = 20  # resultados por página de /api/search/
+SEARCH_RANK_WINDOW = 500  # mensajes más recientes que se ordenan por relevancia
+
+# Historial enviado como contexto en cada mensaje del chat (services/chat_context.py):
+# mensajes recientes completos + resumen acumulado de los anteriores
+CHAT_CONTEXT_TOKENS = 1500  # total, resumen incluido
+CHAT_SUMMARY_TOKENS = 300
+CHAT_SUMMARY_TURN_TOKENS = 60  # por mensaje dentro del resumen
+
+# Snapshots del dashboard (generator/services/dashboard.py).
+# La versión de cada dashboard vive en la base (DashboardVersion) y es parte
+# de la clave del snapshot, así que una caché por proceso (LocMem) nunca
+# sirve datos viejos: cada proceso solo reconstruye su copia una vez.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "backendnqaweb",
+    }
+}
+
+# Dashboard en vivo (SSE, solo con ASGI; con WSGI responde 204 y el JS hace
+# polling). El broker en proceso avisa al instante a las conexiones del mismo
+# proceso; los cambios de otros procesos (run_worker, otros workers web) se
+# ven leyendo la versión en la base (DashboardVersion) cada DASHBOARD_SSE_POLL.
+PUBSUB_BACKEND = "generator.services.pubsub.InProcessBroker"
+DASHBOARD_SSE_HEARTBEAT = 25  # segundos
+DASHBOARD_SSE_POLL = 2  # segundos
+
+# Generación de proyectos por fragmentos (map-reduce sobre /generate-project)
+PROJECT_CHUNK_TOKENS = 1500  # presupuesto exacto por llamada al backend
+PROJECT_MAX_CHUNKS = None  # p.ej. 32: descarta los archivos menos relevantes
+PROJECT_GENERATION_CONCURRENCY = 4  # llamadas simultáneas por job
+PROJECT_MAX_FILE_BYTES = 512 * 1024  # archivos del zip más grandes se omiten
+
+# Tokenizer del modelo para contar tokens: ruta a tokenizer.json o nombre en
+# el Hub de Hugging Face. Configurarlo en producción: vacío (o si no carga)
+# el conteo es aproximado con el pre-tokenizer, y los presupuestos de tokens
+# del contexto del chat y de los fragmentos de proyecto se reducen a
+# AI_TOKENIZER_MARGIN para dejar margen al error de la aproximación.
+AI_TOKENIZER = ""
+AI_TOKENIZER_MARGIN = 0.8
+
+# Extracción de PDF: rangos de páginas en un pool de procesos, hasta el presupuesto
+PDF_TOKEN_BUDGET = 60000  # tokens; al llegar se deja de leer el PDF
+PDF_EXTRACTION_PROCESSES = 4
+PDF_PAGES_PER_TASK = 8
+PDF_SLOW_PAGE_SECONDS = 1.0  # más lento que esto con pdfplumber: capa rápida (pdfium)
+
+# Archivos de MEDIA_ROOT: los sirve generator.views.media_view comprobando
+# el dueño. Detrás de un servidor web, que lo envíe él: "nginx" responde con
+# X-Accel-Redirect a SENDFILE_URL_PREFIX (location `internal` con alias a
+# MEDIA_ROOT) y "apache" con X-Sendfile (mod_xsendfile). None: FileResponse.
+SENDFILE_BACKEND = None
+SENDFILE_URL_PREFIX = "/protected/"
+
+# Adjuntos del chat: una copia por contenido y versiones WebP (job en `run_worker`)
+ATTACHMENT_VARIANT_WIDTHS = [320, 1280]  # px; miniatura del chat y tamaño medio
+ATTACHMENT_WEBP_QUALITY = 80
+
+# Perfilado por petición (generator/middleware.py): consultas, tiempo de base
+# de datos y de backend de IA en la cabecera Server-Timing y en un buffer en
+# memoria por proceso, visible en /admin/profiling/ (staff)
+PROFILING_ENABLED = True
+PROFILING_SERVER_TIMING = True
+PROFILING_BUFFER_SIZE = 1000  # últimas peticiones guardadas
+PROFILING_SLOW_QUERIES = 3  # consultas más lentas guardadas por petición
+PROFILING_N_PLUS_ONE_THRESHOLD = 10  # misma consulta N veces en una petición: warning en el log
+
+# Telemetría del backend de IA en /metrics (formato Prometheus). Los
+# histogramas son por proceso: con varios workers, scrapear cada uno.
+METRICS_ALLOWED_IPS = ["127.0.0.1", "::1"]
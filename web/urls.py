@@ -17,14 +17,12 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
-from django.conf.urls.static import static
+
+from generator.views import media_view
 
 urlpatterns = [
     path('', include('generator.urls')),
     path('admin/', admin.site.urls),
+    # Con permisos y también en producción (no solo con DEBUG como static())
+    path(f"{settings.MEDIA_URL.strip('/')}/<path:name>", media_view, name="media"),
 ]
-
-urlpatterns += static(
-    settings.MEDIA_URL,
-    document_root=settings.MEDIA_ROOT
-)